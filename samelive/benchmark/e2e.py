@@ -0,0 +1,105 @@
+import argparse
+
+from SPARQLWrapper import SPARQLWrapper
+
+from samelive.utils.config import Config
+from samelive.utils.helper import Helper
+from samelive.utils.instrumentation import StageTimer
+from samelive.benchmark.fixtures import MockLODCloud, EVALUATION_FOLDER
+from samelive.benchmark.mockendpoint import MockEndpoint
+
+
+def clear_store(endpoint: str):
+    """
+    Removes all the data of a triplestore.
+    :param endpoint: String, URL of the triplestore.
+    """
+    sparql = SPARQLWrapper(endpoint)
+    sparql.method = 'POST'
+    sparql.setRequestMethod('postdirectly')
+    sparql.setQuery("CLEAR ALL")
+    sparql.query()
+
+
+def closure_report(endpoint: str, expected: set) -> dict:
+    """
+    Compares the resources found by the algorithm with the expected closure.
+    :param endpoint: String, URL of the triplestore where the algorithm was run.
+    :param expected: Set of String, resources of the expected closure.
+    :return: Dict, numbers of expected, same:Target, same:Rotten, missing and unexpected resources.
+    """
+    found = {}
+    for binding in Helper.stream_select(endpoint, """
+        PREFIX same: <https://ns.inria.fr/same/same.owl#>
+        SELECT DISTINCT ?resource ?type
+        WHERE {
+          ?resource a ?type
+          FILTER(?type IN (same:Target, same:Rotten))
+        }
+    """):
+        found.setdefault(binding["type"].rsplit("#", 1)[-1], set()).add(binding["resource"])
+    targets = found.get("Target", set())
+    rottens = found.get("Rotten", set())
+    return {
+        "expected": len(expected),
+        "targets": len(targets),
+        "rottens": len(rottens),
+        "missing": len(expected - targets - rottens),
+        "unexpected": len((targets | rottens) - expected),
+    }
+
+
+def run_benchmark(master_endpoint: str, lod_cloud: MockLODCloud, latency: float = 0.0, failure_rate: float = 0.0,
+                  results_limit: int = None, nb_without_values: int = 0, nb_without_non_ascii: int = 0):
+    """
+    Runs the whole algorithm against stand-in endpoints and reports the time spent per stage and the correctness of
+    the closure. The triplestore is cleared before the run.
+    :param master_endpoint: String, URL of the triplestore dedicated to the benchmark.
+    :param lod_cloud: MockLODCloud, data of the stand-in endpoints.
+    :param latency: float, delay in seconds added by the endpoints to each answer.
+    :param failure_rate: float, fraction of the queries failing on each endpoint.
+    :param results_limit: int, limit number of results of the endpoints.
+    :param nb_without_values: int, number of endpoints rejecting the VALUES clause.
+    :param nb_without_non_ascii: int, number of endpoints rejecting non-ASCII characters.
+    :return: Tuple, StageTimer and report of the closure (see closure_report).
+    """
+    endpoints = [MockEndpoint(graph, latency, failure_rate, results_limit, supports_values=i >= nb_without_values,
+                              supports_non_ascii=i >= nb_without_non_ascii, seed=i).start()
+                 for i, graph in enumerate(lod_cloud.graphs)]
+    try:
+        Config.master_endpoint = master_endpoint
+        # The stages are instantiated by the first run, after the configuration of the triplestore
+        from samelive.computing import main
+
+        clear_store(master_endpoint)
+        timer = StageTimer(Config.profile())
+        main.run([lod_cloud.seed_resource], {e.url + ".dataset": "<" + e.url + ">" for e in endpoints},
+                 load_catalogs=False, timer=timer)
+        return timer, closure_report(master_endpoint, lod_cloud.expected)
+    finally:
+        for endpoint in endpoints:
+            endpoint.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Runs SameLive against local stand-in SPARQL endpoints.")
+    parser.add_argument("--master", required=True,
+                        help="URL of a triplestore dedicated to the benchmark, its data is cleared.")
+    parser.add_argument("--closure", default=EVALUATION_FOLDER + "/error/O1.csv")
+    parser.add_argument("--noise", nargs="*", default=[EVALUATION_FOLDER + "/lodsynthesis.csv"])
+    parser.add_argument("--endpoints", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--results-limit", type=int, default=None)
+    parser.add_argument("--without-values", type=int, default=0,
+                        help="Number of endpoints rejecting the VALUES clause.")
+    parser.add_argument("--without-non-ascii", type=int, default=0,
+                        help="Number of endpoints rejecting non-ASCII characters.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    timer, report = run_benchmark(args.master, MockLODCloud(args.closure, args.noise, args.endpoints, args.seed),
+                                  args.latency, args.failure_rate, args.results_limit, args.without_values,
+                                  args.without_non_ascii)
+    print(timer.report())
+    print(report)
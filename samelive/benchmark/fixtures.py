@@ -0,0 +1,61 @@
+import csv
+import random
+
+from rdflib import Graph, URIRef
+from rdflib.namespace import OWL
+
+from samelive.utils.config import Config
+
+EVALUATION_FOLDER = Config.project_path + "/resource/evaluation"
+
+
+def read_terms(path: str) -> [str]:
+    """
+    Reads the terms of an evaluation file (columns new_eq_id and term separated by semicolons).
+    :param path: String, path of the evaluation file.
+    :return: List of String, terms in the order of the file without duplicates.
+    """
+    with open(path, newline="", encoding="utf-8") as csvfile:
+        return list(dict.fromkeys(row["term"] for row in csv.DictReader(csvfile, delimiter=";")))
+
+
+def authority(iri: str) -> str:
+    return iri.split("://", 1)[-1].split("/", 1)[0]
+
+
+class MockLODCloud(object):
+    """
+    Identity graph derived from the evaluation files and split between stand-in endpoints by authority. The terms of
+    the closure file form a random tree of owl:sameAs relationships rooted at its first term (the seed), the terms
+    of the noise files which are not part of the closure form other trees that must not be reached.
+    """
+    def __init__(self, closure_path: str = EVALUATION_FOLDER + "/error/O1.csv",
+                 noise_paths: [str] = (EVALUATION_FOLDER + "/lodsynthesis.csv",), nb_endpoints: int = 10,
+                 seed: int = 0):
+        """
+        :param closure_path: String, evaluation file of the closure to find.
+        :param noise_paths: List of String, evaluation files providing resources outside the closure.
+        :param nb_endpoints: int, number of stand-in endpoints.
+        :param seed: int, seed of the random generation.
+        """
+        rng = random.Random(seed)
+        closure = read_terms(closure_path)
+        self.seed_resource = closure[0]
+        self.expected = set(closure)
+        self.graphs = [Graph() for _ in range(nb_endpoints)]
+
+        self._link_tree(closure, rng)
+        for path in noise_paths:
+            noise = [term for term in read_terms(path) if term not in self.expected]
+            rng.shuffle(noise)
+            self._link_tree(noise, rng)
+
+    def _link_tree(self, terms: [str], rng: random.Random):
+        """
+        Links terms with a random tree, the first term is the root and the relationship is stored by the endpoint of
+        the authority of the child.
+        """
+        for i in range(1, len(terms)):
+            parent = terms[rng.randrange(i)]
+            graph = self.graphs[sum(authority(terms[i]).encode("utf-8")) % len(self.graphs)]
+            graph.add((URIRef(terms[i]), OWL.sameAs, URIRef(parent)))
@@ -0,0 +1,183 @@
+import time
+import random
+import argparse
+
+from SPARQLWrapper import SPARQLWrapper
+
+from samelive.utils.config import Config
+from samelive.utils.iodata import Output
+from samelive.benchmark.e2e import clear_store
+
+PREFIXES = """
+    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+    PREFIX owl: <http://www.w3.org/2002/07/owl#>
+    PREFIX void: <http://rdfs.org/ns/void#>
+    PREFIX same: <https://ns.inria.fr/same/same.owl#>
+    PREFIX kg: <http://ns.inria.fr/corese/kgram/>
+"""
+
+
+class SyntheticIdentityGraph(object):
+    """
+    Local state of the algorithm after an exploration, generated synthetically: chains of owl:sameAs relationships
+    start from the seed (one iteration per link), some rotten links towards resources sharing the authority of a
+    resource of the chains are injected, and alleged (inverse) functional properties are described for the voting
+    and the statistics.
+    """
+    def __init__(self, nb_uris: int, nb_authorities: int = None, chain_length: int = 5, nb_rotten: int = 0,
+                 nb_datasets: int = 10, seed: int = 0):
+        """
+        :param nb_uris: int, number of resources of the chains.
+        :param nb_authorities: int, number of distinct authorities of the resources of the chains (as many as
+        resources if None, resources sharing an authority are detected as rotten by R1 and R2).
+        :param chain_length: int, number of links of a chain, hence number of iterations.
+        :param nb_rotten: int, number of injected rotten links.
+        :param nb_datasets: int, number of datasets providing the relationships.
+        :param seed: int, seed of the random generation.
+        """
+        rng = random.Random(seed)
+        nb_authorities = nb_authorities or nb_uris
+        self.chain_length = chain_length
+        # Named graph (None for the default graph): list of triples
+        self.graphs = {}
+        # Descriptions of the injected rotten resources in same:Q-1, as left by R1 and R2 (see load)
+        self.rotten = []
+        self.seed_resource = "http://seed.example.org/resource/Seed"
+        self._add_target(self.seed_resource, 0, None)
+
+        resources = []
+        for i in range(nb_uris):
+            chain, position = divmod(i, chain_length)
+            iteration = position + 1
+            resource = "http://a%d.example.org/resource/c%d_%d" % (i % nb_authorities, chain, position)
+            previous = self.seed_resource if position == 0 else resources[-1][0]
+            dataset = "http://d%d.example.org/sparql" % rng.randrange(nb_datasets)
+            self._add_target(resource, iteration, dataset)
+            self._add_sameas(previous, resource, iteration, dataset)
+            resources.append((resource, iteration))
+
+        for i in range(min(nb_rotten, len(resources))):
+            resource, iteration = resources[rng.randrange(len(resources))]
+            rotten = resource.rsplit("/", 1)[0] + "/rotten%d" % i
+            dataset = "http://d%d.example.org/sparql" % rng.randrange(nb_datasets)
+            self._add_target(rotten, iteration + 1, dataset)
+            self._add_sameas(resource, rotten, iteration + 1, dataset)
+            self.rotten.append(self._description(rotten, "same:Rotten", dataset))
+
+        nb_properties = max(nb_uris // 10, 1)
+        for i in range(nb_properties):
+            prop = "<http://p%d.example.org/ns#property%d>" % (i, i)
+            prop_type = "owl:InverseFunctionalProperty" if i % 2 == 0 else "owl:FunctionalProperty"
+            properties = self.graphs.setdefault("same:Properties", [])
+            properties.append(prop + " a " + prop_type + " ; same:hasNamespace \"http://p%d.example.org/ns#\"" % i)
+            for j in rng.sample(range(nb_datasets), min(3, nb_datasets)):
+                dataset = "<http://d%d.example.org/sparql>" % j
+                properties.append("<< " + prop + " a " + prop_type + " >> same:statementInDataset " + dataset)
+                properties.append(dataset + " same:hasSchemaFor " + prop)
+            if i % 4 < 2:
+                self.graphs.setdefault("same:PropertiesNotDeferenced", []).append(prop + " a " + prop_type)
+            else:
+                self.graphs.setdefault("kg:default", []).append(prop + " a " + prop_type)
+
+    @staticmethod
+    def _description(resource: str, resource_type: str, dataset: str) -> str:
+        no_scheme = resource.split("://", 1)[1]
+        description = "<%s> a %s ; same:hasNamespace \"%s\" ; same:hasAuthority \"%s\" ; same:hasValueWithNoScheme " \
+                      "\"%s\"" % (resource, resource_type, resource.rsplit("/", 1)[0] + "/", no_scheme.split("/", 1)[0],
+                                   no_scheme)
+        if dataset is not None:
+            description += " ; void:inDataset <%s.dataset>" % dataset
+        return description
+
+    def _add_target(self, resource: str, iteration: int, dataset: str):
+        graph = "same:Q%d" % iteration
+        if graph not in self.graphs:
+            self.graphs.setdefault(None, []).append(graph + " same:hasIteration %d" % iteration)
+        self.graphs.setdefault(graph, []).append(self._description(resource, "same:Target", dataset))
+
+    def _add_sameas(self, resource1: str, resource2: str, iteration: int, dataset: str):
+        graph = "<%s#%dS1>" % (dataset, iteration)
+        if graph not in self.graphs:
+            self.graphs.setdefault(None, []).append(graph + " same:hasIteration %d" % iteration)
+        self.graphs.setdefault(graph, []).extend(["<%s> owl:sameAs <%s>" % (resource1, resource2),
+                                                  "<%s> owl:sameAs <%s>" % (resource2, resource1)])
+
+    def load(self, endpoint: str, batch_size: int = 5000, rotten: bool = False):
+        """
+        Loads the graph in a triplestore with INSERT DATA queries of at most batch_size triples.
+        :param endpoint: String, URL of the triplestore.
+        :param batch_size: int, number of triples per query.
+        :param rotten: bool, also describes the injected rotten resources as same:Rotten in same:Q-1 (the state
+        cleaned by CR1).
+        """
+        sparql = SPARQLWrapper(endpoint)
+        sparql.method = 'POST'
+        sparql.setRequestMethod('postdirectly')
+        graphs = dict(self.graphs, **{"same:Q-1": self.rotten}) if rotten else self.graphs
+        for graph, triples in graphs.items():
+            for i in range(0, len(triples), batch_size):
+                data = " .\n".join(triples[i:i + batch_size])
+                if graph is not None:
+                    data = "GRAPH %s { %s }" % (graph, data)
+                sparql.setQuery(PREFIXES + "INSERT DATA { %s }" % data)
+                sparql.query()
+
+
+def time_stages(endpoint: str, graph: SyntheticIdentityGraph) -> dict:
+    """
+    Times the stages run on the local triplestore. The store is cleared and the graph loaded again before each stage,
+    which runs on a new instance: a stage does not work on the state left by the previous ones (e.g. CR1 would find
+    the rotten resources already cleaned by R1 and R2, which call it).
+    :param endpoint: String, URL of the triplestore, its data is cleared.
+    :param graph: SyntheticIdentityGraph, generated graph.
+    :return: Dict, name of the stage: time in seconds.
+    """
+    Config.master_endpoint = endpoint
+    # Imported after the configuration of the triplestore
+    from samelive.query.querymanager import LocalManipulation, ErrorDetection
+    from samelive.query.stats import Statistics
+
+    # Name of the stage: function creating the stage to time
+    stages = {
+        # CR1 is called by R1 and R2
+        "R1": lambda: lambda: ErrorDetection().rotten_sameas(graph.chain_length),
+        "R2": lambda: lambda: ErrorDetection().rotten_sameas2(graph.chain_length),
+        "CR1": lambda: ErrorDetection().rotten_sameas_cleanup,
+        "V-(I)FP1": lambda: LocalManipulation().voting_functionalproperties,
+        "Statistics": lambda: Statistics().compute_stats,
+    }
+    timings = {}
+    for name, create_stage in stages.items():
+        clear_store(endpoint)
+        # CR1 cleans the same:Rotten found by R1 and R2
+        graph.load(endpoint, rotten=name == "CR1")
+        stage = create_stage()
+        start = time.perf_counter()
+        stage()
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Times the stages of SameLive run on the local triplestore with "
+                                                 "synthetic identity graphs of increasing sizes.")
+    parser.add_argument("--master", required=True,
+                        help="URL of a triplestore dedicated to the benchmark, its data is cleared.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="Numbers of resources of the generated graphs.")
+    parser.add_argument("--authorities", type=int, default=None)
+    parser.add_argument("--chain-length", type=int, default=5)
+    parser.add_argument("--rotten", type=float, default=0.01, help="Fraction of injected rotten links.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=Config.project_path + "/bench_output/local_stages.csv",
+                        help="CSV file of the scaling curves.")
+    args = parser.parse_args()
+
+    rows = [["nb_uris", "stage", "seconds"]]
+    for size in args.sizes:
+        graph = SyntheticIdentityGraph(size, args.authorities, args.chain_length, int(size * args.rotten),
+                                       seed=args.seed)
+        for name, seconds in time_stages(args.master, graph).items():
+            print("%8d %-12s %10.3f s" % (size, name, seconds))
+            rows.append([size, name, round(seconds, 6)])
+    Output().save_csv(rows, args.output)
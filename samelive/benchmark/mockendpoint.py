@@ -0,0 +1,154 @@
+import time
+import zlib
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from rdflib import Graph, Literal, URIRef, BNode
+from rdflib.plugins.sparql import prepareQuery
+
+from samelive.query.querymanager import EmbeddedStore
+
+
+class MockEndpoint(object):
+    """
+    Local stand-in of a SPARQL endpoint of the LOD cloud answering SELECT and ASK queries on an in-memory rdflib graph,
+    with injectable latency, failures and limit number of results.
+    """
+    def __init__(self, graph: Graph, latency: float = 0.0, failure_rate: float = 0.0, results_limit: int = None,
+                 supports_values: bool = True, supports_non_ascii: bool = True, seed: int = 0):
+        """
+        :param graph: Graph, data of the endpoint.
+        :param latency: float, delay in seconds added to each answer.
+        :param failure_rate: float, fraction of the queries answered with an HTTP error 503, the failing queries are
+        chosen deterministically from their text and the seed.
+        :param results_limit: int, maximum number of results returned (announced with the X-SPARQL-MaxRows header
+        when the results are truncated), unlimited if None.
+        :param supports_values: bool, rejects the queries with a VALUES clause if False.
+        :param supports_non_ascii: bool, rejects the queries with non-ASCII characters if False.
+        :param seed: int, seed of the failures.
+        """
+        self.graph = graph
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.results_limit = results_limit
+        self.supports_values = supports_values
+        self.supports_non_ascii = supports_non_ascii
+        self.seed = seed
+        self.nb_queries = 0
+        self.server = None
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return "http://127.0.0.1:%d/sparql" % self.server.server_port
+
+    def start(self, port: int = 0):
+        """
+        Starts the endpoint in a background thread.
+        :param port: int, port of the endpoint, a free port is chosen if 0.
+        """
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), _handler(self))
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def answer(self, query: str, accept: str) -> (int, dict, bytes):
+        """
+        Answers a query.
+        :param query: String, SPARQL query.
+        :param accept: String, Accept header of the request.
+        :return: Tuple, HTTP status code, headers and body of the answer.
+        """
+        with self._lock:
+            self.nb_queries += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+        if self.failure_rate > 0 and \
+                zlib.crc32((str(self.seed) + query).encode("utf-8")) / 2 ** 32 < self.failure_rate:
+            return 503, {}, b"Service unavailable"
+        if (not self.supports_non_ascii and not query.isascii()) or \
+                (not self.supports_values and "VALUES" in query.upper()):
+            return 400, {}, b"Unsupported query"
+        try:
+            with EmbeddedStore.parser_lock:
+                query = prepareQuery(query)
+            result = self.graph.query(query)
+        except Exception as err:
+            return 400, {}, str(err).encode("utf-8")
+
+        headers = {}
+        if result.type == "SELECT":
+            rows = list(result)
+            if self.results_limit is not None and len(rows) > self.results_limit:
+                rows = rows[:self.results_limit]
+                headers["X-SPARQL-MaxRows"] = str(self.results_limit)
+            result.bindings = [dict(zip(result.vars, row)) for row in rows]
+            if "tab-separated-values" in accept:
+                headers["Content-Type"] = "text/tab-separated-values; charset=utf-8"
+                return 200, headers, _serialize_tsv(result.vars, rows)
+        if "json" in accept or "xml" not in accept:
+            headers["Content-Type"] = "application/sparql-results+json"
+            return 200, headers, result.serialize(format="json")
+        headers["Content-Type"] = "application/sparql-results+xml"
+        return 200, headers, result.serialize(format="xml")
+
+
+def _serialize_tsv(variables: list, rows: list) -> bytes:
+    """
+    Serializes SELECT results in the SPARQL TSV format.
+    """
+    lines = ["\t".join("?" + str(var) for var in variables)]
+    for row in rows:
+        lines.append("\t".join(_tsv_term(term) for term in row))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _tsv_term(term) -> str:
+    if term is None:
+        return ""
+    if isinstance(term, URIRef):
+        return "<" + str(term) + ">"
+    if isinstance(term, BNode):
+        return "_:" + str(term)
+    literal = '"' + str(term).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r") \
+        .replace("\t", "\\t") + '"'
+    if isinstance(term, Literal) and term.language is not None:
+        return literal + "@" + term.language
+    if isinstance(term, Literal) and term.datatype is not None:
+        return literal + "^^<" + str(term.datatype) + ">"
+    return literal
+
+
+def _handler(endpoint: MockEndpoint):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            params = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+            self._answer(params.get("query", [""])[0])
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+            if self.headers.get("Content-Type", "").startswith("application/sparql-query"):
+                self._answer(body)
+            else:
+                self._answer(urllib.parse.parse_qs(body).get("query", [""])[0])
+
+        def _answer(self, query: str):
+            status, headers, body = endpoint.answer(query, self.headers.get("Accept", ""))
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
@@ -0,0 +1,56 @@
+import sys
+import argparse
+import statistics
+import subprocess
+
+from samelive.utils.config import Config
+from samelive.utils.iodata import Output
+
+# Modules imported by each subcommand of samelive/cli.py and its startup time budget in seconds (time to import the
+# command line and the modules, interpreter startup excluded), None if the subcommand has no budget
+SUBCOMMANDS = {
+    "status": (["samelive.computing.checkpoint"], 0.05),
+    "export": (["samelive.computing.snapshot", "samelive.computing.export_result"], 0.05),
+    "stats": (["samelive.query.stats"], None),
+    "probe": (["samelive.query.monitoring"], None),
+    "setup": (["samelive.computing.main"], None),
+    "run": (["samelive.computing.main"], None),
+}
+
+# Measures the imports in a fresh interpreter, the modules are not cached by a previous measure
+MEASURE = """
+import time
+start = time.perf_counter()
+import samelive.cli
+%s
+print(time.perf_counter() - start)
+"""
+
+
+def startup_time(modules: [str]) -> float:
+    """
+    Measures the time to import the command line and modules in a new interpreter.
+    :param modules: List of String, modules imported by a subcommand.
+    :return: float, time in seconds.
+    """
+    code = MEASURE % "\n".join("import " + module for module in modules)
+    return float(subprocess.run([sys.executable, "-c", code], capture_output=True, check=True, text=True,
+                                cwd=Config.project_path).stdout)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measures the startup time of the subcommands of the command line.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of measures per subcommand (median).")
+    parser.add_argument("--output", default=Config.project_path + "/bench_output/startup.csv")
+    args = parser.parse_args()
+
+    rows = [["subcommand", "seconds", "budget"]]
+    exceeded = False
+    for name, (modules, budget) in SUBCOMMANDS.items():
+        seconds = statistics.median(startup_time(modules) for _ in range(args.repeat))
+        exceeded |= budget is not None and seconds > budget
+        print("%-8s %8.3f s %s" % (name, seconds, "" if budget is None else
+                                   "(budget %.3f s%s)" % (budget, ", exceeded" if seconds > budget else "")))
+        rows.append([name, round(seconds, 6), budget])
+    Output().save_csv(rows, args.output)
+    sys.exit(1 if exceeded else 0)
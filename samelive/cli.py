@@ -0,0 +1,176 @@
+import os
+import sys
+import json
+import argparse
+
+from samelive.utils.config import Config
+
+# The modules of a subcommand are imported when it runs: the local stores, rdflib, requests and SPARQLWrapper are only
+# loaded by the subcommands using them (see samelive/benchmark/startup.py for the startup time of each subcommand).
+
+
+def _checkpoint(args):
+    """
+    :param args: Namespace, arguments with the options --checkpoint and --no-checkpoint.
+    :return: Checkpoint, checkpoints of the run, None if they are disabled.
+    """
+    from samelive.computing.checkpoint import Checkpoint
+    return None if args.no_checkpoint else Checkpoint(args.checkpoint)
+
+
+def setup(args):
+    """
+    Initializes the local store (vocabulary, endpoints, seeds and (inverse) functional properties) and writes a
+    checkpoint, the iterations are then performed with run --resume.
+    """
+    from samelive.computing import main
+    from samelive.query.querymanager import get_local_store
+    from samelive.utils.instrumentation import StageTimer
+
+    timer = StageTimer(Config.profile())
+    main.setup_run(args.seeds, Config.endpoints_dict, not args.no_catalogs, timer)
+    checkpoint = _checkpoint(args)
+    if checkpoint is not None:
+        checkpoint.save(get_local_store(), 1, [])
+    print(timer.report())
+
+
+def run(args):
+    """
+    Computes the equivalence links of the seeds.
+    """
+    from samelive.computing import main
+
+    main.run(args.seeds, Config.endpoints_dict, not args.no_catalogs, checkpoint=_checkpoint(args),
+             resume=args.resume, snapshot=None if args.no_snapshot else args.snapshot)
+
+
+def export(args):
+    """
+    Exports the identity sets computed in the triplestore or in a snapshot.
+    """
+    from samelive.computing.snapshot import Snapshot
+    from samelive.computing.export_result import ExportResult
+
+    ExportResult(args.endpoint, args.page_size, Snapshot(args.snapshot) if args.snapshot else None) \
+        .export_all(args.sets, args.format, args.output)
+
+
+def stats(args):
+    """
+    Prints the statistics on the (inverse) functional properties and writes them in same:Statistics.
+    """
+    from samelive.query.stats import Statistics
+
+    statistics = Statistics()
+    if not args.no_store:
+        statistics.compute_stats()
+    print(json.dumps(statistics.report(), indent=2))
+
+
+def probe(args):
+    """
+    Probes the endpoints of same:N: availability, support of the VALUES clause and of non-ASCII characters, results
+    limit.
+    """
+    from samelive.query.monitoring import Monitoring
+
+    monitoring = Monitoring()
+    monitoring.endpoints_availability()
+    if Config.IS_CORESE_ENGINE:
+        monitoring.handle_values_clause()
+    if Config.NON_ASCII_CHARACTERS_HANDLING:
+        monitoring.handle_non_ascii_character()
+    if args.limits:
+        monitoring.has_limit()
+
+
+def status(args):
+    """
+    Prints the state of the last checkpoint.
+    """
+    from samelive.computing.checkpoint import Checkpoint
+
+    state = Checkpoint(args.checkpoint).load()
+    if state is None:
+        print("No checkpoint in " + args.checkpoint)
+        return
+    print("Checkpoint of %s: iteration %d, stages performed: %s"
+          % (state["date"], state["iteration"], ", ".join(state["stages"]) or "none"))
+
+
+def parser() -> argparse.ArgumentParser:
+    """
+    :return: ArgumentParser, parser of the command line with one subparser per subcommand.
+    """
+    # The sets and formats are the keys of IDENTITY_SETS and FORMATS of export_result.py, written here to not import it
+    sets, formats = ["O1", "O2"], ["csv", "nt", "parquet"]
+
+    root = argparse.ArgumentParser(prog="samelive", description="Computes the identity sets of resources of the LOD.")
+    root.add_argument("--config", help="Profile (.toml, .yaml or .yml) overriding the attributes of Config, the "
+                                       "environment variables SAMELIVE_<ATTRIBUTE> take precedence.")
+    subparsers = root.add_subparsers(dest="command", required=True)
+
+    for name, function, description in [("setup", setup, "Initializes the local store and writes a checkpoint."),
+                                         ("run", run, "Computes the equivalence links of the seed resources.")]:
+        command = subparsers.add_parser(name, help=description, description=description)
+        command.set_defaults(function=function)
+        command.add_argument("--seeds", nargs="+", default=Config.resources_list,
+                             help="Seed resources populated in same:Q0.")
+        command.add_argument("--no-catalogs", action="store_true",
+                             help="Only uses the endpoints of Config.endpoints_dict.")
+        command.add_argument("--checkpoint", default=Config.checkpoint_folder, help="Folder of the checkpoints.")
+        command.add_argument("--no-checkpoint", action="store_true")
+    command = subparsers.choices["run"]
+    command.add_argument("--resume", action="store_true",
+                         help="Continues from the last checkpoint (the local store is replaced with its data).")
+    command.add_argument("--snapshot", default=Config.snapshot_path,
+                         help="Binary snapshot of the closure written at the end of the run.")
+    command.add_argument("--no-snapshot", action="store_true")
+
+    description = "Exports the identity sets computed in the triplestore."
+    command = subparsers.add_parser("export", help=description, description=description)
+    command.set_defaults(function=export)
+    command.add_argument("--sets", nargs="+", choices=sets, default=sets)
+    command.add_argument("--format", choices=formats, default="csv")
+    command.add_argument("--output", default=Config.project_path + "/resource/evaluation")
+    command.add_argument("--endpoint", default=Config.master_endpoint)
+    command.add_argument("--page-size", type=int, default=Config.export_page_size)
+    command.add_argument("--snapshot", default=None,
+                         help="Binary snapshot of a closure (see snapshot.py) exported instead of the triplestore.")
+
+    description = "Prints the statistics on the (inverse) functional properties."
+    command = subparsers.add_parser("stats", help=description, description=description)
+    command.set_defaults(function=stats)
+    command.add_argument("--no-store", action="store_true", help="Does not write them in same:Statistics.")
+
+    description = "Probes the capabilities of the endpoints of same:N."
+    command = subparsers.add_parser("probe", help=description, description=description)
+    command.set_defaults(function=probe)
+    command.add_argument("--limits", action="store_true", help="Also probes the results limit of the endpoints.")
+
+    description = "Prints the state of the last checkpoint."
+    command = subparsers.add_parser("status", help=description, description=description)
+    command.set_defaults(function=status)
+    command.add_argument("--checkpoint", default=Config.checkpoint_folder, help="Folder of the checkpoints.")
+    return root
+
+
+def main(argv: [str] = None):
+    """
+    Entry point of the command line samelive.
+    :param argv: List of String, arguments of the command line, sys.argv[1:] if None.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    # The profile is loaded before the parser, which reads the defaults of its options in Config
+    profile = argparse.ArgumentParser(add_help=False)
+    profile.add_argument("--config")
+    path = profile.parse_known_args(argv)[0].config
+    if path is not None:
+        Config.load(path, os.environ)
+    args = parser().parse_args(argv)
+    args.function(args)
+
+
+if __name__ == '__main__':
+    main()
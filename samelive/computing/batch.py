@@ -0,0 +1,141 @@
+import time
+import argparse
+import traceback
+import concurrent.futures
+
+from samelive.utils.config import Config
+from samelive.utils.iodata import Output
+from samelive.utils.cache import LookupCache
+from samelive.query.querymanager import EmbeddedStore, Setup, LocalManipulation, EndpointExploration, \
+    ErrorDetection
+from samelive.query.monitoring import Monitoring
+
+
+def read_seeds(path: str) -> [str]:
+    """
+    Reads a file of seeds, one IRI per line (empty lines and lines starting with # are ignored).
+    :param path: String, path of the file.
+    :return: List of String, seeds in the order of the file without duplicates.
+    """
+    with open(path, encoding="utf-8") as seeds_file:
+        return list(dict.fromkeys(line.strip() for line in seeds_file
+                                  if line.strip() != "" and not line.startswith("#")))
+
+
+class BatchResolver(object):
+    """
+    Computes the closures of many seeds concurrently in one process. Each seed is explored in its own embedded store
+    initialized from a registry of the endpoints built once, and the answers of the remote endpoints are shared by the
+    seeds so that an IRI appearing in several closures is only looked up once per endpoint.
+    """
+    def __init__(self, endpoints_dict: dict = Config.endpoints_dict, load_catalogs: bool = True,
+                 workers: int = Config.batch_workers):
+        """
+        :param endpoints_dict: Dict, a void:Dataset and its SPARQL endpoint (between angle brackets) to add in same:N.
+        :param load_catalogs: bool, retrieves the endpoints of the catalogs, only the endpoints of endpoints_dict are
+        used otherwise.
+        :param workers: int, number of seeds explored concurrently.
+        """
+        self.workers = workers
+        self.lookups = LookupCache(Config.lookup_cache_size, Config.lookup_cache_ttl)
+        self.registry = EmbeddedStore()
+
+        # :label: N1 to N5, CN1, P1 and A1 are performed once for all the seeds
+        setup = Setup(self.registry)
+        setup.setup_vocabulary()
+        if load_catalogs:
+            setup.populate_lodcloud()
+            setup.populate_umakata()
+            setup.populate_linkedwiki()
+            setup.populate_datahub()
+            setup.cleanup_datasets()
+        setup.populate([], endpoints_dict)
+        monitoring = Monitoring(self.registry)
+        monitoring.endpoints_availability()
+        monitoring.handle_values_clause()
+        if Config.NON_ASCII_CHARACTERS_HANDLING:
+            monitoring.handle_non_ascii_character()
+
+    def resolve(self, seed: str) -> dict:
+        """
+        Computes the closure of a seed.
+        :param seed: String, IRI of the seed.
+        :return: Dict, same:Target and same:Rotten resources of the closure and number of iterations.
+        """
+        store = self.registry.copy()
+        Setup(store).populate([seed])
+        local_manipulation = LocalManipulation(store)
+        endpoint_exploration = EndpointExploration(store, self.lookups)
+        error_detection = ErrorDetection(store)
+
+        iteration = 1
+        while len(local_manipulation.get_targets(iteration)) != 0:
+            # :label: S1, R1 and R2
+            endpoint_exploration.retrieve_sameas(iteration)
+            error_detection.rotten_sameas(iteration)
+            error_detection.rotten_sameas2(iteration)
+            iteration += 1
+        error_detection.rotten_sameas2(iteration)
+
+        closure = {"Target": [], "Rotten": []}
+        for binding in store.select("""
+            PREFIX same: <https://ns.inria.fr/same/same.owl#>
+            SELECT DISTINCT ?resource ?type
+            WHERE {
+              ?resource a ?type
+              FILTER(?type IN (same:Target, same:Rotten))
+            }
+        """):
+            closure[binding["type"].rsplit("#", 1)[-1]].append(binding["resource"])
+        return {"targets": closure["Target"], "rottens": closure["Rotten"], "iterations": iteration - 1}
+
+    def resolve_all(self, seeds: [str]):
+        """
+        Computes the closures of seeds concurrently.
+        :param seeds: List of String, IRIs of the seeds.
+        :return: Generator of tuples, a seed and its closure (see resolve) in the order of completion, the closure is
+        None if its computation failed.
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.resolve, seed): seed for seed in seeds}
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    yield futures[future], future.result()
+                except Exception as err:
+                    traceback.print_tb(err.__traceback__)
+                    yield futures[future], None
+
+
+def closure_rows(results):
+    """
+    Rows of the closures to save in a csv file.
+    :param results: Iterable of tuples, a seed and its closure (see BatchResolver.resolve_all).
+    :return: Generator of lists, header then seed, term and type (same:Target or same:Rotten) of the resources.
+    """
+    yield ["seed", "term", "type"]
+    for seed, closure in results:
+        if closure is None:
+            print("Failed: " + seed)
+            continue
+        print("%s: %d same:Target, %d same:Rotten, %d iterations" % (seed, len(closure["targets"]),
+                                                                      len(closure["rottens"]), closure["iterations"]))
+        for term in closure["targets"]:
+            yield [seed, term, "Target"]
+        for term in closure["rottens"]:
+            yield [seed, term, "Rotten"]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Computes the closures of the seeds of a file concurrently.")
+    parser.add_argument("seeds", help="File of seeds, one IRI per line.")
+    parser.add_argument("--output", default=Config.project_path + "/resource/batch/closures.csv")
+    parser.add_argument("--workers", type=int, default=Config.batch_workers)
+    parser.add_argument("--no-catalogs", action="store_true",
+                        help="Only uses the endpoints of Config.endpoints_dict.")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    resolver = BatchResolver(load_catalogs=not args.no_catalogs, workers=args.workers)
+    Output().save_csv(closure_rows(resolver.resolve_all(read_seeds(args.seeds))), args.output)
+    print("Remote lookups: %d, shared: %d" % (resolver.lookups.nb_misses, resolver.lookups.nb_hits))
+    print("--- %s seconds ---" % (time.time() - start_time))
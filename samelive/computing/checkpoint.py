@@ -0,0 +1,128 @@
+import os
+import re
+import json
+import glob
+import pathlib
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from samelive.query.querymanager import LocalStore
+
+# Named graphs changed by the stages of the iterations: same:Target and same:Rotten of the iterations, deferred
+# candidates, values of the (inverse) functional properties and owl:sameAs relationships with their provenance
+# (<endpoint#{iteration}{stage}>, see querymanager.PROVENANCE_GRAPH)
+RUN_GRAPH = re.compile(r"<(?:https://ns\.inria\.fr/same/same\.owl#"
+                       r"(?:Q-?\d+|Deferred|(?:Inverse)?FunctionalProperty_\d+)|.+#\d+(?:S1|IFP2)?)>")
+
+
+class Checkpoint(object):
+    """
+    Checkpoints of a run of the algorithm written in a folder: a dump of the local store and a JSON file giving the
+    iteration and the stages of this iteration already performed. The data which does not change during the iterations
+    (vocabularies, catalogs, same:N, schemas of the properties...) is dumped once by the first checkpoint of a run
+    (base), the next checkpoints only dump the named graphs changed by the stages (RUN_GRAPH) and the description of
+    these graphs and of their executions in the default graph. The files are written atomically, an interrupted
+    checkpoint leaves the previous one intact. A stage interrupted before its checkpoint is performed again.
+    """
+    STATE_FILE = "state.json"
+
+    def __init__(self, folder: str):
+        """
+        :param folder: String, folder of the checkpoints.
+        """
+        self.folder = folder
+        # Dump of the data which does not change during the iterations, written by the first checkpoint of the run
+        self.base = None
+
+    def save(self, store: "LocalStore", iteration: int, stages: [str]):
+        """
+        Writes a checkpoint of the local store.
+        :param store: LocalStore, store of the local state of the algorithm.
+        :param iteration: int, current iteration of the algorithm.
+        :param stages: List of String, stages of the current iteration already performed (e.g. S1, R1).
+        """
+        pathlib.Path(self.folder).mkdir(parents=True, exist_ok=True)
+        graphs = store.graphs()
+        run_graphs = [g for g in graphs if RUN_GRAPH.fullmatch(g)]
+        subjects = self.described_subjects(store)
+        if self.base is None:
+            base = "base-%d-%d.nq" % (iteration, len(stages))
+            _write_atomically(os.path.join(self.folder, base),
+                              lambda path: store.dump(path, [g for g in graphs if g not in run_graphs], subjects,
+                                                      exclude=True))
+            self.base = base
+        dump = "store-%d-%d.nq" % (iteration, len(stages))
+        _write_atomically(os.path.join(self.folder, dump),
+                          lambda path: store.dump(path, run_graphs + [store.default_graph], subjects))
+        state = {"iteration": iteration, "stages": stages, "base": self.base, "dump": dump,
+                 "date": datetime.now().isoformat()}
+        _write_atomically(os.path.join(self.folder, self.STATE_FILE),
+                          lambda path: pathlib.Path(path).write_text(json.dumps(state, indent=2), encoding="utf-8"))
+        # The previous dumps are no longer referenced
+        for path in glob.glob(os.path.join(self.folder, "store-*.nq")) + \
+                glob.glob(os.path.join(self.folder, "base-*.nq")):
+            if os.path.basename(path) not in (dump, self.base):
+                os.remove(path)
+
+    def load(self) -> dict:
+        """
+        Reads the last checkpoint.
+        :return: Dict, state of the last checkpoint (see save), None if there is no checkpoint.
+        """
+        path = os.path.join(self.folder, self.STATE_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as state_file:
+            return json.load(state_file)
+
+    def restore(self, store: "LocalStore") -> dict:
+        """
+        Replaces the data of the local store with the data of the last checkpoint.
+        :param store: LocalStore, store of the local state of the algorithm.
+        :return: Dict, state of the last checkpoint (see save), None if there is no checkpoint.
+        """
+        state = self.load()
+        if state is not None:
+            # Checkpoints written before the base dumps hold the whole store in their dump
+            if "base" in state:
+                store.restore(os.path.join(self.folder, state["base"]))
+                store.load(os.path.join(self.folder, state["dump"]))
+                self.base = state["base"]
+            else:
+                store.restore(os.path.join(self.folder, state["dump"]))
+        return state
+
+    @staticmethod
+    def described_subjects(store: "LocalStore") -> set:
+        """
+        Lists the resources described in the default graph by the stages: named graphs of the iterations and
+        executions of the stages.
+        :param store: LocalStore, store of the local state of the algorithm.
+        :return: Set of String, IRIs in the SPARQL syntax.
+        """
+        return {j["s"] for j in store.select("""
+            PREFIX prov: <http://www.w3.org/ns/prov#>
+            PREFIX same: <https://ns.inria.fr/same/same.owl#>
+            SELECT DISTINCT ?s
+            WHERE {
+              GRAPH %s {
+                { ?s same:hasIteration ?iteration }
+                UNION
+                { ?ngraph prov:wasGeneratedBy ?s }
+              }
+            }
+        """ % store.default_graph, terms=True)}
+
+
+def _write_atomically(path: str, write):
+    """
+    Writes a file through a temporary file renamed once it is complete.
+    :param path: String, path of the file.
+    :param write: Function writing the content in the file of the path given as argument.
+    """
+    temporary_path = path + ".tmp"
+    write(temporary_path)
+    with open(temporary_path, "rb+") as temporary_file:
+        os.fsync(temporary_file.fileno())
+    os.replace(temporary_path, path)
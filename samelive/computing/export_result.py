@@ -1,59 +1,209 @@
+import sys
 import traceback
+import concurrent.futures
+
 from samelive.utils.config import Config
+from samelive.utils.helper import Helper
 from samelive.utils.iodata import Output
-from SPARQLWrapper import SPARQLWrapper, JSON, N3, XML
-
-master_endpoint = Config.master_endpoint
+from samelive.utils.identity import IdentityGraph
+from samelive.computing.snapshot import Snapshot, TARGET, ROTTEN
 
-sparql = SPARQLWrapper(master_endpoint)
-sparql.method = 'POST'
-sparql.setReturnFormat(JSON)
-sparql.setQuery("""
-    PREFIX same: <https://ns.inria.fr/same/same.owl#>
-    SELECT DISTINCT ?URITarget
-    WHERE {
-        ?URITarget a same:Target
-    }
-""")
-resources = []
-try:
-    json = sparql.query().convert()["results"]["bindings"]
-    resources = [j["URITarget"]["value"] for j in json]
-except Exception as err:
-    traceback.print_tb(err)
-
-data = [["new_eq_id", "term"]]
-# Value to distinguish the set
-i = 1
-for v in resources:
-    data.append([i, v])
-
-path = Config.project_path + "/resource/evaluation/O1.csv"
-Output().save_csv(data, path)
-
-sparql.setQuery("""
-    PREFIX same: <https://ns.inria.fr/same/same.owl#>
-    SELECT DISTINCT ?URITarget
-    WHERE {
-      {
-        ?URITarget a same:Rotten
-      } UNION {
+# Graph patterns binding ?URITarget for each exported set, O1 only includes resources of type same:Target, O2 contains
+# both resources of types same:Target and same:Rotten.
+IDENTITY_SETS = {
+    "O1": """
         ?URITarget a same:Target
-      }
-    }
-""")
-resources = []
-try:
-    json = sparql.query().convert()["results"]["bindings"]
-    resources = [j["URITarget"]["value"] for j in json]
-except Exception as err:
-    traceback.print_tb(err)
-
-data = [["new_eq_id", "term"]]
-# Value to distinguish the set
-i = 1
-for v in resources:
-    data.append([i, v])
-
-path = Config.project_path + "/resource/evaluation/O2.csv"
-Output().save_csv(data, path)
+    """,
+    "O2": """
+        {
+          ?URITarget a same:Rotten
+        } UNION {
+          ?URITarget a same:Target
+        }
+    """,
+}
+
+# Flags of the resources of each exported set in a snapshot
+SNAPSHOT_SETS = {"O1": TARGET, "O2": TARGET | ROTTEN}
+
+FORMATS = {"csv": ".csv", "nt": ".nt.gz", "parquet": ".parquet"}
+
+
+class ExportResult(object):
+    def __init__(self, endpoint: str = Config.master_endpoint, page_size: int = Config.export_page_size,
+                 snapshot: Snapshot = None):
+        """
+        :param endpoint: String, SPARQL endpoint of the triplestore.
+        :param page_size: int, number of results requested per page.
+        :param snapshot: Snapshot, closure read instead of the triplestore if not None.
+        """
+        self.endpoint = endpoint
+        self.page_size = page_size
+        self.snapshot = snapshot
+
+    def paginate(self, prefixes: str, variables: [str], pattern: str):
+        """
+        Streams the distinct bindings of a graph pattern page by page, ordered by the string values of the variables.
+        Each page starts after the last binding of the previous one (keyset pagination), the store only sorts the
+        bindings remaining after it instead of skipping an OFFSET of sorted results.
+        :param prefixes: String, prefixes of the query.
+        :param variables: List of String, names of the variables bound to IRIs.
+        :param pattern: String, graph pattern binding the variables.
+        :return: Generator of Dict, bindings of the variables.
+        """
+        keys = ["STR(?%s)" % variable for variable in variables]
+        after = ""
+        while True:
+            count = 0
+            binding = None
+            for binding in Helper.stream_select(self.endpoint, """
+                %s
+                SELECT DISTINCT %s
+                WHERE {
+                  %s
+                  %s
+                }
+                ORDER BY %s
+                LIMIT %d
+            """ % (prefixes, " ".join("?" + variable for variable in variables), pattern, after, " ".join(keys),
+                   self.page_size)):
+                count += 1
+                yield binding
+            if count < self.page_size:
+                break
+            # (k1 > v1) || (k1 = v1 && k2 > v2) || ...
+            last = [Helper.json_term({"type": "literal", "value": binding[variable]}) for variable in variables]
+            after = "FILTER(%s)" % " || ".join(
+                "(" + " && ".join(["%s = %s" % (keys[j], last[j]) for j in range(i)] + ["%s > %s" % (keys[i], last[i])])
+                + ")" for i in range(len(variables)))
+
+    def identity_sets(self) -> IdentityGraph:
+        """
+        Computes the identity sets from the owl:sameAs relationships of the triplestore.
+        :return: IdentityGraph, identity sets of the resources (the snapshot if there is one).
+        """
+        if self.snapshot is not None:
+            return self.snapshot
+        identity = IdentityGraph()
+        for binding in self.paginate("PREFIX owl: <http://www.w3.org/2002/07/owl#>", ["x", "y"], """
+            ?x owl:sameAs ?y
+            # Relationships are stored in both directions
+            FILTER(STR(?x) < STR(?y))
+        """):
+            identity.union(binding["x"], binding["y"])
+        identity.flatten()
+        return identity
+
+    def seeds(self) -> [str]:
+        """
+        Returns the seed resources (same:Target of same:Q0), their identity sets are numbered first.
+        :return: List of String, IRIs of the seeds.
+        """
+        if self.snapshot is not None:
+            return self.snapshot.seeds()
+        return [binding["IRITarget"] for binding in Helper.stream_select(self.endpoint, """
+            PREFIX same: <https://ns.inria.fr/same/same.owl#>
+            SELECT ?IRITarget
+            FROM same:Q0
+            WHERE {
+              ?IRITarget a same:Target
+            }
+        """)]
+
+    def terms(self, name: str):
+        """
+        Streams the resources of an exported set ordered by IRI.
+        :param name: String, name of the set (key of IDENTITY_SETS).
+        :return: Generator of String, IRIs of the resources.
+        """
+        if self.snapshot is not None:
+            yield from self.snapshot.resources(SNAPSHOT_SETS[name])
+            return
+        for binding in self.paginate("PREFIX same: <https://ns.inria.fr/same/same.owl#>", ["URITarget"],
+                                     IDENTITY_SETS[name]):
+            yield binding["URITarget"]
+
+    @staticmethod
+    def numbering(identity: IdentityGraph, seeds: [str]) -> dict:
+        """
+        Numbers the identity sets once for all the exported sets, a new_eq_id names the same identity set in every
+        file. The identity sets of the seeds come first, in the order of the seeds, then the other ones ordered by
+        their smallest IRI.
+        :param identity: IdentityGraph or Snapshot, identity sets of the resources.
+        :param seeds: List of String, seed resources.
+        :return: Dict, representative of an identity set (see find): (new_eq_id, representative in the export), the
+        seed of the identity set or its smallest IRI.
+        """
+        sets = {}
+        for seed in seeds:
+            sets.setdefault(identity.find(seed), (len(sets) + 1, seed))
+        smallest = sorted((min(identity.iri(node) for node in nodes), identity.iri(root))
+                          for root, nodes in identity.identity_sets().items())
+        for representative, root in smallest:
+            sets.setdefault(root, (len(sets) + 1, representative))
+        return sets
+
+    def rows(self, name: str, identity: IdentityGraph, sets: dict):
+        """
+        Streams the rows of an exported set.
+        :param name: String, name of the set (key of IDENTITY_SETS).
+        :param identity: IdentityGraph, identity sets of the resources.
+        :param sets: Dict, numbering of the identity sets (see numbering).
+        :return: Generator of List, the header then a row [new_eq_id, term, representative] per resource.
+        """
+        yield ["new_eq_id", "term", "representative"]
+        for term in self.terms(name):
+            new_eq_id, representative = sets[identity.find(term)]
+            yield [new_eq_id, term, representative]
+
+    def export(self, name: str, path: str, output_format: str, identity: IdentityGraph, sets: dict):
+        """
+        Exports a set of resources with their identity sets.
+        :param name: String, name of the set (key of IDENTITY_SETS).
+        :param path: String, path of the written file.
+        :param output_format: String, csv (new_eq_id;term), nt (gzip compressed N-Triples, each resource is
+        owl:sameAs the representative of its identity set) or parquet (new_eq_id, term).
+        :param identity: IdentityGraph, identity sets of the resources.
+        :param sets: Dict, numbering of the identity sets (see numbering).
+        """
+        rows = self.rows(name, identity, sets)
+        if output_format == "nt":
+            next(rows)
+            Output().save_ntriples_gz(((term, "http://www.w3.org/2002/07/owl#sameAs", representative)
+                                       for _, term, representative in rows), path)
+        else:
+            rows = (row[:2] for row in rows)
+            if output_format == "parquet":
+                Output().save_parquet(rows, path, chunk_size=self.page_size)
+            else:
+                Output().save_csv(rows, path)
+
+    def export_all(self, names: [str], output_format: str = "csv",
+                   directory: str = Config.project_path + "/resource/evaluation"):
+        """
+        Exports several sets of resources in parallel, the identity sets are computed and numbered once for all the
+        sets.
+        :param names: List of String, names of the sets (keys of IDENTITY_SETS).
+        :param output_format: String, csv, nt or parquet.
+        :param directory: String, folder where the files are written.
+        """
+        try:
+            identity = self.identity_sets()
+            if self.snapshot is None:
+                # Resources without owl:sameAs relationship are identity sets of their own
+                for name in names:
+                    for term in self.terms(name):
+                        identity.add_resource(term)
+            sets = self.numbering(identity, self.seeds())
+            with concurrent.futures.ThreadPoolExecutor() as executor:
+                futures = [executor.submit(self.export, name, directory + "/" + name + FORMATS[output_format],
+                                           output_format, identity, sets) for name in names]
+                for future in concurrent.futures.as_completed(futures):
+                    future.result()
+        except Exception as err:
+            traceback.print_tb(err.__traceback__)
+
+
+if __name__ == '__main__':
+    from samelive.cli import main
+    main(["export"] + sys.argv[1:])
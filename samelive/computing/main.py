@@ -1,73 +1,186 @@
+import sys
 import time
-import concurrent.futures
-from functools import partial
+from functools import lru_cache
+from types import SimpleNamespace
 
 from samelive.utils.config import Config
-from samelive.query.querymanager import EndpointExploration, LocalManipulation, ErrorDetection, Setup
+from samelive.utils.instrumentation import StageTimer
+from samelive.query.querymanager import EndpointExploration, LocalManipulation, ErrorDetection, Setup, \
+    get_local_store
 from samelive.query.monitoring import Monitoring
+from samelive.computing.checkpoint import Checkpoint
+from samelive.computing.snapshot import closure_graph, write_snapshot
 
-setup = Setup()
-endpoint_exploration = EndpointExploration()
-local_manipulation = LocalManipulation()
-error_detection = ErrorDetection()
-monitoring = Monitoring()
+# Largest number of same:Target printed at each iteration
+PRINTED_TARGETS = 100
 
-# Traces on the configurations options
-print("Handles (inverse) functional properties: " + str(Config.FUNC_PROP))
-if Config.FUNC_PROP:
-    print("Timeout used to retrieve (inverse) functional properties: " + str(Config.timeout))
-print("Handles non-ASCII characters: " + str(Config.NON_ASCII_CHARACTERS_HANDLING))
 
-if __name__ == '__main__':
-    setup.setup_vocabulary()
-    # :label: N1 to N5
-    # setup.populate_void_rkbexplorer()
-    setup.populate_lodcloud()
-    setup.populate_umakata()
-    setup.populate_linkedwiki()
-    setup.populate_datahub()
-    # :label: CN1
-    setup.cleanup_datasets()
+@lru_cache(maxsize=None)
+def components() -> SimpleNamespace:
+    """
+    Instantiates the objects performing the stages of the algorithm once, on the first run instead of when the module
+    is imported.
+    :return: SimpleNamespace, setup, endpoint_exploration, local_manipulation, error_detection, monitoring and
+    func_prop (the (inverse) functional properties are handled).
+    """
+    # The (inverse) functional properties stages rely on the clause SERVICE and RDF-star
+    func_prop = Config.FUNC_PROP and get_local_store().supports_service
+
+    # Traces on the configurations options
+    print("Local store: " + Config.local_store)
+    print("Handles (inverse) functional properties: " + str(func_prop))
+    if func_prop:
+        print("Timeout used to retrieve (inverse) functional properties: " + str(Config.timeout))
+    print("Handles non-ASCII characters: " + str(Config.NON_ASCII_CHARACTERS_HANDLING))
+    return SimpleNamespace(setup=Setup(), endpoint_exploration=EndpointExploration(),
+                           local_manipulation=LocalManipulation(), error_detection=ErrorDetection(),
+                           monitoring=Monitoring(), func_prop=func_prop)
+
+
+def setup_run(resources_list: list, endpoints_dict: dict, load_catalogs: bool, timer: StageTimer):
+    """
+    Initializes the local store: vocabulary, endpoints, seed resources and (inverse) functional properties.
+    :param resources_list: List of String, seed resources populated in same:Q0.
+    :param endpoints_dict: Dict, a void:Dataset and its SPARQL endpoint (between angle brackets) to add in same:N.
+    :param load_catalogs: bool, retrieves the endpoints of the catalogs, only the endpoints of endpoints_dict are
+    used otherwise.
+    :param timer: StageTimer, measures the time spent in each stage.
+    """
+    c = components()
+    with timer.stage("vocabulary"):
+        c.setup.setup_vocabulary()
+    if load_catalogs:
+        # :label: N1 to N5
+        with timer.stage("N1-N5"):
+            # setup.populate_void_rkbexplorer()
+            c.setup.populate_lodcloud()
+            c.setup.populate_umakata()
+            c.setup.populate_linkedwiki()
+            c.setup.populate_datahub()
+        # :label: CN1
+        with timer.stage("CN1"):
+            c.setup.cleanup_datasets()
     # :label: P1
-    setup.populate(Config.resources_list, Config.endpoints_dict)
+    with timer.stage("P1"):
+        c.setup.populate(resources_list, endpoints_dict)
     # :label: A1
-    monitoring.endpoints_availability()
+    with timer.stage("A1"):
+        c.monitoring.endpoints_availability()
     # Optimizations with the Corese engine
-    if Config.IS_CORESE_ENGINE:
-        monitoring.handle_values_clause()
-    if Config.NON_ASCII_CHARACTERS_HANDLING:
-        monitoring.handle_non_ascii_character()
-    iteration = 1
-    # :label: T1
-    resources_list = local_manipulation.get_targets(iteration)
-    if Config.FUNC_PROP:
+    with timer.stage("capabilities"):
+        if Config.IS_CORESE_ENGINE:
+            c.monitoring.handle_values_clause()
+        if Config.NON_ASCII_CHARACTERS_HANDLING:
+            c.monitoring.handle_non_ascii_character()
+    if c.func_prop:
         # Respectively, :label: G-(I)FP1, LDD-(I)FP1, LDS-(I)FP1 and V-(I)FP1
-        endpoint_exploration.retrieve_functionalproperties_schemas()
-        setup.load_vocabularies_functionalproperties()
-        endpoint_exploration.retrieve_functionalproperties_detectschemas()
-        local_manipulation.voting_functionalproperties()
+        with timer.stage("(I)FP setup"):
+            c.endpoint_exploration.retrieve_functionalproperties_schemas()
+            c.setup.load_vocabularies_functionalproperties()
+            c.endpoint_exploration.retrieve_functionalproperties_detectschemas()
+            c.local_manipulation.voting_functionalproperties()
+
+
+def run(resources_list: list = Config.resources_list, endpoints_dict: dict = Config.endpoints_dict,
+        load_catalogs: bool = True, timer: StageTimer = None, checkpoint: Checkpoint = None,
+        resume: bool = False, snapshot: str = None) -> int:
+    """
+    Computes the equivalence links of the seed resources.
+    :param resources_list: List of String, seed resources populated in same:Q0.
+    :param endpoints_dict: Dict, a void:Dataset and its SPARQL endpoint (between angle brackets) to add in same:N.
+    :param load_catalogs: bool, retrieves the endpoints of the catalogs (lod-cloud.net, YummyData, LinkedWiki and
+    DataHub), only the endpoints of endpoints_dict are used otherwise.
+    :param timer: StageTimer, measures the time spent in each stage, the times and the configuration of the run are
+    printed at its end if None.
+    :param checkpoint: Checkpoint, writes a checkpoint after the initialization and after each stage querying the
+    remote endpoints, no checkpoint if None.
+    :param resume: bool, continues from the last checkpoint instead of starting from the beginning.
+    :param snapshot: String, path of the binary snapshot of the closure written at the end of the run, no snapshot if
+    None.
+    :return: int, number of iterations performed.
+    """
+    c = components()
+    # The times and the configuration are printed at the end of the run, unless the caller reports them
+    report = timer is None
+    timer = timer or StageTimer(Config.profile())
+    iteration = 1
+    # Stages of the current iteration already performed
+    stages = []
+    state = checkpoint.restore(get_local_store()) if checkpoint is not None and resume else None
+    if state is not None:
+        iteration, stages = state["iteration"], state["stages"]
+        print("Resumed from the checkpoint of %s (iteration %d, stages performed: %s)"
+              % (state["date"], iteration, ", ".join(stages) or "none"))
+    else:
+        if resume:
+            print("No checkpoint to resume from, the run starts from the beginning.")
+        setup_run(resources_list, endpoints_dict, load_catalogs, timer)
+        if checkpoint is not None:
+            checkpoint.save(get_local_store(), iteration, stages)
+    # :label: S1, (I)FP1 and (I)FP2
+    remote_stages = [("S1", c.endpoint_exploration._generate_query_pattern_sameas)]
+    if c.func_prop:
+        remote_stages += [("(I)FP1", c.endpoint_exploration._generate_query_pattern_functionalproperties_links1),
+                          ("(I)FP2", c.endpoint_exploration._generate_queries_pattern_functionalproperties_links2)]
+    # :label: T1, the same:Target of the resumed iteration are read from the local store
+    if state is not None:
+        with timer.stage("T1"):
+            resources_list = c.local_manipulation.get_targets(iteration)
+    else:
+        resources_list = list(dict.fromkeys(resources_list))
     start_time = time.time()
     # While there are same:Target in the current iteration named graph
     while len(resources_list) != 0:
         print("Iteration: " + str(iteration))
         print("Number of resources of type same:Target in the current iteration: " + str(len(resources_list)))
-        print("Resources of type same:Target used in the current iteration:")
-        print(resources_list)
-        # :label: S1
-        endpoint_exploration.optimize_remote_queries(endpoint_exploration._generate_query_pattern_sameas, iteration)
-        if Config.FUNC_PROP:
-            # :label: (I)FP1 and (I)FP2
-            endpoint_exploration.optimize_remote_queries(
-                endpoint_exploration._generate_query_pattern_functionalproperties_links1, iteration)
-            endpoint_exploration.optimize_remote_queries(
-                endpoint_exploration._generate_queries_pattern_functionalproperties_links2, iteration)
+        if len(resources_list) <= PRINTED_TARGETS:
+            print("Resources of type same:Target used in the current iteration:")
+            print(resources_list)
+        # same:Target of the next iteration, known in memory if all the stages report the same:Target they add
+        frontier = set()
+        frontier_known = True
+        for name, function in remote_stages:
+            # Already performed before the interruption of the run
+            if name in stages:
+                frontier_known = False
+                continue
+            with timer.stage(name):
+                added = c.endpoint_exploration.optimize_remote_queries(function, iteration)
+            if added is None:
+                frontier_known = False
+            else:
+                frontier.update(added)
+            stages.append(name)
+            if checkpoint is not None:
+                checkpoint.save(get_local_store(), iteration, stages)
 
         # :label: R1 and R2 (CR1 is called by these functions)
-        error_detection.rotten_sameas(iteration)
-        error_detection.rotten_sameas2(iteration)
+        with timer.stage("R1"):
+            frontier -= c.error_detection.rotten_sameas(iteration)
+        with timer.stage("R2"):
+            frontier -= c.error_detection.rotten_sameas2(iteration)
         iteration += 1
-        # Polling, :label: T1
-        resources_list = local_manipulation.get_targets(iteration)
-    error_detection.rotten_sameas2(iteration)
+        stages = []
+        if checkpoint is not None:
+            checkpoint.save(get_local_store(), iteration, stages)
+        if frontier_known:
+            resources_list = sorted(frontier)
+        else:
+            # Polling, :label: T1
+            with timer.stage("T1"):
+                resources_list = c.local_manipulation.get_targets(iteration)
+    with timer.stage("R2"):
+        c.error_detection.rotten_sameas2(iteration)
 
     print("--- %s seconds ---" % (time.time() - start_time))
+    if snapshot is not None:
+        write_snapshot(closure_graph(get_local_store()), snapshot)
+        print("Snapshot of the closure written in " + snapshot)
+    if report:
+        print(timer.report())
+    return iteration - 1
+
+
+if __name__ == '__main__':
+    from samelive.cli import main
+    main(["run"] + sys.argv[1:])
@@ -0,0 +1,152 @@
+import json
+import argparse
+import threading
+import traceback
+import urllib.parse
+import concurrent.futures
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from samelive.utils.config import Config
+from samelive.utils.helper import Helper
+from samelive.computing.batch import BatchResolver
+
+
+class ClosureService(object):
+    """
+    Resident HTTP service computing closures on demand. The registry of the endpoints and the answers of the remote
+    endpoints are kept between the requests (see BatchResolver), and concurrent requests for the same seed share one
+    computation.
+
+    POST /resolve with a JSON body {"iri": ...} (or GET /resolve?iri=...) returns the same:Target and same:Rotten
+    resources of the closure, GET /status returns the state of the service.
+    """
+    def __init__(self, resolver: BatchResolver):
+        """
+        :param resolver: BatchResolver, registry of the endpoints and cache of the remote lookups.
+        """
+        self.resolver = resolver
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=resolver.workers)
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.nb_requests = 0
+        self.nb_coalesced = 0
+        self.server = None
+
+    @property
+    def url(self) -> str:
+        return "http://%s:%d" % self.server.server_address[:2]
+
+    def resolve(self, seed: str) -> concurrent.futures.Future:
+        """
+        Schedules the computation of a closure, or joins the computation in progress for the same seed.
+        :param seed: String, IRI of the seed.
+        :return: Future, closure of the seed (see BatchResolver.resolve).
+        """
+        with self.lock:
+            self.nb_requests += 1
+            future = self.in_flight.get(seed)
+            if future is not None:
+                self.nb_coalesced += 1
+                return future
+            future = self.in_flight[seed] = self.executor.submit(self.resolver.resolve, seed)
+        future.add_done_callback(lambda _: self._done(seed))
+        return future
+
+    def _done(self, seed: str):
+        with self.lock:
+            del self.in_flight[seed]
+
+    def status(self) -> dict:
+        with self.lock:
+            return {"requests": self.nb_requests, "coalesced": self.nb_coalesced, "in_flight": list(self.in_flight),
+                    "lookups": self.resolver.lookups.nb_misses, "shared_lookups": self.resolver.lookups.nb_hits,
+                    "evicted_lookups": self.resolver.lookups.nb_evictions}
+
+    def start(self, host: str = "127.0.0.1", port: int = 0):
+        """
+        Starts the service in a background thread.
+        :param host: String, interface to listen on.
+        :param port: int, port of the service, a free port is chosen if 0.
+        """
+        self.server = ThreadingHTTPServer((host, port), _handler(self))
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        self.executor.shutdown(wait=False)
+
+
+def _handler(service: ClosureService):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            if url.path == "/status":
+                self._send(200, service.status())
+            elif url.path == "/resolve":
+                self._resolve(urllib.parse.parse_qs(url.query).get("iri", [""])[0])
+            else:
+                self._send(404, {"error": "Unknown path " + url.path})
+
+        def do_POST(self):
+            if urllib.parse.urlsplit(self.path).path != "/resolve":
+                self._send(404, {"error": "Unknown path " + self.path})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8"))
+                iri = body.get("iri", "") if isinstance(body, dict) else ""
+            except ValueError:
+                self._send(400, {"error": "The body must be a JSON object"})
+                return
+            self._resolve(iri)
+
+        def _resolve(self, iri: str):
+            if not isinstance(iri, str) or not Helper.is_valid_iri(iri):
+                self._send(400, {"error": "Invalid IRI: " + str(iri)})
+                return
+            try:
+                closure = service.resolve(iri).result()
+            except Exception as err:
+                traceback.print_tb(err.__traceback__)
+                self._send(500, {"iri": iri, "error": str(err)})
+                return
+            self._send(200, dict(iri=iri, **closure))
+
+        def _send(self, status: int, content: dict):
+            body = json.dumps(content).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serves the computation of closures over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=Config.service_port)
+    parser.add_argument("--workers", type=int, default=Config.batch_workers)
+    parser.add_argument("--no-catalogs", action="store_true",
+                        help="Only uses the endpoints of Config.endpoints_dict and --endpoint.")
+    parser.add_argument("--endpoint", action="append", default=[],
+                        help="URL of an additional SPARQL endpoint, can be repeated.")
+    args = parser.parse_args()
+
+    endpoints = dict(Config.endpoints_dict)
+    endpoints.update({url + ".dataset": "<" + url + ">" for url in args.endpoint})
+    closure_service = ClosureService(BatchResolver(endpoints, not args.no_catalogs, args.workers))
+    closure_service.start(args.host, args.port)
+    print("Closure service available at " + closure_service.url)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        closure_service.stop()
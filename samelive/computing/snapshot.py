@@ -0,0 +1,205 @@
+import os
+import sys
+import mmap
+import struct
+import pathlib
+import argparse
+from array import array
+from typing import TYPE_CHECKING
+
+from samelive.utils.config import Config
+from samelive.utils.identity import IdentityGraph
+
+if TYPE_CHECKING:
+    from samelive.query.querymanager import LocalStore
+
+MAGIC = b"SAMELIVE"
+VERSION = 1
+# Magic, version, byte order of the arrays (0 little, 1 big), number of nodes, of relationships and of endpoints
+HEADER = struct.Struct("<8sIIQQQ")
+# Sections of the file in order, typecode of their items (B for the UTF-8 strings)
+SECTIONS = [("iri_offsets", "Q"), ("iris", "B"), ("iteration", "i"), ("flags", "B"), ("components", "i"),
+            ("sources", "i"), ("targets", "i"), ("provenance", "i"), ("endpoint_offsets", "Q"), ("endpoints", "B")]
+# Offset and size in bytes of each section
+SECTION_TABLE = struct.Struct("<" + "QQ" * len(SECTIONS))
+# Flags of the nodes
+TARGET = 1
+ROTTEN = 2
+
+
+def closure_graph(store: "LocalStore") -> IdentityGraph:
+    """
+    Reads the closure computed in the local store (see LocalManipulation.closure_graph).
+    :param store: LocalStore, store of the local state of the algorithm.
+    :return: IdentityGraph, closure of the seeds (flattened).
+    """
+    # Reading a snapshot does not load the local stores (rdflib...)
+    from samelive.query.querymanager import LocalManipulation
+    return LocalManipulation(store).closure_graph()
+
+
+def _strings(values: [str]) -> (array, bytes):
+    """
+    Encodes strings as a blob of UTF-8 and the offsets of the strings in the blob.
+    :param values: List of String, strings.
+    :return: Tuple, array of the len(values) + 1 offsets and the blob.
+    """
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = array("Q", [0])
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    return offsets, b"".join(encoded)
+
+
+def write_snapshot(graph: IdentityGraph, path: str):
+    """
+    Writes a closure as a binary snapshot read with Snapshot: a header, a table of the sections, then the sections
+    (aligned on 8 bytes) with the IRIs of the nodes, the iteration, the flags (same:Target, same:Rotten) and the
+    identity set of each node, the relationships and the endpoint which provided them. The arrays are written in the
+    byte order of the machine. The file is written atomically.
+    :param graph: IdentityGraph, closure (see closure_graph).
+    :param path: String, path of the snapshot.
+    """
+    iri_offsets, iris = _strings(graph.iris.values)
+    endpoint_offsets, endpoints = _strings(graph.endpoints.values)
+    flags = bytearray(len(graph))
+    for node in range(len(graph)):
+        flags[node] = (TARGET if graph.iteration[node] != -1 else 0) | (ROTTEN if graph.rotten[node] else 0)
+    components = array("i", (graph._find(node) for node in range(len(graph))))
+    sections = [iri_offsets, iris, graph.iteration, flags, components, graph.sources, graph.targets,
+                graph.provenance, endpoint_offsets, endpoints]
+    table = []
+    offset = HEADER.size + SECTION_TABLE.size
+    for section in sections:
+        offset += -offset % 8
+        size = len(section) * (section.itemsize if isinstance(section, array) else 1)
+        table += [offset, size]
+        offset += size
+    pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as snapshot_file:
+        snapshot_file.write(HEADER.pack(MAGIC, VERSION, sys.byteorder == "big", len(graph), len(graph.sources),
+                                        len(graph.endpoints)))
+        snapshot_file.write(SECTION_TABLE.pack(*table))
+        for section, section_offset in zip(sections, table[::2]):
+            snapshot_file.write(bytes(section_offset - snapshot_file.tell()))
+            snapshot_file.write(section)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+    os.replace(temporary_path, path)
+
+
+class Snapshot(object):
+    """
+    Closure read from a binary snapshot (see write_snapshot). The file is memory-mapped and the sections are exposed
+    as memoryviews without copy, opening a snapshot does not depend on its size.
+    """
+    def __init__(self, path: str):
+        """
+        :param path: String, path of the snapshot.
+        """
+        with open(path, "rb") as snapshot_file:
+            self._mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        magic, version, big_endian, self.nb_nodes, self.nb_edges, self.nb_endpoints = \
+            HEADER.unpack_from(self._view)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("Not a snapshot of version %d: %s" % (VERSION, path))
+        if big_endian != (sys.byteorder == "big"):
+            self.close()
+            raise ValueError("Snapshot written with another byte order: " + path)
+        table = SECTION_TABLE.unpack_from(self._view, HEADER.size)
+        for (name, typecode), offset, size in zip(SECTIONS, table[::2], table[1::2]):
+            setattr(self, name, self._view[offset:offset + size].cast(typecode))
+        self._nodes = None
+
+    def close(self):
+        """
+        Releases the views and unmaps the file.
+        """
+        for name, _ in SECTIONS:
+            if hasattr(self, name):
+                getattr(self, name).release()
+                delattr(self, name)
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.nb_nodes
+
+    def iri(self, node: int) -> str:
+        """
+        :param node: int, node.
+        :return: String, IRI of the node.
+        """
+        return str(self.iris[self.iri_offsets[node]:self.iri_offsets[node + 1]], "utf-8")
+
+    def endpoint(self, edge: int) -> str:
+        """
+        :param edge: int, relationship.
+        :return: String, SPARQL endpoint which provided the relationship, None if it is unknown.
+        """
+        endpoint = self.provenance[edge]
+        if endpoint == -1:
+            return None
+        return str(self.endpoints[self.endpoint_offsets[endpoint]:self.endpoint_offsets[endpoint + 1]], "utf-8")
+
+    def node(self, iri: str) -> int:
+        """
+        Returns the node of an IRI, the index of the IRIs is built on the first call.
+        :param iri: String, IRI.
+        :return: int, node of the IRI, -1 if it is not in the closure.
+        """
+        if self._nodes is None:
+            self._nodes = {self.iri(node): node for node in range(self.nb_nodes)}
+        return self._nodes.get(iri, -1)
+
+    def find(self, iri: str) -> str:
+        """
+        Returns the representative of the identity set of a resource (same interface as IdentityGraph.find).
+        :param iri: String, IRI of the resource.
+        :return: String, IRI of the representative of its identity set (the resource itself if it is not linked).
+        """
+        node = self.node(iri)
+        return iri if node == -1 else self.iri(self.components[node])
+
+    def identity_sets(self) -> dict:
+        """
+        Groups the nodes by identity set (same interface as IdentityGraph.identity_sets).
+        :return: Dict, representative node: array of the nodes of the identity set.
+        """
+        sets = {}
+        for node in range(self.nb_nodes):
+            sets.setdefault(self.components[node], array("i")).append(node)
+        return sets
+
+    def seeds(self) -> [str]:
+        """
+        :return: List of String, IRIs of the seeds (same:Target of the iteration 0).
+        """
+        return [self.iri(node) for node in range(self.nb_nodes) if self.iteration[node] == 0]
+
+    def resources(self, flags: int) -> [str]:
+        """
+        Lists the resources having one of the flags, ordered as with ORDER BY.
+        :param flags: int, TARGET, ROTTEN or both (TARGET | ROTTEN).
+        :return: List of String, IRIs of the resources.
+        """
+        return sorted(self.iri(node) for node in range(self.nb_nodes) if self.flags[node] & flags)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Writes a binary snapshot of the closure computed in the triplestore.")
+    parser.add_argument("--endpoint", default=Config.master_endpoint)
+    parser.add_argument("--output", default=Config.snapshot_path)
+    args = parser.parse_args()
+
+    from samelive.query.querymanager import CoreseStore
+    write_snapshot(closure_graph(CoreseStore(args.endpoint)), args.output)
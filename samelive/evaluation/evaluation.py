@@ -0,0 +1,140 @@
+import os
+import argparse
+
+import pandas as pd
+
+from samelive.utils.config import Config
+from samelive.computing.snapshot import Snapshot
+from samelive.computing.export_result import ExportResult
+
+# Classes of the benchmark of the Barack Obama identity links knowledge graph
+# (https://github.com/raadjoe/obama-lod-identity-analysis): 0 for undetermined URIs, 1 for Barack Obama and 2 to 8 for
+# the other identity sets (Obama's Presidency, Obama's Presidency Transition, Obama's Senate Career, Obama's
+# Presidential Centre, Obama's Biography, Obama's Photos, Black President).
+UNDETERMINED = 0
+BARACK_OBAMA = 1
+NB_CLASSES = 9
+
+# Closures compared by default, label: file in resource/evaluation
+CLOSURES = {
+    "sameAs.org": "sameasorg.csv",
+    "LODsyndesis": "lodsynthesis.csv",
+    "O1": "O1.csv",
+    "O2": "O2.csv",
+}
+
+
+class Evaluation(object):
+    def __init__(self, terms_path: str, sep: str = None):
+        """
+        :param terms_path: String, path of the terms of the benchmark (columns term and class at least).
+        :param sep: String, separator of the terms file, detected if None.
+        """
+        terms = pd.read_csv(terms_path, sep=sep, engine="python" if sep is None else "c")
+        # As in the iterative version, the first class given to a term is used
+        self.terms = terms[["term", "class"]].drop_duplicates("term").reset_index(drop=True)
+
+    @staticmethod
+    def load_closure(path: str) -> pd.DataFrame:
+        """
+        Loads a closure saved with the columns new_eq_id and term separated by semicolons.
+        :param path: String, path of the closure.
+        :return: DataFrame, columns new_eq_id and term.
+        """
+        return pd.read_csv(path, sep=";", usecols=["new_eq_id", "term"], low_memory=False)
+
+    @staticmethod
+    def load_snapshot(snapshot: Snapshot, name: str) -> pd.DataFrame:
+        """
+        Loads an exported set (O1 or O2) from the binary snapshot of a closure, numbered as by export_result.py.
+        :param snapshot: Snapshot, closure.
+        :param name: String, name of the set (key of export_result.IDENTITY_SETS).
+        :return: DataFrame, columns new_eq_id and term.
+        """
+        export = ExportResult(snapshot=snapshot)
+        rows = export.rows(name, snapshot, export.numbering(snapshot, snapshot.seeds()))
+        header = next(rows)
+        return pd.DataFrame(rows, columns=header)[["new_eq_id", "term"]]
+
+    def classify(self, closure: pd.DataFrame) -> pd.DataFrame:
+        """
+        Joins a closure with the classes of the benchmark.
+        :param closure: DataFrame, columns new_eq_id and term.
+        :return: DataFrame, the closure with the column class (-1 for terms outside the benchmark).
+        """
+        classified = closure[["new_eq_id", "term"]].drop_duplicates("term").merge(self.terms, how="left", on="term")
+        classified["class"] = classified["class"].fillna(-1).astype(int)
+        return classified
+
+    def class_histogram(self, closure: pd.DataFrame, new_eq_id: int = 1) -> [int]:
+        """
+        Counts the terms of an identity set per class of the benchmark, terms outside the benchmark are ignored.
+        :param closure: DataFrame, columns new_eq_id and term.
+        :param new_eq_id: int, identity set to consider.
+        :return: List of int, number of terms for each class.
+        """
+        classified = self.classify(closure[closure["new_eq_id"] == new_eq_id])
+        counts = classified.loc[classified["class"] >= 0, "class"].value_counts()
+        return counts.reindex(range(NB_CLASSES), fill_value=0).tolist()
+
+    def compare(self, closure: pd.DataFrame) -> dict:
+        """
+        Computes the comparison metrics of a closure with the benchmark, precision and recall consider Barack Obama
+        as the real world entity sought (undetermined URIs and URIs outside the benchmark are not counted).
+        :param closure: DataFrame, columns new_eq_id and term.
+        :return: Dict, metrics of the comparison table.
+        """
+        classified = self.classify(closure)
+        counts = classified["class"].value_counts()
+        barack_obama = int(counts.get(BARACK_OBAMA, 0))
+        others = int(counts[counts.index > BARACK_OBAMA].sum())
+        ground_truth = int((self.terms["class"] == BARACK_OBAMA).sum())
+        return {
+            "Barack Obama": barack_obama,
+            "Other Real World Entity": others,
+            "New URIs outside A1": int(counts.get(-1, 0)),
+            "Undetermined URIs": int(counts.get(UNDETERMINED, 0)),
+            "Identity Sets": int(classified["new_eq_id"].nunique()),
+            "Total URIs in Identity Set": len(classified),
+            "Precision": round(barack_obama / (barack_obama + others), 3) if barack_obama + others != 0 else 0.0,
+            "Recall": round(barack_obama / ground_truth, 3) if ground_truth != 0 else 0.0,
+        }
+
+    def comparison_table(self, closures: dict) -> pd.DataFrame:
+        """
+        Computes the comparison table of the README, the ground truth A1 is the benchmark itself.
+        :param closures: Dict, label of the closure: DataFrame with the columns new_eq_id and term.
+        :return: DataFrame, one column per closure and one row per metric.
+        """
+        table = {"A1": pd.Series(self.compare(self.terms.assign(new_eq_id=1)), dtype=object)}
+        for label, closure in closures.items():
+            table[label] = pd.Series(self.compare(closure), dtype=object)
+        return pd.DataFrame(table)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compares closures with the benchmark of the Barack Obama identity "
+                                                 "links knowledge graph.")
+    parser.add_argument("--terms", required=True, help="Terms of the benchmark (columns term and class).")
+    parser.add_argument("--terms-sep", default=None, help="Separator of the terms file, detected by default.")
+    parser.add_argument("--folder", default=Config.project_path + "/resource/evaluation",
+                        help="Folder of the closures.")
+    parser.add_argument("--snapshot", default=None,
+                        help="Binary snapshot of a closure (see samelive/computing/snapshot.py), O1 and O2 are read "
+                             "from it instead of the folder.")
+    args = parser.parse_args()
+
+    evaluation = Evaluation(args.terms, args.terms_sep)
+    closures = {}
+    snapshot = Snapshot(args.snapshot) if args.snapshot else None
+    for label, file in CLOSURES.items():
+        path = os.path.join(args.folder, file)
+        if snapshot is not None and label in ("O1", "O2"):
+            closures[label] = Evaluation.load_snapshot(snapshot, label)
+        elif os.path.exists(path):
+            closures[label] = Evaluation.load_closure(path)
+        else:
+            print("Closure not found: " + path)
+    print(evaluation.comparison_table(closures).to_string())
+    for label, closure in closures.items():
+        print(label + " classes of the identity set 1: " + str(evaluation.class_histogram(closure)))
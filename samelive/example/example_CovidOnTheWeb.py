@@ -32,10 +32,7 @@ if __name__ == '__main__':
             PREFIX owl: <http://www.w3.org/2002/07/owl#>
             INSERT {
               GRAPH same:Q0 {
-                ?entity a same:Target ;
-                same:hasNamespace ?nstarget ;
-                same:hasAuthority ?auttarget ;
-                same:hasValueWithNoScheme ?noschemetarget
+                ?entity a same:Target
               }
               same:Q0 same:hasIteration 0
             } WHERE {
@@ -47,14 +44,12 @@ if __name__ == '__main__':
                     <http://schema.org/about> <http://ns.inria.fr/covid19/0eadf5a901c0d89fad2c202990056556be103e12> .
                 }
               }
-              BIND(REPLACE(STR(?entity), "(#|/)[^#/]*$", "$1") as ?nstarget)
-              BIND(REPLACE(STR(?entity), ".+://(.*)", "$1") as ?noschemetarget)
-              BIND(REPLACE(STR(?entity), ".+://(.*?)/.*", "$1") as ?auttarget)
             }
         """)
         sparql.query()
     except Exception as err:
-        traceback.print_tb(err)
+        traceback.print_tb(err.__traceback__)
+    local_manipulation.decompose_iris("same:Q0", ["same:Target"])
     monitoring.endpoints_availability()
     # Optimizations with the Corese engine
     if Config.IS_CORESE_ENGINE:
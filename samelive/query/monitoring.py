@@ -1,31 +1,37 @@
+import re
 import json
 import traceback
-import requests
 import socket
 from math import ceil
+from datetime import datetime
 import concurrent.futures
 
 from samelive.utils.config import Config
 from samelive.utils.helper import Helper
+from samelive.query.querymanager import LocalStore, get_local_store
 
-from rdflib import Graph, ConjunctiveGraph
-from SPARQLWrapper import SPARQLWrapper, JSON, N3, XML
+# Errors of the endpoints refusing an offset beyond their limit (e.g. Virtuoso SR353 on a sorted TOP clause)
+OFFSET_ERROR = re.compile(r"\bOFFSET\b|SR353", re.IGNORECASE)
 
 
 class Monitoring(object):
-    def __init__(self):
+    def __init__(self, store: LocalStore = None):
         self.master_endpoint = Config.master_endpoint
+        self.store = store or get_local_store()
+        self.timeout = Config.timeout
+        self.results_limit_upper_bound = Config.results_limit_upper_bound
+        self.probe_attempts = Config.probe_attempts
 
     def endpoints_availability(self):
         """
         Checks the availability of endpoints in same:N and store this information in the same named graph
         (:label: A1).
         """
+        if not self.store.supports_service:
+            self._probe_datasets()
+            return
         try:
-            sparql = SPARQLWrapper(self.master_endpoint)
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
-            sparql.setQuery("""
+            self.store.update("""
                 PREFIX same: <https://ns.inria.fr/same/same.owl#>
                 PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
                 PREFIX void: <http://rdfs.org/ns/void#>
@@ -59,21 +65,21 @@ class Monitoring(object):
                   BIND(xsd:dateTime(NOW()) AS ?date)
                 }
             """)
-            sparql.query()
 
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
 
     def handle_values_clause(self):
         """
         Identifies if the available endpoints support the VALUES clause
         (https://www.w3.org/TR/sparql11-query/#sparqlAlgebraFinalValues).
         """
+        if not self.store.supports_service:
+            self._probe_statuses("SELECT ?x WHERE { VALUES ?dummy { \"dummy\" } ?x a ?y } LIMIT 1",
+                                 "same:valuesIsAvailable")
+            return
         try:
-            sparql = SPARQLWrapper(self.master_endpoint)
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
-            sparql.setQuery("""
+            self.store.update("""
                 PREFIX same: <https://ns.inria.fr/same/same.owl#>
                 PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
                 PREFIX void: <http://rdfs.org/ns/void#>
@@ -100,20 +106,20 @@ class Monitoring(object):
                   BIND(IF(BOUND(?x), true, false)  as ?isValues)
                 }
             """)
-            sparql.query()
 
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
 
     def handle_non_ascii_character(self):
         """
         Identifies if the available endpoints support or not non-ASCII characters.
         """
+        if not self.store.supports_service:
+            self._probe_statuses("SELECT ?x WHERE { ?x a ?y OPTIONAL { ?x1 ?p1 \"あ\" } } LIMIT 1",
+                                 "same:supportsNonASCIICharacters")
+            return
         try:
-            sparql = SPARQLWrapper(self.master_endpoint)
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
-            sparql.setQuery("""
+            self.store.update("""
                 PREFIX same: <https://ns.inria.fr/same/same.owl#>
                 PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
                 PREFIX void: <http://rdfs.org/ns/void#>
@@ -140,46 +146,226 @@ class Monitoring(object):
                   BIND(IF(BOUND(?x), true, false)  as ?supportsNonASCIICharacters)
                 }
             """)
-            sparql.query()
 
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
 
-    def has_limit(self):
+    def _probe_datasets(self):
         """
-        Computes the limit number of results returned by the available endpoints.
+        Checks from Python the availability of the endpoints in same:N without status, for local stores that cannot
+        execute the clause SERVICE (:label: A1).
         """
         try:
-            sparql = SPARQLWrapper(self.master_endpoint)
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
-            sparql.setQuery("""
-                PREFIX same: <https://ns.inria.fr/same/same.owl#>
-                PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+            query = """
                 PREFIX void: <http://rdfs.org/ns/void#>
                 PREFIX ends: <http://labs.mondeca.com/vocab/endpointStatus#>
-                INSERT {
+                PREFIX same: <https://ns.inria.fr/same/same.owl#>
+                SELECT DISTINCT ?dataset ?endpoint
+                WHERE {
                   GRAPH same:N {
-                    ?status same:hasResultsLimit ?limit
-                  }
-                } WHERE {
-                  {
-                  select (count(?x) as ?limit) ?status where {
-                    GRAPH same:N {
-                      ?dataset void:sparqlEndpoint ?endpoint ;
-                      ends:status ?status .
-                      ?status ends:statusIsAvailable true
-                    }
-                    SERVICE ?endpoint {
-                      SELECT ?x WHERE {
-                        ?x ?p ?y
-                      }
+                    ?dataset void:sparqlEndpoint ?endpoint
+                    FILTER NOT EXISTS {
+                      ?dataset ends:status ?s1 .
+                      ?s1 ends:statusIsAvailable ?a1
                     }
                   }
+                }
+            """
+            datasets = [(j["dataset"], j["endpoint"]) for j in self.store.select(query)]
+            answers = self._probe_endpoints({endpoint for _, endpoint in datasets},
+                                            "SELECT ?x WHERE { ?x ?p ?y } LIMIT 1")
+            date = "\"" + datetime.now().isoformat() + "\"^^xsd:dateTime"
+            data = []
+            for dataset, endpoint in datasets:
+                # Replace to comply with RFC 3986 (REPLACE of the SPARQL query)
+                status = re.sub(".dataset", "", dataset) + ".status"
+                data.append("<%s> ends:status <%s> . <%s> a ends:EndpointStatus ; ends:statusIsAvailable %s ; "
+                            "dcterms:date %s ." % (dataset, status, status, str(answers[endpoint]).lower(), date))
+            if len(data) != 0:
+                prefixes = "PREFIX ends: <http://labs.mondeca.com/vocab/endpointStatus#>\n" \
+                           "PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>\n" \
+                           "PREFIX dcterms: <http://purl.org/dc/terms/>\n" \
+                           "PREFIX same: <https://ns.inria.fr/same/same.owl#>"
+                self.store.insert(data, 'same:N', prefixes)
+
+        except Exception as err:
+            traceback.print_tb(err.__traceback__)
+
+    def _probe_statuses(self, probe_query: str, predicate: str):
+        """
+        Probes from Python the available endpoints with a query and stores in same:N whether they answered, for local
+        stores that cannot execute the clause SERVICE.
+        :param probe_query: String, SELECT query sent to the endpoints.
+        :param predicate: String, property of the status of the endpoints, true if the endpoint answered.
+        """
+        try:
+            query = """
+                PREFIX void: <http://rdfs.org/ns/void#>
+                PREFIX ends: <http://labs.mondeca.com/vocab/endpointStatus#>
+                PREFIX same: <https://ns.inria.fr/same/same.owl#>
+                SELECT DISTINCT ?status ?endpoint
+                WHERE {
+                  GRAPH same:N {
+                    ?dataset void:sparqlEndpoint ?endpoint ;
+                    ends:status ?status .
+                    ?status ends:statusIsAvailable true
                   }
                 }
-            """)
-            sparql.query()
+            """
+            statuses = [(j["status"], j["endpoint"]) for j in self.store.select(query)]
+            answers = self._probe_endpoints({endpoint for _, endpoint in statuses}, probe_query)
+            data = ["<%s> %s %s ." % (status, predicate, str(answers[endpoint]).lower())
+                    for status, endpoint in statuses]
+            if len(data) != 0:
+                self.store.insert(data, 'same:N', "PREFIX same: <https://ns.inria.fr/same/same.owl#>")
 
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
+
+    def _probe_endpoints(self, endpoints: set, query: str) -> dict:
+        """
+        Sends a query to endpoints in parallel.
+        :param endpoints: Set of String, URL of the SPARQL endpoints.
+        :param query: String, SELECT query.
+        :return: Dict, endpoint: True if the endpoint returned at least one result.
+        """
+        endpoints = list(endpoints)
+        with concurrent.futures.ThreadPoolExecutor(Config.remote_workers) as executor:
+            return dict(zip(endpoints, executor.map(lambda endpoint: self._probe(endpoint, query), endpoints)))
+
+    def _probe(self, endpoint: str, query: str) -> bool:
+        import requests
+        solutions = Helper.stream_select(endpoint, query, timeout=self.timeout)
+        try:
+            return next(solutions, None) is not None
+        except (requests.exceptions.RequestException, ValueError):
+            return False
+        finally:
+            solutions.close()
+
+    def has_limit(self):
+        """
+        Computes the limit number of results returned by the available endpoints and caches it in same:N. Endpoints
+        that already have a same:hasResultsLimit are not probed again.
+        """
+        try:
+            query = """
+                PREFIX same: <https://ns.inria.fr/same/same.owl#>
+                PREFIX void: <http://rdfs.org/ns/void#>
+                PREFIX ends: <http://labs.mondeca.com/vocab/endpointStatus#>
+                SELECT DISTINCT ?status ?endpoint
+                WHERE {
+                  GRAPH same:N {
+                    ?dataset void:sparqlEndpoint ?endpoint ;
+                    ends:status ?status .
+                    ?status ends:statusIsAvailable true
+                    FILTER NOT EXISTS { ?status same:hasResultsLimit ?limit }
+                  }
+                }
+            """
+            statuses = {j["status"]: j["endpoint"] for j in self.store.select(query)}
+
+            # One thread per endpoint, each endpoint only receives a few small probes
+            with concurrent.futures.ThreadPoolExecutor(Config.remote_workers) as executor:
+                limits = dict(zip(statuses, executor.map(self._compute_limit, statuses.values())))
+
+            data = ["<" + status + "> same:hasResultsLimit " + str(limit) + " ."
+                    for status, limit in limits.items() if limit is not None]
+            if len(data) != 0:
+                prefixes = "PREFIX same: <https://ns.inria.fr/same/same.owl#>"
+                self.store.insert(data, 'same:N', prefixes)
+
+        except Exception as err:
+            traceback.print_tb(err.__traceback__)
+
+    def _compute_limit(self, endpoint: str):
+        """
+        Computes the limit number of results returned by an endpoint. The limit is read from the response headers when
+        the endpoint announces it, otherwise it is found with an exponential then a binary search on probes
+        retrieving at most one binding of a single variable. A probe failing after its attempts stops the search, the
+        limit is then not stored rather than narrowed on an error unrelated to the offset.
+        :param endpoint: String, URL of the SPARQL endpoint.
+        :return: int, limit number of results (bounded by Config.results_limit_upper_bound), None if the endpoint does
+        not answer.
+        """
+        import requests
+        try:
+            # The first probe reads the limit announced in the response headers (X-SPARQL-MaxRows)
+            has_result, header_limit = self._probe_offset(endpoint, 0)
+            if header_limit is not None:
+                return header_limit
+            if not has_result:
+                return 0
+
+            # Exponential search of an offset without result: lower is known to be answered, upper is not
+            lower, upper = 0, None
+            bound = 1000
+            while bound < self.results_limit_upper_bound:
+                has_result, header_limit = self._probe_offset(endpoint, bound)
+                if header_limit is not None:
+                    return header_limit
+                if not has_result:
+                    upper = bound
+                    break
+                lower = bound
+                bound *= 10
+            if upper is None:
+                has_result, header_limit = self._probe_offset(endpoint, self.results_limit_upper_bound - 1)
+                if header_limit is not None:
+                    return header_limit
+                if has_result:
+                    return self.results_limit_upper_bound
+                upper = self.results_limit_upper_bound - 1
+
+            # Binary search of the first offset without result, which is the number of results returned
+            while upper - lower > 1:
+                middle = (lower + upper) // 2
+                has_result, header_limit = self._probe_offset(endpoint, middle)
+                if header_limit is not None:
+                    return header_limit
+                if has_result:
+                    lower = middle
+                else:
+                    upper = middle
+            return upper
+
+        except (requests.exceptions.RequestException, ValueError) as err:
+            print(endpoint + ": " + str(err))
+            return None
+
+    def _probe_offset(self, endpoint: str, offset: int) -> (bool, int):
+        """
+        Checks if an endpoint returns a result at a given offset. Only an empty answer or an error refusing the offset
+        means that there is no result, server errors (5xx) and timeouts are retried.
+        :param endpoint: String, URL of the SPARQL endpoint.
+        :param offset: int, offset of the probed result.
+        :return: Tuple, True if a result exists at this offset and the limit announced in the response headers (None
+        if the endpoint does not announce it).
+        :raise RequestException: the endpoint did not answer the probe after Config.probe_attempts attempts or
+        answered with an error unrelated to the offset.
+        """
+        import requests
+        attempts = max(1, self.probe_attempts)
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            try:
+                response = requests.get(endpoint,
+                                        params={"query": "SELECT ?x WHERE { ?x ?p ?y } LIMIT 1 OFFSET %d" % offset},
+                                        headers={"Accept": "application/sparql-results+json"}, timeout=self.timeout)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+                if last_attempt:
+                    raise
+                continue
+            header_limit = response.headers.get("X-SPARQL-MaxRows")
+            if header_limit is not None and header_limit.isdigit():
+                header_limit = int(header_limit)
+            else:
+                header_limit = None
+            if response.status_code == 200:
+                return len(response.json()["results"]["bindings"]) != 0, header_limit
+            # Some endpoints answer with an error rather than an empty result when the offset exceeds their limit
+            if OFFSET_ERROR.search(response.text) is not None:
+                return False, header_limit
+            if response.status_code < 500 or last_attempt:
+                response.raise_for_status()
+                raise requests.exceptions.HTTPError("Unexpected status %d" % response.status_code, response=response)
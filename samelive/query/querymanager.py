@@ -1,21 +1,372 @@
+import re
 import json
 import traceback
-import requests
 import socket
+import threading
+import itertools
 from math import ceil
+from datetime import datetime
 import concurrent.futures
+from typing import TYPE_CHECKING
 
 from samelive.utils.config import Config
 from samelive.utils.helper import Helper
+from samelive.utils.cache import LookupCache
+from samelive.utils.valueindex import ValueIndex, INVERSE_FUNCTIONAL, FUNCTIONAL
+from samelive.utils.trie import PrefixTrie
+from samelive.utils.iri import decompose, decomposition_triples
+from samelive.utils.identity import IdentityGraph, RottenChecker
+from samelive.utils.frontier import FrontierManager
+
+# rdflib and SPARQLWrapper are imported where they are used, the command line starts without loading them
+from urllib import error
+
+if TYPE_CHECKING:
+    from rdflib import ConjunctiveGraph
+
+
+class LocalStore(object):
+    """
+    Triplestore holding the local state of the algorithm (same:N, same:Q{i}, same:Q-1, provenance...).
+    """
+    # False if the store cannot execute the clause SERVICE ?endpoint, the remote queries are then sent from Python
+    supports_service = True
+    # Name of the default graph in the dumps
+    default_graph = "<http://ns.inria.fr/corese/kgram/default>"
+
+    def select(self, query: str, timeout: int = None, terms: bool = False):
+        """
+        Executes a SELECT query.
+        :param query: String, SELECT query.
+        :param timeout: int, timeout in seconds.
+        :param terms: bool, yields the RDF terms in the SPARQL syntax instead of their lexical values.
+        :return: Generator of Dict, one dictionary per solution with the names of the bound variables as keys.
+        """
+        raise NotImplementedError
 
-import tqdm
-from rdflib import Graph, ConjunctiveGraph
-from SPARQLWrapper import SPARQLWrapper, JSON, N3, XML, SPARQLExceptions
-from urllib import request, error
+    def update(self, query: str):
+        """
+        Executes an UPDATE query.
+        :param query: String, UPDATE query.
+        """
+        raise NotImplementedError
+
+    def insert(self, data: [str], named_graph: str, prefixes: str = ""):
+        """
+        Inserts data from a list.
+        :param data: list, data in RDF.
+        :param named_graph: str, named graph where to insert the data.
+        :param prefixes: str, prefixes used in the SPARQL query.
+        """
+        self.update("""
+            %s
+            INSERT DATA {
+              GRAPH %s {
+                %s
+              }
+            }
+        """ % (prefixes, named_graph, '\n'.join(data)))
+
+    def insert_graph(self, data: "ConjunctiveGraph", named_graph: str, prefixes: str = ""):
+        """
+        Inserts data from a ConjunctiveGraph.
+        :param data: ConjunctiveGraph, graph containing the data.
+        :param named_graph: str, named graph where to insert the data.
+        :param prefixes: str, prefixes used in the SPARQL query.
+        """
+        triples = data.serialize(format='nt')
+        if isinstance(triples, bytes):
+            triples = triples.decode("utf-8")
+        self.insert([triples], named_graph, prefixes)
+
+    def graphs(self) -> [str]:
+        """
+        :return: List of String, names of the graphs of the store (default graph included) in the SPARQL syntax.
+        """
+        graphs = [j["g"] for j in self.select("SELECT DISTINCT ?g WHERE { GRAPH ?g { } }", terms=True)]
+        return graphs if self.default_graph in graphs else graphs + [self.default_graph]
+
+    def dump(self, path: str, graphs: [str] = None, subjects: set = None, exclude: bool = False,
+             batch_size: int = 1000):
+        """
+        Writes the data of the store in a file, one quad per line (N-Quads, the quoted triples of RDF-star are
+        written in the SPARQL syntax).
+        :param path: String, path of the file.
+        :param graphs: List of String, names of the graphs written (SPARQL syntax, see graphs), all if None.
+        :param subjects: Set of String, only the triples of the default graph having one of these subjects (SPARQL
+        syntax) are written, all if None.
+        :param exclude: bool, the triples of the default graph having one of the subjects are not written instead.
+        :param batch_size: int, number of graphs or subjects bound per query.
+        """
+        with open(path, "w", encoding="utf-8") as dump_file:
+            if graphs is None:
+                for j in self.select("SELECT ?s ?p ?o ?g WHERE { GRAPH ?g { ?s ?p ?o } }", terms=True):
+                    dump_file.write("%s %s %s %s .\n" % (j["s"], j["p"], j["o"], j["g"]))
+                return
+            named_graphs = [g for g in graphs if g != self.default_graph]
+            for i in range(0, len(named_graphs), batch_size):
+                for j in self.select("SELECT ?s ?p ?o ?g WHERE { VALUES ?g { %s } GRAPH ?g { ?s ?p ?o } }"
+                                     % " ".join(named_graphs[i:i + batch_size]), terms=True):
+                    dump_file.write("%s %s %s %s .\n" % (j["s"], j["p"], j["o"], j["g"]))
+            if self.default_graph not in graphs:
+                return
+            if subjects is None or exclude:
+                for j in self.select("SELECT ?s ?p ?o WHERE { GRAPH %s { ?s ?p ?o } }" % self.default_graph,
+                                     terms=True):
+                    if subjects is None or j["s"] not in subjects:
+                        dump_file.write("%s %s %s %s .\n" % (j["s"], j["p"], j["o"], self.default_graph))
+                return
+            subjects = sorted(subjects)
+            for i in range(0, len(subjects), batch_size):
+                for j in self.select("SELECT ?s ?p ?o WHERE { VALUES ?s { %s } GRAPH %s { ?s ?p ?o } }"
+                                     % (" ".join(subjects[i:i + batch_size]), self.default_graph), terms=True):
+                    dump_file.write("%s %s %s %s .\n" % (j["s"], j["p"], j["o"], self.default_graph))
+
+    def restore(self, path: str, batch_size: int = 10000):
+        """
+        Replaces the data of the store with the data of a file written by dump.
+        :param path: String, path of the file.
+        :param batch_size: int, number of quads inserted per query.
+        """
+        self.update("DROP ALL")
+        self.load(path, batch_size)
+
+    def load(self, path: str, batch_size: int = 10000):
+        """
+        Adds the data of a file written by dump (or of quads written in the same syntax) to the store.
+        :param path: String, path of the file.
+        :param batch_size: int, number of quads inserted per query.
+        """
+        with open(path, encoding="utf-8") as dump_file:
+            while True:
+                lines = [line for line in itertools.islice(dump_file, batch_size) if line.strip() != ""]
+                if len(lines) == 0:
+                    break
+                # The name of the graph is the last term of the line, an IRI without spaces
+                quads = [line.rstrip()[:-1].rstrip().rsplit(" ", 1) for line in lines]
+                self.update("INSERT DATA { %s }" % " ".join("GRAPH %s { %s }" % (graph, triple)
+                                                            for triple, graph in quads))
+
+
+class CoreseStore(LocalStore):
+    """
+    Corese triplestore reached over HTTP (Config.master_endpoint), remote endpoints are queried by Corese with the
+    clause SERVICE.
+    """
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+
+    def select(self, query: str, timeout: int = None, terms: bool = False):
+        return Helper.stream_select(self.endpoint, query, timeout, terms)
+
+    def update(self, query: str):
+        from SPARQLWrapper import SPARQLWrapper
+        sparql = SPARQLWrapper(self.endpoint)
+        sparql.method = 'POST'
+        sparql.setRequestMethod('postdirectly')
+        sparql.setQuery(query)
+        sparql.query()
+
+
+class EmbeddedStore(LocalStore):
+    """
+    In-process rdflib store, the default graph is the union of the named graphs as in Corese. Remote endpoints are
+    queried from Python.
+    """
+    supports_service = False
+    default_graph = "<urn:x-rdflib:default>"
+    # Prefixes predefined by Corese and used without declaration in some queries
+    namespaces = {"rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#", "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+                  "owl": "http://www.w3.org/2002/07/owl#", "xsd": "http://www.w3.org/2001/XMLSchema#",
+                  "same": "https://ns.inria.fr/same/same.owl#", "kg": "http://ns.inria.fr/corese/kgram/"}
+
+    # The SPARQL parser of rdflib (pyparsing) is not thread-safe, it is shared by all the stores of the process
+    parser_lock = threading.Lock()
 
-class Setup(object):
     def __init__(self):
+        from rdflib import Dataset
+        self.dataset = Dataset(default_union=True)
+        # rdflib stores are not thread-safe
+        self.lock = threading.RLock()
+
+    def copy(self):
+        """
+        Copies the data of the store in a new store.
+        :return: EmbeddedStore, independent store with the same data.
+        """
+        store = EmbeddedStore()
+        with self.lock:
+            store.dataset.addN(self.dataset.quads())
+        return store
+
+    def select(self, query: str, timeout: int = None, terms: bool = False):
+        from rdflib.plugins.sparql import prepareQuery
+        with self.parser_lock:
+            query = prepareQuery(query, initNs=self.namespaces)
+        with self.lock:
+            result = self.dataset.query(query)
+            solutions = [{str(var): term.n3() if terms else str(term) for var, term in zip(result.vars, row)
+                          if term is not None} for row in result]
+        yield from solutions
+
+    def update(self, query: str):
+        from rdflib.plugins.sparql import prepareUpdate
+        with self.parser_lock:
+            query = prepareUpdate(query, initNs=self.namespaces)
+        with self.lock:
+            self.dataset.update(query)
+
+    def graphs(self) -> [str]:
+        with self.lock:
+            return [graph.identifier.n3() for graph in self.dataset.graphs()]
+
+    def dump(self, path: str, graphs: [str] = None, subjects: set = None, exclude: bool = False,
+             batch_size: int = 1000):
+        from rdflib import Dataset, URIRef
+        with self.lock:
+            if graphs is None:
+                self.dataset.serialize(destination=path, format="nquads")
+                return
+            selected = Dataset()
+            for name in graphs:
+                graph = self.dataset.graph(URIRef(name[1:-1]))
+                if name != self.default_graph or subjects is None:
+                    triples = graph.triples((None, None, None))
+                elif exclude:
+                    triples = (t for t in graph.triples((None, None, None)) if t[0].n3() not in subjects)
+                else:
+                    triples = (t for s in subjects for t in graph.triples((URIRef(s[1:-1]), None, None)))
+                selected.addN((s, p, o, graph) for s, p, o in triples)
+        selected.serialize(destination=path, format="nquads")
+
+    def restore(self, path: str, batch_size: int = 10000):
+        from rdflib import Dataset
+        dataset = Dataset(default_union=True)
+        dataset.parse(path, format="nquads")
+        with self.lock:
+            self.dataset = dataset
+
+    def load(self, path: str, batch_size: int = 10000):
+        with self.lock:
+            self.dataset.parse(path, format="nquads")
+
+
+_local_stores = {}
+_local_stores_lock = threading.Lock()
+
+
+def get_local_store() -> LocalStore:
+    """
+    Returns the local store selected with Config.local_store ("corese" or "embedded"), the same store is shared by
+    all the stages.
+    :return: LocalStore, store of the local state of the algorithm.
+    """
+    key = (Config.local_store, Config.master_endpoint)
+    with _local_stores_lock:
+        if key not in _local_stores:
+            if Config.local_store == "embedded":
+                _local_stores[key] = EmbeddedStore()
+            elif Config.local_store == "corese":
+                _local_stores[key] = CoreseStore(Config.master_endpoint)
+            else:
+                raise ValueError("Unknown local store: " + str(Config.local_store))
+        return _local_stores[key]
+
+
+# Named graphs of the relationships: <endpoint#{iteration}S1>, <endpoint#{iteration}IFP2> or <endpoint#{iteration}>
+PROVENANCE_GRAPH = re.compile(r"(.+)#\d+(?:S1|IFP2)?")
+
+
+class ProvenanceBuffer(object):
+    """
+    Accumulates the data retrieved from the remote endpoints with its provenance and inserts it in the local store by
+    batches. The provenance of each endpoint, iteration and stage (the named graph <endpoint#{iteration}{stage}> and its
+    fno:Execution) is described once, with the date of the first data received, whatever the number of results.
+    """
+    PREFIXES = """
+        PREFIX owl: <http://www.w3.org/2002/07/owl#>
+        PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
+        PREFIX rdfg: <http://www.w3.org/2004/03/trix/rdfg-1>
+        PREFIX void: <http://rdfs.org/ns/void#>
+        PREFIX prov: <http://www.w3.org/ns/prov#>
+        PREFIX fno: <https://w3id.org/function/ontology#>
+        PREFIX same: <https://ns.inria.fr/same/same.owl#>
+        PREFIX dcterms: <http://purl.org/dc/terms/>
+    """
+
+    def __init__(self, store: LocalStore, flush_size: int = Config.provenance_flush_size):
+        """
+        :param store: LocalStore, store where the data is inserted.
+        :param flush_size: int, number of statements inserted per query.
+        """
+        self.store = store
+        self.flush_size = flush_size
+        # Named graph (None for the default graph): statements waiting for the next flush
+        self.pending = {}
+        self.size = 0
+        # (endpoint, iteration, stage) whose provenance is already described
+        self.executions = set()
+
+    def add(self, named_graph: str, statements: [str]):
+        """
+        Adds statements to insert, the buffer is flushed once it holds flush_size statements.
+        :param named_graph: String, named graph of the statements, the default graph if None.
+        :param statements: List of String, statements in the SPARQL syntax (prefixes of PREFIXES).
+        """
+        self.pending.setdefault(named_graph, []).extend(statements)
+        self.size += len(statements)
+        if self.size >= self.flush_size:
+            self.flush()
+
+    def add_links(self, endpoint: str, iteration: int, stage: str, links: [(str, str)]):
+        """
+        Adds owl:sameAs relationships (in both directions) retrieved from an endpoint in the named graph of the stage.
+        :param endpoint: String, URL of the SPARQL endpoint.
+        :param iteration: int, iteration of the algorithm.
+        :param stage: String, stage which retrieved the relationships (S1, IFP2...).
+        :param links: List of tuples, pairs of IRIs linked with owl:sameAs.
+        """
+        ngraph = "<%s#%d%s>" % (endpoint, iteration, stage)
+        if (endpoint, iteration, stage) not in self.executions:
+            self.executions.add((endpoint, iteration, stage))
+            execution = "<%s#%d%sExecution>" % (endpoint, iteration, stage)
+            self.add(None, ["%s a rdfg:Graph, prov:Entity ; prov:wasGeneratedBy %s ; same:hasIteration %d ."
+                            % (ngraph, execution, iteration),
+                            "%s a fno:Execution, prov:Activity ; fno:executes same:%s ; "
+                            "dcterms:date \"%s\"^^xsd:dateTime ." % (execution, stage, datetime.now().isoformat())])
+        self.add(ngraph, ["<%s> owl:sameAs <%s> . <%s> owl:sameAs <%s> ." % (x, y, y, x) for x, y in links])
+
+    def flush(self):
+        """
+        Inserts the pending statements with one query.
+        """
+        if self.size == 0:
+            return
+        data = "\n".join(" ".join(statements) if named_graph is None
+                         else "GRAPH %s { %s }" % (named_graph, " ".join(statements))
+                         for named_graph, statements in self.pending.items())
+        self.pending = {}
+        self.size = 0
+        self.store.update("""
+            %s
+            # INSERT DATA in the default graph is not supported by the rdflib datasets
+            INSERT {
+              %s
+            } WHERE {}
+        """ % (self.PREFIXES, data))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        if exc_type is None:
+            self.flush()
+
+
+class Setup(object):
+    def __init__(self, store: LocalStore = None):
         self.master_endpoint = Config.master_endpoint
+        self.store = store or get_local_store()
         self.backup_lodcloud = Config.backup_lodcloud
 
     def populate(self, resources_list: list, endpoints_dict: dict = {}):
@@ -26,10 +377,7 @@ class Setup(object):
         :param endpoints_dict: Dict, a void:Dataset and its SPARQL endpoints.
         """
         try:
-            sparql = SPARQLWrapper(self.master_endpoint)
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
-            sparql.setQuery("""
+            self.store.update("""
                 PREFIX same: <https://ns.inria.fr/same/same.owl#>
                 PREFIX owl: <http://www.w3.org/2002/07/owl#>
                 PREFIX void: <http://rdfs.org/ns/void#>
@@ -43,34 +391,20 @@ class Setup(object):
                     %s
                   }
                 }
-            """ % ('.\n'.join(["<" + r + "> a same:Target" for r in resources_list]), 0,
+            """ % (''.join(["<" + r + "> a same:Target .\n" + decomposition_triples(r) + "\n"
+                            for r in resources_list]), 0,
                    ('.\n'.join(["<" + key + "> a void:Dataset ;\n void:sparqlEndpoint " + endpoints_dict[key]
                                 for key in endpoints_dict]))))
-            sparql.query()
-
-            sparql.setQuery("""
-                PREFIX same: <https://ns.inria.fr/same/same.owl#>
-                WITH same:Q0
-                INSERT {
-                  ?IRITarget same:hasNamespace ?nstarget ;
-                  same:hasAuthority ?auttarget ;
-                  same:hasValueWithNoScheme ?noschemetarget
-                } WHERE {
-                  ?IRITarget a same:Target
-                  BIND(REPLACE(STR(?IRITarget), "(#|/)[^#/]*$", "$1") as ?nstarget)
-                  BIND(REPLACE(STR(?IRITarget), ".+://(.*)", "$1") as ?noschemetarget)
-                  BIND(REPLACE(STR(?IRITarget), ".+://(.*?)/.*", "$1") as ?auttarget)
-                }
-            """)
-            sparql.query()
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
 
     def populate_void_rkbexplorer(self):
         """
         Retrieves datasets information on the SPARQL endpoint of the voiD store and populates a triplestore with this
         data (:label: N1).
         """
+        from rdflib import ConjunctiveGraph
+        from SPARQLWrapper import SPARQLWrapper
         try:
             sparql = SPARQLWrapper("http://void.rkbexplorer.com/sparql")
             sparql.method = 'GET'
@@ -91,14 +425,11 @@ class Setup(object):
             results = cg.parse(data=sparql.query().convert().decode('utf-8'), format="application/rdf+xml")
             prefixes = "PREFIX same: <https://ns.inria.fr/same/same.owl#>"
             # Helper.insert_graph(self.master_endpoint, results, 'same:N', prefixes)
-            Helper.insert_graph(self.master_endpoint, results, '<https://ns.inria.fr/same/same.owl#voidStore>',
+            self.store.insert_graph(results, '<https://ns.inria.fr/same/same.owl#voidStore>',
                                 prefixes)
 
             # Remove dupplicated endpoints
-            sparql = SPARQLWrapper(self.master_endpoint)
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
-            sparql.setQuery("""
+            self.store.update("""
                 PREFIX void: <http://rdfs.org/ns/void#>
                 PREFIX dcterms: <http://purl.org/dc/terms/>
                 PREFIX same: <https://ns.inria.fr/same/same.owl#>
@@ -114,15 +445,15 @@ class Setup(object):
                   FILTER(!sameTerm(?URIDataset1, ?URIDataset2))
                 }
             """)
-            sparql.query()
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
 
     def populate_lodcloud(self):
         """
         Retrieves datasets information on the data of lod-cloud.net and populates a triplestore with this data
         (:label: N2).
         """
+        import requests
         try:
             headers = {'Accept': 'application/json'}
             # backup solution if the website lod-cloud.net is down
@@ -157,16 +488,17 @@ class Setup(object):
                        "PREFIX ends: <http://labs.mondeca.com/vocab/endpointStatus#> " \
                        "\nPREFIX same: <https://ns.inria.fr/same/same.owl#>"
             # Helper.insert_array(self.master_endpoint, data, 'same:N', prefixes)
-            Helper.insert_array(self.master_endpoint, data, '<https://ns.inria.fr/same/same.owl#LODCloud>', prefixes)
+            self.store.insert(data, '<https://ns.inria.fr/same/same.owl#LODCloud>', prefixes)
 
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
 
     def populate_datahub(self):
         """
         Retrieves datasets information on the data of old.datahub.io and populates a triplestore with this data
         (:label: N5).
         """
+        import requests
         # original query from: Buil-Aranda, C., Hogan, A., Umbrich, J., & Vandenbussche, P. Y. (2013, October).
         # SPARQL web-querying infrastructure: Ready for action?. In International Semantic Web Conference
         # (pp. 277-293). Springer, Berlin, Heidelberg.
@@ -185,10 +517,10 @@ class Setup(object):
                        "PREFIX xsd: <http://www.w3.org/2001/XMLSchema#> \n" \
                        "PREFIX void: <http://rdfs.org/ns/void#> \nPREFIX dcterms: <http://purl.org/dc/terms/> \n" \
                        "PREFIX ends: <http://labs.mondeca.com/vocab/endpointStatus#>"
-            Helper.insert_array(self.master_endpoint, data, '<https://ns.inria.fr/same/same.owl#DataHub>', prefixes)
+            self.store.insert(data, '<https://ns.inria.fr/same/same.owl#DataHub>', prefixes)
 
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
 
     def populate_linkedwiki(self):
         """
@@ -196,10 +528,7 @@ class Setup(object):
         (:label: N4).
         """
         try:
-            sparql = SPARQLWrapper(self.master_endpoint)
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
-            sparql.setQuery("""
+            self.store.update("""
                 PREFIX void: <http://rdfs.org/ns/void#>
                 PREFIX dcterms: <http://purl.org/dc/terms/>
                 PREFIX dcat: <http://www.w3.org/ns/dcat#>
@@ -218,16 +547,16 @@ class Setup(object):
                   }
                 }
             """)
-            sparql.query()
 
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
 
     def populate_umakata(self):
         """
         Retrieves datasets information on the API of yummydata and populates a triplestore with this data
         (:label: N3).
         """
+        import requests
         try:
             headers = {'Accept': 'application/json'}
             response = requests.get("https://yummydata.org/api/endpoint/search", headers=headers)
@@ -261,21 +590,18 @@ class Setup(object):
                        "PREFIX void: <http://rdfs.org/ns/void#> \nPREFIX dcterms: <http://purl.org/dc/terms/> \n" \
                        "PREFIX ends: <http://labs.mondeca.com/vocab/endpointStatus#>"
             # Helper.insert_array(self.master_endpoint, data, 'same:N', prefixes)
-            Helper.insert_array(self.master_endpoint, data, '<https://ns.inria.fr/same/same.owl#Yummydata>', prefixes)
+            self.store.insert(data, '<https://ns.inria.fr/same/same.owl#Yummydata>', prefixes)
 
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
 
     def cleanup_datasets(self):
         """
         (:label: CN)
         """
         try:
-            sparql = SPARQLWrapper(self.master_endpoint)
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
             # Iteration  difficult to convert in integer in Python
-            sparql.setQuery("""
+            self.store.update("""
                 PREFIX same: <https://ns.inria.fr/same/same.owl#>
                 PREFIX void: <http://rdfs.org/ns/void#>
                 INSERT  {
@@ -297,9 +623,8 @@ class Setup(object):
                     FILTER(?e1 = ?e1) })
                 }
             """)
-            sparql.query()
 
-            sparql.setQuery("""
+            self.store.update("""
                 PREFIX same: <https://ns.inria.fr/same/same.owl#>
                 PREFIX void: <http://rdfs.org/ns/void#>
                 INSERT {
@@ -320,9 +645,8 @@ class Setup(object):
                     }})
                 }
             """)
-            sparql.query()
 
-            sparql.setQuery("""
+            self.store.update("""
                 PREFIX same: <https://ns.inria.fr/same/same.owl#>
                 PREFIX void: <http://rdfs.org/ns/void#>
                 INSERT {
@@ -343,9 +667,8 @@ class Setup(object):
                     }})
                 }
             """)
-            sparql.query()
 
-            sparql.setQuery("""
+            self.store.update("""
                 PREFIX same: <https://ns.inria.fr/same/same.owl#>
                 PREFIX void: <http://rdfs.org/ns/void#>
                 INSERT {
@@ -366,9 +689,8 @@ class Setup(object):
                     }})
                 }
             """)
-            sparql.query()
 
-            sparql.setQuery("""
+            self.store.update("""
                 PREFIX same: <https://ns.inria.fr/same/same.owl#>
                 PREFIX void: <http://rdfs.org/ns/void#>
                 INSERT {
@@ -389,9 +711,8 @@ class Setup(object):
                     }})
                 }
             """)
-            sparql.query()
 
-            sparql.setQuery("""
+            self.store.update("""
                 PREFIX same: <https://ns.inria.fr/same/same.owl#>
                 PREFIX void: <http://rdfs.org/ns/void#>
                 WITH same:N
@@ -407,21 +728,17 @@ class Setup(object):
                   FILTER(STRLEN(STR(?d1)) > STRLEN(STR(?d2)))
                 }
             """)
-            sparql.query()
 
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
 
     def setup_vocabulary(self):
         """
         Initalizes the vocabulary used by the identity link search algorithm in a triplestore.
         """
         try:
-            sparql = SPARQLWrapper(self.master_endpoint)
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
             # Iteration  difficult to convert in integer in Python
-            sparql.setQuery("""
+            self.store.update("""
                 PREFIX same: <https://ns.inria.fr/same/same.owl#>
                 PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
                 PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
@@ -550,48 +867,61 @@ class Setup(object):
                   }
                 }
             """)
-            sparql.query()
 
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
 
     def load_vocabularies_functionalproperties(self):
         """
         Retrieves RDF documents of alleged (inverse) functional properties by using their namespaces
-        (:label: LDD-(I)FP1).
+        (:label: LDD-(I)FP1). The namespaces prefixing resources already in kg:default (e.g. loaded before a resumed
+        run) are not loaded again.
         """
-        sparql = SPARQLWrapper(self.master_endpoint)
-        sparql.method = 'POST'
-        sparql.setReturnFormat(JSON)
-        sparql.setQuery("""
+        from SPARQLWrapper.SPARQLExceptions import EndPointInternalError
+        query = """
             PREFIX same: <https://ns.inria.fr/same/same.owl#>
             SELECT DISTINCT ?nsp
-            FROM same:Properties
-            WHERE { 
-              ?p a ?property ;
-              same:hasNamespace ?nsp
-              FILTER(?property IN (owl:InverseFunctionalProperty, owl:FunctionalProperty))
+            WHERE {
+              GRAPH same:Properties {
+                ?p a ?property ;
+                same:hasNamespace ?nsp
+                FILTER(?property IN (owl:InverseFunctionalProperty, owl:FunctionalProperty))
+              }
             }
-        """)
+        """
         try:
-            json = sparql.query().convert()["results"]["bindings"]
-            #query_pattern = ["LOAD SILENT <" + j["nsp"]["value"] + "> INTO GRAPH kg:default" for j in json]
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
-            for j in json:
-                sparql.setQuery("""
-                    LOAD SILENT <%s> INTO GRAPH kg:default;
-                """ % j["nsp"]["value"])
+            # Namespaces are read before the LOAD clauses to not keep the answer open during the loading
+            namespaces = [j["nsp"] for j in self.store.select(query)]
+            trie = PrefixTrie(namespaces)
+            # Terms defined by the documents already loaded
+            loaded = {namespace for j in self.store.select("""
+                PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+                PREFIX kg: <http://ns.inria.fr/corese/kgram/>
+                SELECT DISTINCT ?resource
+                WHERE {
+                  GRAPH kg:default {
+                    ?resource a ?type
+                  }
+                  VALUES ?type { rdf:Property owl:ObjectProperty owl:DatatypeProperty owl:FunctionalProperty
+                                 owl:InverseFunctionalProperty owl:Class rdfs:Class owl:Ontology }
+                }
+            """) for namespace, _ in trie.prefixes_of(j["resource"])}
+            namespaces = [namespace for namespace in namespaces if namespace not in loaded]
+            #query_pattern = ["LOAD SILENT <" + ns + "> INTO GRAPH kg:default" for ns in namespaces]
+            for ns in namespaces:
                 try:
-                    sparql.query()
-                except (error.HTTPError, SPARQLExceptions.EndPointInternalError):
+                    self.store.update("""
+                        PREFIX kg: <http://ns.inria.fr/corese/kgram/>
+                        LOAD SILENT <%s> INTO GRAPH kg:default
+                    """ % ns)
+                except (error.HTTPError, EndPointInternalError):
                     pass
             #sparql.setQuery(
             #    %s
             # % ';\n'.join(query_pattern))
             #sparql.query()
 
-            sparql.setQuery("""
+            self.store.update("""
                 PREFIX same: <https://ns.inria.fr/same/same.owl#>
                 PREFIX kg: <http://ns.inria.fr/corese/kgram/>	
 
@@ -602,14 +932,14 @@ class Setup(object):
                                !STRSTARTS(STR(?g), STR(kg:)))
                 }
             """)
-            sparql.query()
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
 
 
 class LocalManipulation(object):
-    def __init__(self):
+    def __init__(self, store: LocalStore = None):
         self.master_endpoint = Config.master_endpoint
+        self.store = store or get_local_store()
 
     def get_targets(self, iterator: int = 0) -> [str]:
         """
@@ -617,24 +947,108 @@ class LocalManipulation(object):
         :param iterator: int, iteration of the algorithm (:label: T1).
         :return: List of String, all the same:Target of the iteration it.
         """
-        sparql = SPARQLWrapper(self.master_endpoint)
-        sparql.method = 'POST'
-        sparql.setReturnFormat(JSON)
-        sparql.setQuery("""
+        resources = []
+        try:
+            resources = list(self.iter_targets(iterator))
+        except Exception as err:
+            traceback.print_tb(err.__traceback__)
+        return resources
+
+    def iter_targets(self, iterator: int = 0):
+        """
+        Streams from a local endpoint the same:Target of the iteration it.
+        :param iterator: int, iteration of the algorithm (:label: T1).
+        :return: Generator of String, the same:Target of the iteration it.
+        """
+        query = """
             PREFIX same: <https://ns.inria.fr/same/same.owl#>
             SELECT ?IRITarget
-            FROM same:Q""" + str(iterator - 1) + """
             WHERE {
-              ?IRITarget a same:Target
+              GRAPH same:Q""" + str(iterator - 1) + """ {
+                ?IRITarget a same:Target
+              }
             }
-        """)
-        resources = []
+        """
+        for binding in self.store.select(query):
+            yield binding["IRITarget"]
+
+    def closure_graph(self) -> IdentityGraph:
+        """
+        Reads the closure computed in the local store: the owl:sameAs relationships with the endpoint which provided
+        them, the iteration of the same:Target and the same:Rotten resources.
+        :return: IdentityGraph, closure of the seeds (flattened).
+        """
+        graph = IdentityGraph()
+        for j in self.store.select("""
+            PREFIX same: <https://ns.inria.fr/same/same.owl#>
+            SELECT ?IRITarget ?iteration
+            WHERE {
+              GRAPH ?q {
+                ?IRITarget a same:Target
+              }
+              ?q same:hasIteration ?iteration
+            }
+            ORDER BY ?iteration
+        """):
+            # The first iteration where a resource is a same:Target is kept
+            if j["IRITarget"] not in graph:
+                graph.add_resource(j["IRITarget"], iteration=int(j["iteration"]))
+        for j in self.store.select("""
+            PREFIX same: <https://ns.inria.fr/same/same.owl#>
+            SELECT ?IRIRotten
+            WHERE {
+              GRAPH same:Q-1 {
+                ?IRIRotten a same:Rotten
+              }
+            }
+        """):
+            graph.add_resource(j["IRIRotten"], rotten=True)
+        for j in self.store.select("""
+            PREFIX owl: <http://www.w3.org/2002/07/owl#>
+            SELECT ?x ?y ?g
+            WHERE {
+              GRAPH ?g {
+                ?x owl:sameAs ?y
+              }
+              # Relationships are stored in both directions
+              FILTER(STR(?x) < STR(?y))
+            }
+        """):
+            provenance = PROVENANCE_GRAPH.fullmatch(j["g"])
+            graph.union(j["x"], j["y"], provenance.group(1) if provenance else None)
+        graph.flatten()
+        return graph
+
+    def decompose_iris(self, named_graph: str, types: [str], full: bool = True, batch_size: int = 10000):
+        """
+        Adds the namespace, authority and value with no scheme computed in Python (see samelive.utils.iri) to the
+        resources of a named graph which do not have them yet.
+        :param named_graph: String, named graph of the resources (e.g. same:Q1).
+        :param types: List of String, types of the resources (e.g. same:Target).
+        :param full: bool, adds the namespace, authority and value with no scheme, only the namespace otherwise.
+        :param batch_size: int, number of resources inserted per query.
+        """
         try:
-            json = sparql.query().convert()["results"]["bindings"]
-            resources = [j["IRITarget"]["value"] for j in json]
+            query = """
+                PREFIX owl: <http://www.w3.org/2002/07/owl#>
+                PREFIX same: <https://ns.inria.fr/same/same.owl#>
+                SELECT DISTINCT ?resource
+                WHERE {
+                  GRAPH %s {
+                    ?resource a ?type
+                    FILTER(?type IN (%s))
+                    FILTER(isIRI(?resource))
+                    FILTER NOT EXISTS { ?resource same:hasNamespace ?namespace }
+                  }
+                }
+            """ % (named_graph, ", ".join(types))
+            data = [decomposition_triples(j["resource"], full) for j in self.store.select(query)
+                    if Helper.is_valid_iri(j["resource"])]
+            for i in range(0, len(data), batch_size):
+                self.store.insert(data[i:i + batch_size], named_graph,
+                                  "PREFIX same: <https://ns.inria.fr/same/same.owl#>")
         except Exception as err:
-            traceback.print_tb(err)
-        return resources
+            traceback.print_tb(err.__traceback__)
 
     # TODO generalize
     def get_datasets(self) -> dict:
@@ -642,28 +1056,25 @@ class LocalManipulation(object):
         Returns all the available datasets and the endpoint where we can reach them.
         :return: Dict, key is the dataset and the value is the endpoint.
         """
-        sparql = SPARQLWrapper(self.master_endpoint)
-        sparql.method = 'POST'
-        sparql.setReturnFormat(JSON)
-        sparql.setQuery("""
+        query = """
             PREFIX void: <http://rdfs.org/ns/void#>
             PREFIX ends: <http://labs.mondeca.com/vocab/endpointStatus#>
             PREFIX same: <https://ns.inria.fr/same/same.owl#>
             SELECT ?dataset ?endpoint
-            FROM same:N
             WHERE {
-              ?dataset void:sparqlEndpoint ?endpoint ;
-              ends:status ?status .
-              ?status ends:statusIsAvailable true
+              GRAPH same:N {
+                ?dataset void:sparqlEndpoint ?endpoint ;
+                ends:status ?status .
+                ?status ends:statusIsAvailable true
+              }
             }
-        """)
+        """
         dic_datasets = {}
         try:
-            json = sparql.query().convert()["results"]["bindings"]
-            for j in json:
-                dic_datasets.update({j["dataset"]["value"]: j["endpoint"]["value"]})
+            for j in self.store.select(query):
+                dic_datasets.update({j["dataset"]: j["endpoint"]})
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
         return dic_datasets
 
     def get_datasets_with_limits(self) -> dict:
@@ -671,37 +1082,31 @@ class LocalManipulation(object):
         Returns all the available datasets and the endpoint where we can reach them.
         :return: Dict, key is the dataset and the value is a list containing the endpoint and the limit of results.
         """
-        sparql = SPARQLWrapper(self.master_endpoint)
-        sparql.method = 'POST'
-        sparql.setReturnFormat(JSON)
-        sparql.setQuery("""
+        query = """
             PREFIX void: <http://rdfs.org/ns/void#>
             PREFIX ends: <http://labs.mondeca.com/vocab/endpointStatus#>
             PREFIX same: <https://ns.inria.fr/same/same.owl#>
             SELECT ?dataset ?endpoint ?limit
-            FROM same:N
             WHERE {
-              ?dataset void:sparqlEndpoint ?endpoint ;
-              ends:status ?status .
-              ?status ends:statusIsAvailable true ;
-              ?status same:hasResultsLimit ?limit
+              GRAPH same:N {
+                ?dataset void:sparqlEndpoint ?endpoint ;
+                ends:status ?status .
+                ?status ends:statusIsAvailable true ;
+                same:hasResultsLimit ?limit
+              }
             }
-        """)
+        """
         dic_datasets = {}
         try:
-            json = sparql.query().convert()["results"]["bindings"]
-            for j in json:
-                dic_datasets.update({j["dataset"]["value"]: [j["endpoint"]["value"], j["limit"]["value"]]})
+            for j in self.store.select(query):
+                dic_datasets.update({j["dataset"]: [j["endpoint"], j["limit"]]})
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
         return dic_datasets
 
     def compute_inversefunctionalproperty(self, iterator: int = 1):
         try:
-            sparql = SPARQLWrapper(self.master_endpoint)
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
-            sparql.setQuery("""
+            self.store.update("""
                 PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
                 INSERT {
                   ?URITarget1 owl:sameAs ?URITarget2 .
@@ -713,213 +1118,627 @@ class LocalManipulation(object):
                   FILTER (?URITarget1 != ?URITarget2)
                 }
             """)
-            sparql.query()
 
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
 
     def voting_functionalproperties(self):
         """
-        Performs voting on the type of (inverse) functional properties (:label: V-(I)FP1).
+        Performs voting on the type of (inverse) functional properties (:label: V-(I)FP1). The definitions of the not
+        deferenced properties are read once, the counts of same:PropertiesNotDeferencedStatistics and the votes are
+        computed in Python and inserted with one query per graph.
         """
         try:
-            sparql = SPARQLWrapper(self.master_endpoint)
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
-            sparql.setQuery("""
-                PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-                PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-                PREFIX owl: <http://www.w3.org/2002/07/owl#>
+            # Number of types of each not deferenced property, the counts of the aggregations are multiplied by it
+            nb_types = {}
+            # Property: datasets defining it (one per definition), as an owl:FunctionalProperty, as an
+            # owl:InverseFunctionalProperty and datasets having its schema
+            definitions = {}
+            definitions_fp = {}
+            definitions_ifp = {}
+            schemas = {}
+            for j in self.store.select("""
                 PREFIX same: <https://ns.inria.fr/same/same.owl#>
-                
-                INSERT {
-                  GRAPH same:PropertiesNotDeferencedStatistics {
-                    ?propertyNotDefined same:inNbOfDataset ?nbTotal 
-                  }
-                } WHERE {
-                  select (count(?dataset) as ?nbTotal) ?propertyNotDefined where {
-                    Graph same:PropertiesNotDeferenced {
-                      ?propertyNotDefined a ?type1
+                SELECT ?property ?type ?dataset ?schema
+                WHERE {
+                  {
+                    GRAPH same:PropertiesNotDeferenced {
+                      ?property a ?type
                     }
-                    Graph same:Properties {
-                      <<?propertyNotDefined a ?type>> same:statementInDataset ?dataset
+                  } UNION {
+                    GRAPH same:Properties {
+                      <<?property a ?type>> same:statementInDataset ?dataset
                     }
-                  } group by ?propertyNotDefined
-                }
-            """)
-            sparql.query()
-
-            sparql.setQuery("""
-                PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-                PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-                PREFIX owl: <http://www.w3.org/2002/07/owl#>
-                PREFIX same: <https://ns.inria.fr/same/same.owl#>
-
-                INSERT {
-                  GRAPH same:PropertiesNotDeferencedStatistics {
-                    ?propertyDefinedAsFunctionalProperty same:nbOfTimesDefinedAsFunctionalProperty ?nbDefinedAsFunctionalProperty
-                  }
-                } WHERE {
-                  select (count(?dataset) as ?nbDefinedAsFunctionalProperty) ?propertyDefinedAsFunctionalProperty where {
-                    Graph same:PropertiesNotDeferenced {
-                      ?propertyDefinedAsFunctionalProperty a ?type1
-                    }
-
-                    Graph same:Properties {
-                      <<?propertyDefinedAsFunctionalProperty a owl:FunctionalProperty>> same:statementInDataset ?dataset .
-                      ?dataset same:hasSchemaFor ?propertyDefinedAsFunctionalProperty
+                  } UNION {
+                    GRAPH same:Properties {
+                      ?schema same:hasSchemaFor ?property
                     }
-                  } group by ?propertyDefinedAsFunctionalProperty
-                }
-            """)
-            sparql.query()
-
-            sparql.setQuery("""
-                PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-                PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-                PREFIX owl: <http://www.w3.org/2002/07/owl#>
-                PREFIX same: <https://ns.inria.fr/same/same.owl#>
-
-                INSERT {
-                  GRAPH same:PropertiesNotDeferencedStatistics {
-                    ?propertyDefinedAsInverseFunctionalProperty same:nbOfTimesDefinedAsInverseFunctionalProperty ?nbDefinedAsInverseFunctionalProperty
                   }
-                } WHERE {
-                  select (count(?dataset) as ?nbDefinedAsInverseFunctionalProperty) ?propertyDefinedAsInverseFunctionalProperty where {
-                    Graph same:PropertiesNotDeferenced {
-                      ?propertyDefinedAsInverseFunctionalProperty a ?type1
-                    }
-                    Graph same:Properties {
-                      <<?propertyDefinedAsInverseFunctionalProperty a owl:InverseFunctionalProperty>> same:statementInDataset ?dataset .
-                      ?dataset same:hasSchemaFor ?propertyDefinedAsInverseFunctionalProperty
-                    }
-                  } group by ?propertyDefinedAsInverseFunctionalProperty
                 }
-            """)
-            sparql.query()
-
-            sparql.setQuery("""
-                PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-                PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+            """):
+                p = j["property"]
+                if "schema" in j:
+                    schemas.setdefault(p, set()).add(j["schema"])
+                elif "dataset" in j:
+                    definitions.setdefault(p, []).append(j["dataset"])
+                    if j["type"] == "http://www.w3.org/2002/07/owl#FunctionalProperty":
+                        definitions_fp.setdefault(p, set()).add(j["dataset"])
+                    elif j["type"] == "http://www.w3.org/2002/07/owl#InverseFunctionalProperty":
+                        definitions_ifp.setdefault(p, set()).add(j["dataset"])
+                else:
+                    nb_types[p] = nb_types.get(p, 0) + 1
+
+            statistics = []
+            votes = []
+            for p, nb in nb_types.items():
+                total = nb * len(schemas.get(p, ()))
+                counts = {"inNbOfDataset": nb * len(definitions.get(p, ())),
+                          "inNbOfDatasetWithSchema": total,
+                          # Definitions in the datasets having the schema of the property
+                          "nbOfTimesDefinedAsFunctionalProperty":
+                              nb * len(definitions_fp.get(p, set()) & schemas.get(p, set())),
+                          "nbOfTimesDefinedAsInverseFunctionalProperty":
+                              nb * len(definitions_ifp.get(p, set()) & schemas.get(p, set()))}
+                statistics.extend("<%s> same:%s %d ." % (p, name, count) for name, count in counts.items()
+                                  if count != 0)
+                if total == 0:
+                    continue
+                # Majority of the datasets having the schema of the property
+                if counts["nbOfTimesDefinedAsInverseFunctionalProperty"] != 0 \
+                        and 2 * counts["nbOfTimesDefinedAsInverseFunctionalProperty"] >= total:
+                    votes.append("<%s> same:votingType owl:InverseFunctionalProperty ." % p)
+                if counts["nbOfTimesDefinedAsFunctionalProperty"] != 0 \
+                        and 2 * counts["nbOfTimesDefinedAsFunctionalProperty"] >= total:
+                    votes.append("<%s> same:votingType owl:FunctionalProperty ." % p)
+
+            prefixes = """
                 PREFIX owl: <http://www.w3.org/2002/07/owl#>
                 PREFIX same: <https://ns.inria.fr/same/same.owl#>
-
-                INSERT {
-                  GRAPH same:PropertiesNotDeferencedStatistics {
-                    ?propertyNotDefinedWithSchema same:inNbOfDatasetWithSchema ?nbTotalSchemaFor
-                  }
-                } WHERE {
-                  select (count(?dataset) as ?nbTotalSchemaFor) ?propertyNotDefinedWithSchema where {
-                    Graph same:PropertiesNotDeferenced {
-                      ?propertyNotDefinedWithSchema a ?type
-                    }
-                    Graph same:Properties {
-                      ?dataset same:hasSchemaFor ?propertyNotDefinedWithSchema
-                    }
-                  } group by ?propertyNotDefinedWithSchema
-                }
-            """)
-            sparql.query()
-
-            sparql.setQuery("""
-                    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-                    PREFIX owl: <http://www.w3.org/2002/07/owl#>
-                    PREFIX same: <https://ns.inria.fr/same/same.owl#>
-                    PREFIX kg: <http://ns.inria.fr/corese/kgram/>
-
-                    INSERT {
-                      Graph kg:default {
-                        ?property same:votingType ?votingType
-                      }
-                    } WHERE {
-                      GRAPH same:PropertiesNotDeferencedStatistics {
-                        ?property same:nbOfTimesDefinedAsInverseFunctionalProperty ?nbDefinedAsInverseFunctionalProperty .
-                        ?property same:inNbOfDatasetWithSchema ?total
-                      }
-                      BIND(IF(?nbDefinedAsInverseFunctionalProperty >= ?total/2, owl:InverseFunctionalProperty, false)  as ?votingType)
-                      FILTER(?votingType != false)
-                    }
-                    """)
-            sparql.query()
-
-            sparql.setQuery("""
-                    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-                    PREFIX owl: <http://www.w3.org/2002/07/owl#>
-                    PREFIX same: <https://ns.inria.fr/same/same.owl#>
-                    PREFIX kg: <http://ns.inria.fr/corese/kgram/>
-
-                    INSERT {
-                      Graph kg:default {
-                        ?property same:votingType ?votingType
-                      }
-                    } WHERE {
-                      GRAPH same:PropertiesNotDeferencedStatistics {
-                        ?property same:nbOfTimesDefinedAsFunctionalProperty ?nbDefinedAsFunctionalProperty .
-                        ?property same:inNbOfDatasetWithSchema ?total
-                      }
-                      BIND(IF(?nbDefinedAsFunctionalProperty >= ?total/2, owl:FunctionalProperty, false)  as ?votingType)
-                      FILTER(?votingType != false)
-                    }
-                    """)
-            sparql.query()
+                PREFIX kg: <http://ns.inria.fr/corese/kgram/>
+            """
+            if len(statistics) != 0:
+                self.store.insert(statistics, "same:PropertiesNotDeferencedStatistics", prefixes)
+            if len(votes) != 0:
+                self.store.insert(votes, "kg:default", prefixes)
 
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
 
 
 class EndpointExploration(object):
 
-    def __init__(self):
+    def __init__(self, store: LocalStore = None, lookups: LookupCache = None, value_index: ValueIndex = None):
+        """
+        :param store: LocalStore, store of the local state (see get_local_store if None).
+        :param lookups: LookupCache, answers of the remote endpoints shared with other explorations, used when the
+        remote endpoints are queried from Python.
+        :param value_index: ValueIndex, values of the (inverse) functional properties already met (see
+        Config.value_index_path if None).
+        """
         self.master_endpoint = Config.master_endpoint
+        self.store = store or get_local_store()
+        self.lookups = lookups
+        self.value_index = value_index or (ValueIndex(Config.value_index_path)
+                                           if Config.value_index_path is not None else None)
         self.timeout = Config.timeout
         self.IS_CORESE_ENGINE = Config.IS_CORESE_ENGINE
         self.NON_ASCII_CHARACTERS_HANDLING = Config.NON_ASCII_CHARACTERS_HANDLING
 
-    def optimize_remote_queries(self, function, iterator: int = 1):
+    def optimize_remote_queries(self, function, iterator: int = 1) -> [str]:
         """
         Allows to handle bindings with the VALUES clause and non-ASCII characters when generating SPARQL queries for
-        remote endpoints. Then this function will execute these SPARQL queries.
+        remote endpoints. Then this function will execute these SPARQL queries, one per group of endpoints sharing the
+        same capabilities (see plan_remote_queries).
         :param function: Function used to generate patterns of SPARQL queries (the function may return a String or tuple
         of Strings).
         :param iterator: int, iteration of the algorithm.
+        :return: List of String, same:Target added to the iteration when the queries are sent from Python, None when
+        they are run by the local store (the same:Target have to be read from the local store).
+        """
+        # The (inverse) functional properties are joined in Python, only the voted properties are requested
+        if Config.CLIENT_SIDE_FUNC_PROP or not self.store.supports_service:
+            if function == self._generate_query_pattern_functionalproperties_links1:
+                # (I)FP1 only retrieves values
+                self.retrieve_functionalproperties_values(iterator)
+                return []
+            if function == self._generate_queries_pattern_functionalproperties_links2:
+                return self.retrieve_functionalproperties_links(iterator)
+        # The owl:sameAs relationships are checked as they arrive in Python
+        if Config.ONLINE_ROTTEN_DETECTION and function == self._generate_query_pattern_sameas:
+            return self.retrieve_sameas(iterator)
+        # The local store cannot reach the remote endpoints, the queries are sent from Python
+        if not self.store.supports_service:
+            if function == self._generate_query_pattern_sameas:
+                return self.retrieve_sameas(iterator)
+            print(function.__name__ + " requires a local store supporting the clause SERVICE, skipped.")
+            return []
+        try:
+            for values, datasets, targets in self.plan_remote_queries(iterator):
+                # Optimizations with the Corese engine, replace it with @bind in older versions of Corese
+                sparql_annotations = ("@binding kg:values" if values else "@binding kg:filter") \
+                    if self.IS_CORESE_ENGINE else ""
+                # The endpoints and same:Target of the group are bound in the query
+                dataset_options = ". VALUES ?dataset { %s }" % " ".join("<" + d + ">" for d in datasets)
+                target_options = "VALUES ?IRITarget { %s }" % " ".join("<" + t + ">" for t in targets)
+                queries = function(iterator=iterator, sparql_annotations=sparql_annotations,
+                                   dataset_options=dataset_options, target_options=target_options)
+                for query in queries if type(queries) is tuple else [queries]:
+                    self.store.update(query)
+
+        except Exception as err:
+            traceback.print_tb(err.__traceback__)
+        # The same:Target found by the queries are decomposed in Python
+        LocalManipulation(self.store).decompose_iris("same:Q%d" % iterator, ["same:Target"])
+
+    def plan_remote_queries(self, iterator: int = 1) -> [(bool, [str], [str])]:
+        """
+        Groups the available endpoints by capabilities (support of the VALUES clause and of non-ASCII characters) and
+        computes the same:Target sent to each group: the same:Target with non-ASCII characters are only sent to the
+        endpoints supporting them.
+        :param iterator: int, iteration of the algorithm.
+        :return: List of tuples, support of the VALUES clause, datasets and same:Target of the group.
+        """
+        targets = [t for t in LocalManipulation(self.store).iter_targets(iterator) if Helper.is_valid_iri(t)]
+        ascii_targets = [t for t in targets if decompose(t).is_ascii]
+        # Without non-ASCII same:Target, the endpoints supporting them or not form the same group
+        has_non_ascii = len(ascii_targets) != len(targets)
+        groups = {}
+        for dataset, _, values, non_ascii in self._available_datasets():
+            groups.setdefault((values and self.IS_CORESE_ENGINE, non_ascii and has_non_ascii), []).append(dataset)
+        return [(values, datasets, targets if non_ascii else ascii_targets)
+                for (values, non_ascii), datasets in groups.items()]
+
+    def _available_datasets(self) -> [(str, str, bool, bool)]:
+        """
+        Lists the available datasets and the capabilities of their endpoints.
+        :return: List of tuples, dataset, SPARQL endpoint, support of the VALUES clause and of non-ASCII characters
+        (False if NON_ASCII_CHARACTERS_HANDLING is disabled).
+        """
+        query = """
+            PREFIX void: <http://rdfs.org/ns/void#>
+            PREFIX ends: <http://labs.mondeca.com/vocab/endpointStatus#>
+            PREFIX same: <https://ns.inria.fr/same/same.owl#>
+            SELECT DISTINCT ?dataset ?endpoint ?values ?nonASCII
+            WHERE {
+              GRAPH same:N {
+                ?dataset void:sparqlEndpoint ?endpoint ;
+                ends:status ?status .
+                ?status ends:statusIsAvailable true
+                OPTIONAL { ?status same:valuesIsAvailable ?values }
+                OPTIONAL { ?status same:supportsNonASCIICharacters ?nonASCII }
+              }
+            }
+        """
+        return [(j["dataset"], j["endpoint"], j.get("values") == "true",
+                 self.NON_ASCII_CHARACTERS_HANDLING and j.get("nonASCII") == "true") for j in self.store.select(query)]
+
+    def retrieve_sameas(self, iterator: int = 1) -> [str]:
+        """
+        Retrieves owl:sameAs relationships with queries sent from Python to the available endpoints then inserts them
+        in the local store as the query of _generate_query_pattern_sameas (:label: S1).
+        :param iterator: int, iteration of the algorithm.
+        :return: List of String, same:Target added to the iteration.
+        """
+        added = []
+        try:
+            targets = list(LocalManipulation(self.store).iter_targets(iterator))
+            ascii_targets = [t for t in targets if decompose(t).is_ascii]
+            datasets = self._available_datasets()
+            if len(targets) == 0 or len(datasets) == 0:
+                return added
+
+            with concurrent.futures.ThreadPoolExecutor(Config.remote_workers) as executor:
+                links = list(executor.map(lambda d: self._remote_sameas(d[1], targets if d[3] else ascii_targets,
+                                                                        d[2]), datasets))
+
+            query = """
+                PREFIX same: <https://ns.inria.fr/same/same.owl#>
+                SELECT DISTINCT ?x
+                WHERE {
+                  { ?x a same:Target } UNION { GRAPH same:Q-1 { ?x a same:Rotten } }
+                }
+            """
+            known = {j["x"] for j in self.store.select(query)}
+            # Rotten relationships are rejected as they arrive (R1 and R2 still run at the end of the iteration)
+            checker = RottenChecker(LocalManipulation(self.store).closure_graph()) \
+                if Config.ONLINE_ROTTEN_DETECTION else None
+            # Rejected resource: dataset where it was found
+            rotten = {}
+            with ProvenanceBuffer(self.store) as buffer:
+                # Resource linked to a same:Target: datasets where it was found
+                candidates = {}
+                for (dataset, endpoint, _, _), dataset_links in zip(datasets, links):
+                    dataset_links = [(t, y) for t, y in dataset_links if y not in known]
+                    if checker is not None:
+                        accepted = [checker.accept(t, y, endpoint) for t, y in dataset_links]
+                        rotten.update((y, dataset) for (_, y), a in zip(dataset_links, accepted)
+                                      if not a and y not in rotten)
+                        dataset_links = [link for link, a in zip(dataset_links, accepted) if a]
+                    if len(dataset_links) == 0:
+                        continue
+                    buffer.add_links(endpoint, iterator, "S1", dataset_links)
+                    for _, y in dataset_links:
+                        candidates.setdefault(y, []).append(dataset)
+                admitted = self._admit_targets(buffer, iterator, candidates)
+                if len(admitted) != 0:
+                    buffer.add(None, ["same:Q%d same:hasIteration %d ." % (iterator, iterator)])
+                # A resource rejected by an identity set and accepted by another one is not rotten
+                if checker is not None:
+                    rejected = checker.rotten()
+                    rotten = {y: dataset for y, dataset in rotten.items() if y in rejected}
+                if len(rotten) != 0:
+                    print("Resources rejected as same:Rotten during S1: " + str(len(rotten)))
+                    buffer.add("same:Q-1", ["<%s> a same:Rotten ; void:inDataset <%s> . %s"
+                                            % (y, dataset, decomposition_triples(y)) for y, dataset in rotten.items()])
+
+            # The same:Target are in the local store once the buffer is flushed
+            added = admitted
+
+        except Exception as err:
+            traceback.print_tb(err.__traceback__)
+        return added
+
+    def _admit_targets(self, buffer: ProvenanceBuffer, iterator: int, candidates: dict) -> [str]:
+        """
+        Adds the resources newly linked to the same:Target as same:Target of the iteration, within the caps of the
+        FrontierManager. The candidates deferred by the previous stages are ranked with them, those not admitted are
+        kept in same:Deferred for the next stages.
+        :param buffer: ProvenanceBuffer, buffer where the same:Target are inserted.
+        :param iterator: int, iteration of the algorithm.
+        :param candidates: Dict, resource: datasets where it was found.
+        :return: List of String, same:Target added to the iteration.
         """
+        frontier = FrontierManager(Config.frontier_max_targets, Config.frontier_max_per_authority)
+        for y, datasets in candidates.items():
+            frontier.add(y, datasets, iterator)
+        deferred_before = False
+        for j in self.store.select("""
+            PREFIX void: <http://rdfs.org/ns/void#>
+            PREFIX same: <https://ns.inria.fr/same/same.owl#>
+            SELECT ?x ?dataset ?iteration
+            WHERE {
+              GRAPH same:Deferred {
+                ?x void:inDataset ?dataset ;
+                same:hasIteration ?iteration
+              }
+              FILTER NOT EXISTS { ?x a same:Target }
+              FILTER NOT EXISTS { GRAPH same:Q-1 { ?x a same:Rotten } }
+            }
+        """):
+            frontier.add(j["x"], [j["dataset"]], int(j["iteration"]))
+            deferred_before = True
+        if len(frontier) == 0:
+            return []
+        # same:Target already added to the iteration by the previous stages
+        admitted = {j["authority"]: int(j["number"]) for j in self.store.select("""
+            PREFIX same: <https://ns.inria.fr/same/same.owl#>
+            SELECT ?authority (COUNT(DISTINCT ?x) AS ?number)
+            WHERE {
+              GRAPH same:Q%d {
+                ?x a same:Target ;
+                same:hasAuthority ?authority
+              }
+            }
+            GROUP BY ?authority
+        """ % iterator)}
+        selected, deferred = frontier.select(admitted)
+        # The candidates still deferred are written again with the datasets found since
+        if deferred_before:
+            self.store.update("CLEAR SILENT GRAPH <https://ns.inria.fr/same/same.owl#Deferred>")
+        if len(deferred) != 0:
+            print("Resources deferred to the next iterations: " + str(len(deferred)))
+        buffer.add("same:Q%d" % iterator, ["<%s> a same:Target ; void:inDataset %s . %s"
+                                           % (y, ", ".join("<%s>" % d for d in frontier.datasets[y]),
+                                              decomposition_triples(y)) for y in selected])
+        buffer.add("same:Deferred", ["<%s> void:inDataset %s ; same:hasIteration %d ."
+                                     % (y, ", ".join("<%s>" % d for d in frontier.datasets[y]), frontier.depth[y])
+                                     for y in deferred])
+        return selected
+
+    def _remote_sameas(self, endpoint: str, targets: [str], values: bool) -> [(str, str)]:
+        """
+        Retrieves the owl:sameAs relationships of same:Target resources on an endpoint, the resources are bound by
+        batches of Config.remote_batch_size. Resources already looked up on the endpoint by another exploration sharing
+        the LookupCache are not queried again.
+        :param endpoint: String, URL of the SPARQL endpoint.
+        :param targets: List of String, same:Target resources.
+        :param values: bool, binds the resources with the clause VALUES if True, with a FILTER otherwise.
+        :return: List of tuples, a same:Target and an IRI linked with owl:sameAs.
+        """
+        import requests
+        if self.lookups is None:
+            owned, futures = targets, {}
+        else:
+            owned, futures = self.lookups.claim(endpoint, targets)
+        answers = {}
         try:
-            sparql = SPARQLWrapper(self.master_endpoint)
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
-            # Optimizations with the Corese engine
-            if self.IS_CORESE_ENGINE:
-                for query in Helper.non_ascii_characters_handling(function, iterator=iterator,
-                                                                  handle_non_ascii=self.NON_ASCII_CHARACTERS_HANDLING,
-                                                                  # Replace it with @bind in older versions of
-                                                                  # Corese
-                                                                  sparql_annotations="@binding kg:values",
-                                                                  dataset_options="same:valuesIsAvailable true"):
-                    sparql.setQuery(query)
-                    sparql.query()
-
-                # Bindings with FILTER
-                for query in Helper.non_ascii_characters_handling(function, iterator=iterator,
-                                                                  handle_non_ascii=self.NON_ASCII_CHARACTERS_HANDLING,
-                                                                  # Replace it with @bind in older versions of
-                                                                  # Corese
-                                                                  sparql_annotations="@binding kg:filter",
-                                                                  dataset_options="same:valuesIsAvailable false"):
-                    sparql.setQuery(query)
-                    sparql.query()
-
-            # Default behavior for other triplestores
+            for i in range(0, len(owned), Config.remote_batch_size):
+                batch_answers = {t: [] for t in owned[i:i + Config.remote_batch_size]}
+                batch = ["<" + t + ">" for t in batch_answers]
+                if values:
+                    bindings, bindings_filter = "VALUES ?IRITarget { %s }" % " ".join(batch), ""
+                else:
+                    bindings, bindings_filter = "", "FILTER(?IRITarget IN (%s))" % ", ".join(batch)
+                for j in Helper.stream_select(endpoint, """
+                    SELECT DISTINCT ?IRITarget ?y WHERE {
+                      %s
+                      { ?IRITarget <http://www.w3.org/2002/07/owl#sameAs> ?y }
+                      UNION
+                      { ?y <http://www.w3.org/2002/07/owl#sameAs> ?IRITarget }
+                      FILTER(!isBlank(?y))
+                      %s
+                    }
+                """ % (bindings, bindings_filter), timeout=self.timeout):
+                    # Data clearing some IRI are represented as a String
+                    if "y" in j and j.get("IRITarget") in batch_answers and Helper.is_valid_iri(j["y"]):
+                        batch_answers[j["IRITarget"]].append(j["y"])
+                if self.lookups is not None:
+                    self.lookups.resolve(endpoint, batch_answers)
+                answers.update(batch_answers)
+        except (requests.exceptions.RequestException, ValueError) as err:
+            print(endpoint + ": " + str(err))
+        finally:
+            # The claimed lookups are always settled, the other explorations would otherwise wait for them forever
+            if self.lookups is not None:
+                self.lookups.release(endpoint, [t for t in owned if t not in answers])
+
+        # Lookups of the other explorations are awaited once the claimed ones are resolved
+        for target, future in futures.items():
+            if target not in answers:
+                answers[target] = future.result()
+        return [(t, y) for t, linked in answers.items() for y in linked]
+
+    def _voted_functionalproperties(self) -> ([str], [str]):
+        """
+        Lists the (inverse) functional properties kept by the vote (:label: V-(I)FP1).
+        :return: Tuple, IRIs of the inverse functional properties and of the functional properties.
+        """
+        properties = {"http://www.w3.org/2002/07/owl#InverseFunctionalProperty": [],
+                      "http://www.w3.org/2002/07/owl#FunctionalProperty": []}
+        for j in self.store.select("""
+            PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+            PREFIX owl: <http://www.w3.org/2002/07/owl#>
+            PREFIX same: <https://ns.inria.fr/same/same.owl#>
+            PREFIX kg: <http://ns.inria.fr/corese/kgram/>
+            SELECT DISTINCT ?property ?type
+            WHERE {
+              GRAPH kg:default {
+                ?property rdf:type|same:votingType ?type
+              }
+              VALUES ?type { owl:InverseFunctionalProperty owl:FunctionalProperty }
+            }
+        """):
+            properties[j["type"]].append(j["property"])
+        return tuple(properties.values())
+
+    def retrieve_functionalproperties_values(self, iterator: int = 1):
+        """
+        Retrieves the values of the voted (inverse) functional properties of the same:Target with queries sent from
+        Python to the available endpoints, only these properties are requested (:label: (I)FP1, same data as the query
+        of _generate_query_pattern_functionalproperties_links1).
+        :param iterator: int, iteration of the algorithm.
+        """
+        try:
+            ifps, fps = self._voted_functionalproperties()
+            targets = [t for t in LocalManipulation(self.store).iter_targets(iterator) if Helper.is_valid_iri(t)]
+            ascii_targets = [t for t in targets if decompose(t).is_ascii]
+            datasets = self._available_datasets()
+            if len(ifps) + len(fps) == 0 or len(targets) == 0 or len(datasets) == 0:
+                return
+
+            with concurrent.futures.ThreadPoolExecutor(Config.remote_workers) as executor:
+                answers = list(executor.map(lambda d: self._remote_functionalproperties_values(
+                    d[1], targets if d[3] else ascii_targets, d[2], ifps, fps), datasets))
+            if self.value_index is not None:
+                for (_, endpoint, _, _), (ifp_values, fp_values) in zip(datasets, answers):
+                    self.value_index.add(INVERSE_FUNCTIONAL, [(p, value, Helper.lexical_value(x), endpoint)
+                                                              for x, p, value in ifp_values])
+                    self.value_index.add(FUNCTIONAL, [(p, value, Helper.lexical_value(x), endpoint)
+                                                      for value, p, x in fp_values])
+
+            with ProvenanceBuffer(self.store) as buffer:
+                for ifp_values, fp_values in answers:
+                    buffer.add("same:InverseFunctionalProperty_%d" % iterator, ["%s %s %s ." % s for s in ifp_values])
+                    buffer.add("same:FunctionalProperty_%d" % iterator, ["%s %s %s ." % s for s in fp_values])
+                buffer.add(None, ["same:InverseFunctionalProperty_%d same:hasIteration %d ." % (iterator, iterator),
+                                  "same:FunctionalProperty_%d same:hasIteration %d ." % (iterator, iterator)])
+
+        except Exception as err:
+            traceback.print_tb(err.__traceback__)
+
+    def _remote_functionalproperties_values(self, endpoint: str, targets: [str], values: bool, ifps: [str],
+                                            fps: [str]) -> ([(str, str, str)], [(str, str, str)]):
+        """
+        Retrieves the values of (inverse) functional properties of same:Target resources on an endpoint, the resources
+        are bound by batches of Config.remote_batch_size.
+        :param endpoint: String, URL of the SPARQL endpoint.
+        :param targets: List of String, same:Target resources.
+        :param values: bool, binds the resources and the properties with the clause VALUES if True, with a FILTER
+        otherwise.
+        :param ifps: List of String, inverse functional properties (the same:Target is the subject).
+        :param fps: List of String, functional properties (the same:Target is the object).
+        :return: Tuple, statements (subject, property, object in the SPARQL syntax) of the inverse functional
+        properties and of the functional properties.
+        """
+        import requests
+        answers = ([], [])
+        try:
+            for i in range(0, len(targets), Config.remote_batch_size):
+                batch = ["<" + t + ">" for t in targets[i:i + Config.remote_batch_size]]
+                for properties, pattern, statements in ((ifps, "?IRITarget ?p ?value", answers[0]),
+                                                        (fps, "?value ?p ?IRITarget", answers[1])):
+                    if len(properties) == 0:
+                        continue
+                    iris = ["<" + p + ">" for p in properties]
+                    if values:
+                        bindings = "VALUES ?IRITarget { %s } VALUES ?p { %s }" % (" ".join(batch), " ".join(iris))
+                        bindings_filter = ""
+                    else:
+                        bindings = ""
+                        bindings_filter = "FILTER(?IRITarget IN (%s) && ?p IN (%s))" % (", ".join(batch),
+                                                                                       ", ".join(iris))
+                    for j in Helper.stream_select(endpoint, """
+                        SELECT DISTINCT ?IRITarget ?p ?value WHERE {
+                          %s
+                          %s
+                          FILTER(!isBlank(?value))
+                          %s
+                        }
+                    """ % (bindings, pattern, bindings_filter), timeout=self.timeout, terms=True):
+                        if {"IRITarget", "p", "value"} <= j.keys():
+                            statements.append((j["IRITarget"], j["p"], j["value"]) if properties is ifps
+                                              else (j["value"], j["p"], j["IRITarget"]))
+        except (requests.exceptions.RequestException, ValueError) as err:
+            print(endpoint + ": " + str(err))
+        return answers
+
+    def retrieve_functionalproperties_links(self, iterator: int = 1) -> [str]:
+        """
+        Computes new same:Target resources and owl:sameAs relationships with the (inverse) functional properties
+        (:label: (I)FP2, same data as the queries of _generate_queries_pattern_functionalproperties_links2). The values
+        retrieved by (I)FP1 are indexed in memory, only the resources sharing one of them are requested from the
+        available endpoints and the owl:sameAs relationships are derived in Python. With a ValueIndex, the values
+        already requested from an endpoint are not requested again and the resources of all the endpoints sharing a
+        normalized value are matched.
+        :param iterator: int, iteration of the algorithm.
+        :return: List of String, same:Target added to the iteration.
+        """
+        added = []
+        try:
+            # (property, value of the same:Target): same:Target, the value is the object for the inverse functional
+            # properties and the subject for the functional properties
+            indexes = ({}, {})
+            for j in self.store.select("""
+                PREFIX same: <https://ns.inria.fr/same/same.owl#>
+                SELECT ?x ?p ?value
+                WHERE {
+                  GRAPH same:InverseFunctionalProperty_%d {
+                    ?x ?p ?value
+                  }
+                }
+            """ % iterator, terms=True):
+                indexes[INVERSE_FUNCTIONAL].setdefault((j["p"], j["value"]), []).append(Helper.lexical_value(j["x"]))
+            for j in self.store.select("""
+                PREFIX same: <https://ns.inria.fr/same/same.owl#>
+                SELECT ?x ?p ?value
+                WHERE {
+                  GRAPH same:FunctionalProperty_%d {
+                    ?value ?p ?x
+                  }
+                }
+            """ % iterator, terms=True):
+                indexes[FUNCTIONAL].setdefault((j["p"], j["value"]), []).append(Helper.lexical_value(j["x"]))
+            datasets = self._available_datasets()
+            if len(indexes[0]) + len(indexes[1]) == 0 or len(datasets) == 0:
+                return added
+            keys = (list(indexes[0]), list(indexes[1]))
+            if self.value_index is None:
+                requested = [keys] * len(datasets)
             else:
-                for query in Helper.non_ascii_characters_handling(function, iterator=iterator,
-                                                                  handle_non_ascii=self.NON_ASCII_CHARACTERS_HANDLING):
-                    sparql.setQuery(query)
-                    sparql.query()
+                requested = [tuple(self.value_index.unprobed(kind, endpoint, keys[kind]) for kind in (0, 1))
+                             for _, endpoint, _, _ in datasets]
+
+            with concurrent.futures.ThreadPoolExecutor(Config.remote_workers) as executor:
+                answers = list(executor.map(lambda d, k: self._remote_functionalproperties_resources(d[1], k, d[2]),
+                                            datasets, requested))
+
+            # Endpoint: resources (kind of property, IRI, key of indexes) sharing a value with a same:Target
+            found = {}
+            for (_, endpoint, _, _), endpoint_keys, (resources, complete) in zip(datasets, requested, answers):
+                for kind in (0, 1):
+                    found.setdefault(endpoint, set()).update((kind, x2, endpoint_keys[kind][k])
+                                                             for x2, k in resources[kind])
+                    if self.value_index is not None:
+                        self.value_index.add(kind, [endpoint_keys[kind][k] + (x2, endpoint)
+                                                    for x2, k in resources[kind]])
+                        # The values are requested again if the endpoint failed
+                        if complete:
+                            self.value_index.set_probed(kind, endpoint, endpoint_keys[kind])
+            if self.value_index is not None:
+                for kind in (0, 1):
+                    for key in keys[kind]:
+                        for x2, endpoint in self.value_index.match(kind, *key):
+                            if endpoint in found:
+                                found[endpoint].add((kind, x2, key))
+
+            query = """
+                PREFIX same: <https://ns.inria.fr/same/same.owl#>
+                SELECT DISTINCT ?x
+                WHERE {
+                  { ?x a same:Target } UNION { GRAPH same:Q-1 { ?x a same:Rotten } }
+                }
+            """
+            known = {j["x"] for j in self.store.select(query)}
+            with ProvenanceBuffer(self.store) as buffer:
+                # Resource sharing a value with a same:Target: datasets where it was found
+                candidates = {}
+                for dataset, endpoint, _, _ in datasets:
+                    links = []
+                    statements = ([], [])
+                    for kind, x2, (p, value) in sorted(found.get(endpoint, ())):
+                        if x2 in known:
+                            continue
+                        links.extend((x1, x2) for x1 in indexes[kind][(p, value)] if x1 != x2)
+                        statements[kind].append("<%s> %s %s ." % (x2, p, value) if kind == INVERSE_FUNCTIONAL
+                                                else "%s %s <%s> ." % (value, p, x2))
+                    if len(links) == 0:
+                        continue
+                    buffer.add_links(endpoint, iterator, "IFP2", links)
+                    for _, y in links:
+                        candidates.setdefault(y, []).append(dataset)
+                    buffer.add("same:InverseFunctionalProperty_%d" % iterator, statements[INVERSE_FUNCTIONAL])
+                    buffer.add("same:FunctionalProperty_%d" % iterator, statements[FUNCTIONAL])
+                admitted = self._admit_targets(buffer, iterator, candidates)
+                if len(admitted) != 0:
+                    buffer.add(None, ["same:Q%d same:hasIteration %d ." % (iterator, iterator)])
+
+            # The same:Target are in the local store once the buffer is flushed
+            added = admitted
 
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
+        return added
+
+    def _remote_functionalproperties_resources(self, endpoint: str, keys: ([(str, str)], [(str, str)]),
+                                               values: bool) -> (([(str, int)], [(str, int)]), bool):
+        """
+        Retrieves the resources sharing a value of an (inverse) functional property with a same:Target on an endpoint,
+        the pairs (property, value) are bound by batches of Config.remote_batch_size with their position.
+        :param endpoint: String, URL of the SPARQL endpoint.
+        :param keys: Tuple, pairs (property, value in the SPARQL syntax) of the inverse functional properties and of
+        the functional properties.
+        :param values: bool, binds the pairs with the clause VALUES if True, with a UNION otherwise.
+        :return: Tuple, resources (IRI, position of the pair) sharing a value of an inverse functional property and of
+        a functional property, and False if the endpoint failed before answering all the pairs.
+        """
+        import requests
+        answers = ([], [])
+        try:
+            for kind, pattern in ((INVERSE_FUNCTIONAL, "?x {p} {value}"), (FUNCTIONAL, "{value} {p} ?x")):
+                for i in range(0, len(keys[kind]), Config.remote_batch_size):
+                    batch = list(enumerate(keys[kind][i:i + Config.remote_batch_size], i))
+                    if values:
+                        bindings = "VALUES (?p ?value ?k) { %s } %s" \
+                                   % (" ".join("(%s %s %d)" % (p, value, k) for k, (p, value) in batch),
+                                      pattern.format(p="?p", value="?value"))
+                    else:
+                        bindings = " UNION ".join("{ %s BIND(%d AS ?k) }" % (pattern.format(p=p, value=value), k)
+                                                  for k, (p, value) in batch)
+                    for j in Helper.stream_select(endpoint, """
+                        SELECT DISTINCT ?x ?k WHERE {
+                          %s
+                          FILTER(!isBlank(?x))
+                        }
+                    """ % bindings, timeout=self.timeout):
+                        if "x" in j and "k" in j and Helper.is_valid_iri(j["x"]):
+                            answers[kind].append((j["x"], int(j["k"])))
+        except (requests.exceptions.RequestException, ValueError) as err:
+            print(endpoint + ": " + str(err))
+            return answers, False
+        return answers, True
 
     def _generate_query_pattern_sameas(self, iterator: int, sparql_annotations: str = "", dataset_options: str = "",
-                                       target_options="FILTER(!REGEX(str(?IRITarget), \"[^\\\\x00-\\\\x7F]\", \"i\"))"):
+                                       target_options: str = ""):
         """
         Generate the query used to retrieve owl:sameAs relationships (:label: S1).
         :param iterator: int, iteration of the algorithm.
@@ -956,10 +1775,7 @@ class EndpointExploration(object):
 
                       GRAPH same:Q%s {
                         ?IRIy a same:Target ;
-                        void:inDataset ?dataset ;
-                        same:hasNamespace ?nsy ;
-                        same:hasAuthority ?auty ;
-                        same:hasValueWithNoScheme ?noschemey
+                        void:inDataset ?dataset
                       }
                       same:Q%s same:hasIteration %d .
                       ?ngraph same:hasIteration %d
@@ -985,9 +1801,6 @@ class EndpointExploration(object):
                       BIND(IRI(concat(str(?endpoint), '#', %s, 'S1', 'Execution')) as ?execution)
                       # Data clearing some IRI are represented as a String
                       BIND(IRI(?y) as ?IRIy)
-                      BIND(REPLACE(STR(?y), "(#|/)[^#/]*$", "$1") as ?nsy)
-                      BIND(REPLACE(STR(?y), ".+://(.*?)/.*", "$1") as ?auty)
-                      BIND(REPLACE(STR(?y), ".+://(.*)", "$1") as ?noschemey)
                       # No rotten links
                       FILTER(!EXISTS { GRAPH <Q-1> { ?y a same:Rotten }})
                       FILTER(!EXISTS { ?y a same:Target })
@@ -1002,10 +1815,7 @@ class EndpointExploration(object):
         Retrieves alleged (inverse) functional properties (:label: G-(I)FP1).
         """
         try:
-            sparql = SPARQLWrapper(self.master_endpoint)
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
-            sparql.setQuery("""
+            self.store.update("""
                 PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
                 PREFIX owl: <http://www.w3.org/2002/07/owl#>
                 PREFIX void: <http://rdfs.org/ns/void#>
@@ -1013,11 +1823,9 @@ class EndpointExploration(object):
                 PREFIX same: <https://ns.inria.fr/same/same.owl#>
                 INSERT {
                   GRAPH same:Properties {
-                    ?URIInvFunctProperty a owl:InverseFunctionalProperty ;
-                    same:hasNamespace ?nsifp .
+                    ?URIInvFunctProperty a owl:InverseFunctionalProperty .
                     << ?URIInvFunctProperty a owl:InverseFunctionalProperty >> same:statementInDataset ?dataset .
-                    ?URIFunctProperty a owl:FunctionalProperty ;
-                    same:hasNamespace ?nsfp .
+                    ?URIFunctProperty a owl:FunctionalProperty .
                     << ?URIFunctProperty a owl:FunctionalProperty >> same:statementInDataset ?dataset
                   }
                 } WHERE {
@@ -1036,27 +1844,23 @@ class EndpointExploration(object):
                       FILTER(!isBlank(?FunctProperty))
                     }
                   }
-                  BIND(REPLACE(STR(?InvFunctProperty), "(#|/)[^#/]*$", "$1") as ?nsifp)
-                  BIND(REPLACE(STR(?FunctProperty), "(#|/)[^#/]*$", "$1") as ?nsfp)
                   # Correct IRI stored as String
                   BIND(IRI(?InvFunctProperty) as ?URIInvFunctProperty)
                   BIND(IRI(?FunctProperty) as ?URIFunctProperty)
                 }
             """)
-            sparql.query()
+            LocalManipulation(self.store).decompose_iris("same:Properties", ["owl:InverseFunctionalProperty",
+                                                                              "owl:FunctionalProperty"], full=False)
 
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
 
     def retrieve_functionalproperties_detectschemas(self):
         """
         Searches if alleged (inverse) functional properties have a schema in SPARQL endpoints (:label: LDS-(I)FP1).
         """
         try:
-            sparql = SPARQLWrapper(self.master_endpoint)
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
-            sparql.setQuery("""
+            self.store.update("""
                 PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
                 PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
                 PREFIX owl: <http://www.w3.org/2002/07/owl#>
@@ -1078,26 +1882,23 @@ class EndpointExploration(object):
                   FILTER NOT EXISTS { GRAPH kg:default { ?property a ?type2 } }
                 }
             """)
-            sparql.query()
 
-            dic_datasets = LocalManipulation().get_datasets()
+            dic_datasets = LocalManipulation(self.store).get_datasets()
             print("Searching properties definition on endpoints.")
             # Multithreading for paging
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                executor.map(self._retrieve_functionalproperties_detectschemas_pagination, dic_datasets)
+            with concurrent.futures.ThreadPoolExecutor(Config.remote_workers) as executor:
+                executor.map(self._retrieve_functionalproperties_detectschemas_pagination,
+                             [{k: v} for k, v in dic_datasets.items()])
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
 
     def _retrieve_functionalproperties_detectschemas_pagination(self, dic_datasets):
+        import requests
         try:
-            sparql = SPARQLWrapper(self.master_endpoint)
             # may be improved, suboptimal
             for k, v in dic_datasets.items():
                 try:
-                    sparql.method = 'GET'
-                    sparql.setReturnFormat(JSON)
-                    sparql.setTimeout(self.timeout)
-                    sparql.setQuery("""
+                    bindings = list(self.store.select("""
                                 PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
                                 PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
                                 PREFIX owl: <http://www.w3.org/2002/07/owl#>
@@ -1115,16 +1916,11 @@ class EndpointExploration(object):
                                     }
                                   }
                                 }
-                            """ % (str(v)))
-
-                    json = sparql.query().convert()["results"]["bindings"]
-                    print(json)
-                    count = int([j["propertyCount"]["value"] for j in json][0])
+                            """ % (str(v)), timeout=self.timeout))
+                    print(bindings)
+                    count = int([j["propertyCount"] for j in bindings][0])
                     for page in range(ceil(count / 10000)):
-                        sparql.method = 'POST'
-                        sparql.setRequestMethod('postdirectly')
-                        sparql.setTimeout(self.timeout)
-                        sparql.setQuery("""
+                        self.store.update("""
                                     PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
                                     PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
                                     PREFIX owl: <http://www.w3.org/2002/07/owl#>
@@ -1154,16 +1950,15 @@ class EndpointExploration(object):
                                       FILTER(?property = ?localProperty)
                                     } 
                                 """ % (k, str(v), str(page * 10000)))
-                        sparql.query()
-                except socket.error as err:
+                except (socket.error, requests.exceptions.RequestException) as err:
                     print(err)
         # include socket.error
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
 
     def _generate_query_pattern_functionalproperties_links1(self, iterator: int = 1, sparql_annotations: str = "",
                                                             dataset_options: str = "",
-                                                            target_options="FILTER(!REGEX(str(?IRITarget), \"[^\\\\x00-\\\\x7F]\", \"i\"))"):
+                                                            target_options: str = ""):
         """
         Generates the query used to retrieve (inverse) functional properties patterns (:label: (I)FP1).
         :param iterator: int, iteration of the algorithm.
@@ -1236,16 +2031,17 @@ class EndpointExploration(object):
 
         return query
 
-    def _generate_queries_pattern_functionalproperties_links2(self, iterator: int = 1, sparql_events: str = "",
-                                                              dataset_options: str = "", *_):
+    def _generate_queries_pattern_functionalproperties_links2(self, iterator: int = 1, sparql_annotations: str = "",
+                                                              dataset_options: str = "", target_options: str = ""):
         """
         Generates the queries to compute new same:Target resources and owl:sameAs relationships with (inverse)
         functional properties patterns (:label: (I)FP2).
         :param iterator: int, iteration of the algorithm.
-        :param sparql_events: String, SPARQL Annotations of the Corese engine
+        :param sparql_annotations: String, SPARQL Annotations of the Corese engine
         (https://ns.inria.fr/sparql-extension/event.html#event).
         :param dataset_options: String, Options on the available SPARQL endpoints.
-        :param _: Unused parameter, it is here for compatibilities with other functions.
+        :param target_options: Unused parameter, it is here for compatibilities with other functions (the same:Target
+        are not used by the queries).
         :return: String, SPARQL query used to retrieve (inverse) functional properties patterns
         """
         query_fp = """
@@ -1256,6 +2052,8 @@ class EndpointExploration(object):
                 PREFIX prov: <http://www.w3.org/ns/prov#>
                 PREFIX fno: <https://w3id.org/function/ontology#>
                 PREFIX same: <https://ns.inria.fr/same/same.owl#>
+                PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
+                PREFIX dcterms: <http://purl.org/dc/terms/>
                 %s
                 INSERT {
                   GRAPH ?ngraph {
@@ -1264,8 +2062,8 @@ class EndpointExploration(object):
                     ?URITargetF1 owl:sameAs ?URITargetF2 .
                     ?URITargetF2 owl:sameAs ?URITargetF1 .
                   }
-                  ?ngraph same:hasIteration %d
-                  
+                  ?ngraph same:hasIteration %d .
+
                   ?execution a fno:Execution, prov:Activity ;
                   fno:executes same:IFP2 ;
                   dcterms:date ?date .
@@ -1274,15 +2072,9 @@ class EndpointExploration(object):
                   
                   GRAPH same:Q%s {
                     ?URITargetI2 a same:Target ;
-                    void:inDataset ?dataset ;
-                    same:hasNamespace ?nstargeti2 ;
-                    same:hasAuthority ?auti2 ;
-                    same:hasValueWithNoScheme ?noschemetargeti2 .
+                    void:inDataset ?dataset .
                     ?URITargetF2 a same:Target ;
-                    void:inDataset ?dataset ;
-                    same:hasNamespace ?nstargetf2 ;
-                    same:hasAuthority ?autf2 ;
-                    same:hasValueWithNoScheme ?noschemetargetf2 .
+                    void:inDataset ?dataset .
                   }
                   GRAPH same:InverseFunctionalProperty_%s {
                     ?URITargetI2 ?IFP ?InverseFunctionalObject
@@ -1323,18 +2115,14 @@ class EndpointExploration(object):
                     FILTER(!EXISTS { ?URITargetF2 a same:Rotten })
                   }
                   BIND(IRI(concat(str(?endpoint), '#', %s, 'IFP2')) as ?ngraph)
-                  BIND(REPLACE(STR(?URITargetI2), "(#|/)[^#/]*$", "$1") as ?nstargeti2)
-                  BIND(REPLACE(STR(?URITargetI2), ".+://(.*?)/.*", "$1") as ?auttargeti2)
-                  BIND(REPLACE(STR(?URITargetI2), ".+://(.*)", "$1") as ?noschemetargeti2)
-                  BIND(REPLACE(STR(?URITargetF2), "(#|/)[^#/]*$", "$1") as ?nstargetf2)
-                  BIND(REPLACE(STR(?URITargetF2), ".+://(.*?)/.*", "$1") as ?auttargetf2)
-                  BIND(REPLACE(STR(?URITargetF2), ".+://(.*)", "$1") as ?noschemetargetf2)
+                  BIND(IRI(concat(str(?endpoint), '#', %s, 'IFP2', 'Execution')) as ?execution)
+                  BIND(xsd:dateTime(NOW()) AS ?date)
                   FILTER(?URITargetI1 != ?URITargetI2)
                   FILTER(?URITargetF1 != ?URITargetF2)
                 }
-            """ % (sparql_events, iterator, str(iterator), str(iterator), str(iterator), str(iterator), iterator,
-                   str(iterator), iterator, str(iterator), iterator, str(iterator), dataset_options, str(iterator),
-                   str(iterator))
+            """ % (sparql_annotations, iterator, str(iterator), str(iterator), str(iterator), str(iterator), iterator,
+                   str(iterator), iterator, str(iterator), iterator, dataset_options, str(iterator), str(iterator),
+                   str(iterator), str(iterator))
 
         query_ifp = """
                 PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
@@ -1353,15 +2141,9 @@ class EndpointExploration(object):
                   ?ngraph same:hasIteration %d
                   GRAPH same:Q%s {
                     ?URITargetI2 a same:Target ;
-                    void:inDataset ?dataset ;
-                    same:hasNamespace ?nstargeti2 ;
-                    same:hasAuthority ?auti2 ;
-                    same:hasValueWithNoScheme ?noschemetargeti2 .
+                    void:inDataset ?dataset .
                     ?URITargetF2 a same:Target ;
-                    void:inDataset ?dataset ;
-                    same:hasNamespace ?nstargetf2 ;
-                    same:hasAuthority ?autf2 ;
-                    same:hasValueWithNoScheme ?noschemetargetf2 .
+                    void:inDataset ?dataset .
                   }
                   GRAPH same:InverseFunctionalProperty_%s {
                     ?URITargetI2 ?IFP ?InverseFunctionalObject
@@ -1402,37 +2184,33 @@ class EndpointExploration(object):
                     FILTER(!EXISTS { ?URITargetF2 a same:Rotten })
                   }
                   BIND(IRI(concat(str(?endpoint), '#', %s)) as ?ngraph)
-                  BIND(REPLACE(STR(?URITargetI2), "(#|/)[^#/]*$", "$1") as ?nstargeti2)
-                  BIND(REPLACE(STR(?URITargetI2), ".+://(.*?)/.*", "$1") as ?auttargeti2)
-                  BIND(REPLACE(STR(?URITargetI2), ".+://(.*)", "$1") as ?noschemetargeti2)
-                  BIND(REPLACE(STR(?URITargetF2), "(#|/)[^#/]*$", "$1") as ?nstargetf2)
-                  BIND(REPLACE(STR(?URITargetF2), ".+://(.*?)/.*", "$1") as ?auttargetf2)
-                  BIND(REPLACE(STR(?URITargetF2), ".+://(.*)", "$1") as ?noschemetargetf2)
                   FILTER(?URITargetI1 != ?URITargetI2)
                   FILTER(?URITargetF1 != ?URITargetF2)
                 }
-            """ % (sparql_events, iterator, str(iterator), str(iterator), str(iterator), str(iterator), iterator,
-                    str(iterator), iterator, str(iterator), iterator, str(iterator), dataset_options, str(iterator),
+            """ % (sparql_annotations, iterator, str(iterator), str(iterator), str(iterator), str(iterator), iterator,
+                   str(iterator), iterator, str(iterator), iterator, dataset_options, str(iterator), str(iterator),
                    str(iterator))
         return query_fp, query_ifp
 
 
 class ErrorDetection(object):
-    def __init__(self):
+    def __init__(self, store: LocalStore = None):
         self.master_endpoint = Config.master_endpoint
+        self.store = store or get_local_store()
+        # same:Rotten resources of the last cleanup (CR1)
+        self.cleaned = None
 
-    def rotten_sameas(self, iterator: int = 1):
+    def rotten_sameas(self, iterator: int = 1) -> {str}:
         """
         Identifies 'rotten' owl:sameAs relations by checking that a resource does not lead to an another resource with
         the same authority at distinct iterations, stores the URIs as same:Rotten then deletes the relation
         (:label: R1).
         :param iterator: int, iteration of the algorithm.
+        :return: Set of String, IRIs which are no longer same:Target of same:Q{iterator} after the cleanup (CR1).
         """
+        removed = {}
         try:
-            sparql = SPARQLWrapper(self.master_endpoint)
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
-            sparql.setQuery("""
+            self.store.update("""
                 PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
                 PREFIX owl: <http://www.w3.org/2002/07/owl#>
                 PREFIX void: <http://rdfs.org/ns/void#>
@@ -1475,24 +2253,23 @@ class ErrorDetection(object):
                     OPTIONAL { ?Rotten void:inDataset ?DatasetRotten }
                 }
             """ % (str(iterator), str(iterator - 1)))
-            sparql.query()
 
-            self.rotten_sameas_cleanup()
+            removed = self.rotten_sameas_cleanup()
 
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
+        return removed.get("https://ns.inria.fr/same/same.owl#Q%d" % iterator, set())
 
-    def rotten_sameas2(self, iterator: int = 1):
+    def rotten_sameas2(self, iterator: int = 1) -> {str}:
         """
         Identifies 'rotten' owl:sameAs relations by checking that a resource does not lead to an another resource with
         the same authority at the same iteration, stores the URIs as same:Rotten then deletes the relation (:label: R2).
         :param iterator: int, iteration of the algorithm.
+        :return: Set of String, IRIs which are no longer same:Target of same:Q{iterator} after the cleanup (CR1).
         """
+        removed = {}
         try:
-            sparql = SPARQLWrapper(self.master_endpoint)
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
-            sparql.setQuery("""
+            self.store.update("""
                 PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
                 PREFIX owl: <http://www.w3.org/2002/07/owl#>
                 PREFIX void: <http://rdfs.org/ns/void#>
@@ -1527,120 +2304,151 @@ class ErrorDetection(object):
                                   })
                 }
             """ % (str(iterator), str(iterator)))
-            sparql.query()
 
-            self.rotten_sameas_cleanup()
+            removed = self.rotten_sameas_cleanup()
 
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
+        return removed.get("https://ns.inria.fr/same/same.owl#Q%d" % iterator, set())
 
-    def rotten_sameas_cleanup(self):
+    def rotten_sameas_cleanup(self) -> dict:
         """
         Removes same:Target resources identified as same:Rotten, and deletes their incoming ond outgoing owl:sameAs
-        relationships (:label: CR1).
+        relationships (:label: CR1). The triples to delete are computed in Python from the same:Rotten resources and
+        their neighbours then deleted with one query, the cleanup is skipped if no resource became same:Rotten since the
+        previous one.
+        :return: Dict, named graph: IRIs which are no longer same:Target in the named graph.
         """
+        removed = {}
         try:
-            sparql = SPARQLWrapper(self.master_endpoint)
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
-            sparql.setQuery("""
-                PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-                PREFIX owl: <http://www.w3.org/2002/07/owl#>
+            # same:Rotten: its description in same:Q-1 (predicate: objects)
+            rotten = {}
+            for j in self.store.select("""
                 PREFIX void: <http://rdfs.org/ns/void#>
                 PREFIX same: <https://ns.inria.fr/same/same.owl#>
-
-                DELETE {
-                  GRAPH ?g2 {
-                    ?x a same:Target ;
-                    void:inDataset ?dataset ;
-                    same:hasNamespace ?nsx ;
-                    same:hasAuthority ?autx ;
-                    same:hasValueWithNoScheme ?noschemex
-                  }
-                } WHERE {
-                  GRAPH same:Q-1  {
+                SELECT ?Rotten ?p ?o
+                WHERE {
+                  GRAPH same:Q-1 {
                     ?Rotten a same:Rotten
+                    OPTIONAL {
+                      ?Rotten ?p ?o
+                      VALUES ?p { void:inDataset same:hasNamespace same:hasAuthority same:hasValueWithNoScheme }
+                    }
                   }
-                  ?x (owl:sameAs|^owl:sameAs) ?Rotten .
-                  ?x same:hasNamespace ?nsx .
-                  ?x same:hasAuthority ?autx .
-                  ?x same:hasValueWithNoScheme ?noschemex
-                  # OPTIONAL if ?x in Q0
-                  OPTIONAL { ?x void:inDataset ?dataset }
-                  GRAPH ?g1 {
-                    ?Rotten a same:Target
-                  }
-                  ?g1 same:hasIteration ?it1
-                  BIND(IRI(CONCAT(STR(same:),"Q", str(?it1+1))) as ?g2)
-                  # Searches if ?x is linked with another resource of type different from same:Rotten
-                  FILTER(EXISTS {?y owl:sameAs ?x .
-                                 ?y a ?yType
-                                 FILTER(?yType != same:Rotten) })
-                }
-            """)
-            sparql.query()
-
-            sparql.setQuery("""
-                PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-                PREFIX owl: <http://www.w3.org/2002/07/owl#>
-                PREFIX void: <http://rdfs.org/ns/void#>
-                PREFIX same: <https://ns.inria.fr/same/same.owl#>
-
-                DELETE {
-                  ?x owl:sameAs ?Rotten .
-                  ?Rotten owl:sameAs ?x
-                  GRAPH ?g1 {
-                    ?Rotten a same:Target ;
-                    void:inDataset ?DatasetRotten ;
-                    same:hasNamespace ?nsrotten ;
-                    same:hasAuthority ?autrotten ;
-                    same:hasValueWithNoScheme ?noschemerotten
-                  }
-                } WHERE {
-                  GRAPH same:Q-1  {
-                    ?Rotten a same:Rotten ;
-                    void:inDataset ?DatasetRotten ;
-                    same:hasNamespace ?nsrotten ;
-                    same:hasAuthority ?autrotten ;
-                    same:hasValueWithNoScheme ?noschemerotten
-                  }
-                  GRAPH ?g1 {
-                    ?Rotten a same:Target
-                  }
-                  ?x (owl:sameAs|^owl:sameAs) ?Rotten
                 }
-            """)
-            sparql.query()
-
-            sparql.setQuery("""
-                PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+            """, terms=True):
+                description = rotten.setdefault(j["Rotten"], {})
+                if "p" in j:
+                    description.setdefault(j["p"], set()).add(j["o"])
+            if set(rotten) == self.cleaned:
+                return removed
+            self.cleaned = set(rotten)
+            if len(rotten) == 0:
+                return removed
+
+            # Named graphs where a same:Rotten is a same:Target with their iteration, owl:sameAs relationships of the
+            # same:Rotten (same:Rotten, neighbour, named graph of the triple, direction)
+            target_graphs = {}
+            links = []
+            for j in self.store.select("""
                 PREFIX owl: <http://www.w3.org/2002/07/owl#>
-                PREFIX void: <http://rdfs.org/ns/void#>
                 PREFIX same: <https://ns.inria.fr/same/same.owl#>
-                PREFIX kg: <http://ns.inria.fr/corese/kgram/>
-
-                DELETE {
-                  ?Rotten ?IFP ?InverseFunctionalObject .
-                  ?x ?IFP ?InverseFunctionalObject .
-                  ?FunctionalSubject ?FP ?Rotten .
-                  ?FunctionalSubject ?FP ?y
-                } WHERE {
-                  GRAPH same:Q-1  {
+                SELECT ?Rotten ?g1 ?it1 ?x ?g ?outgoing
+                WHERE {
+                  GRAPH same:Q-1 {
                     ?Rotten a same:Rotten
                   }
-                  OPTIONAL {
-                    ?Rotten ?IFP ?InverseFunctionalObject .
-                    ?x ?IFP ?InverseFunctionalObject
-                    FILTER( EXISTS { GRAPH kg:default { ?IFP rdf:type|same:votingType owl:InverseFunctionalObject } } )
-                  }
-                  OPTIONAL {
-                    ?FunctionalSubject ?FP ?Rotten .
-                    ?FunctionalSubject ?FP ?y
-                    FILTER( EXISTS { GRAPH kg:default { ?FP rdf:type|same:votingType owl:FunctionalObject } } )
+                  {
+                    GRAPH ?g1 {
+                      ?Rotten a same:Target
+                    }
+                    OPTIONAL { ?g1 same:hasIteration ?it1 }
+                  } UNION {
+                    GRAPH ?g {
+                      ?Rotten owl:sameAs ?x
+                    }
+                    BIND(true AS ?outgoing)
+                  } UNION {
+                    GRAPH ?g {
+                      ?x owl:sameAs ?Rotten
+                    }
+                    BIND(false AS ?outgoing)
                   }
                 }
-            """)
-            sparql.query()
+            """, terms=True):
+                if "g1" in j:
+                    target_graphs.setdefault(j["Rotten"], {})[j["g1"]] = j.get("it1")
+                elif "x" in j:
+                    links.append((j["Rotten"], j["x"], j["g"], "true" in j["outgoing"]))
+            # Named graph: triples to delete
+            deleted = {}
+
+            # The neighbours of a same:Rotten which was a same:Target at the iteration it are no longer same:Target of
+            # the iteration it + 1 if they are linked with a resource having a type other than same:Rotten
+            next_graphs = {}
+            for r, x, _, _ in links:
+                for it in target_graphs.get(r, {}).values():
+                    if it is not None:
+                        next_graphs.setdefault(x, set()).add("<https://ns.inria.fr/same/same.owl#Q%d>"
+                                                              % (int(Helper.lexical_value(it)) + 1))
+            neighbours = list(next_graphs)
+            for i in range(0, len(neighbours), Config.remote_batch_size):
+                for j in self.store.select("""
+                    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+                    PREFIX owl: <http://www.w3.org/2002/07/owl#>
+                    PREFIX void: <http://rdfs.org/ns/void#>
+                    PREFIX same: <https://ns.inria.fr/same/same.owl#>
+                    SELECT ?x ?p ?o
+                    WHERE {
+                      VALUES ?x { %s }
+                      ?x same:hasNamespace ?nsx ;
+                      same:hasAuthority ?autx ;
+                      same:hasValueWithNoScheme ?noschemex
+                      FILTER(EXISTS { ?y owl:sameAs ?x .
+                                      ?y a ?yType
+                                      FILTER(?yType != same:Rotten) })
+                      {
+                        BIND(rdf:type AS ?p) BIND(same:Target AS ?o)
+                      } UNION {
+                        ?x ?p ?o
+                        VALUES ?p { void:inDataset same:hasNamespace same:hasAuthority same:hasValueWithNoScheme }
+                      }
+                    }
+                """ % " ".join(neighbours[i:i + Config.remote_batch_size]), terms=True):
+                    for g2 in next_graphs[j["x"]]:
+                        deleted.setdefault(g2, set()).add("%s %s %s ." % (j["x"], j["p"], j["o"]))
+
+            # The same:Rotten which were same:Target (described with a dataset in same:Q-1) are no longer same:Target
+            # and their owl:sameAs relationships are deleted
+            description_predicates = ["<http://rdfs.org/ns/void#inDataset>",
+                                      "<https://ns.inria.fr/same/same.owl#hasNamespace>",
+                                      "<https://ns.inria.fr/same/same.owl#hasAuthority>",
+                                      "<https://ns.inria.fr/same/same.owl#hasValueWithNoScheme>"]
+            target = "<http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <https://ns.inria.fr/same/same.owl#Target>"
+            cleaned = set()
+            for r, graphs in target_graphs.items():
+                if not all(p in rotten[r] for p in description_predicates):
+                    continue
+                for g1 in graphs:
+                    # Unless the same:Target was already deleted as a neighbour of another same:Rotten
+                    if "%s %s ." % (r, target) in deleted.get(g1, ()):
+                        continue
+                    cleaned.add(r)
+                    triples = deleted.setdefault(g1, set())
+                    triples.add("%s %s ." % (r, target))
+                    triples.update("%s %s %s ." % (r, p, o) for p in description_predicates for o in rotten[r][p])
+            for r, x, g, outgoing in links:
+                if r in cleaned:
+                    deleted.setdefault(g, set()).add("%s <http://www.w3.org/2002/07/owl#sameAs> %s ."
+                                                     % ((r, x) if outgoing else (x, r)))
+
+            if len(deleted) != 0:
+                self.store.update("DELETE DATA { %s }" % " ".join("GRAPH %s { %s }" % (g, " ".join(triples))
+                                                                  for g, triples in deleted.items()))
+            for g, triples in deleted.items():
+                removed[Helper.lexical_value(g)] = {Helper.lexical_value(t.split(" ", 1)[0]) for t in triples
+                                                    if t.endswith(" %s ." % target)}
 
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
+        return removed
@@ -1,239 +1,101 @@
 import json
 import traceback
-import requests
 from math import ceil
 import concurrent.futures
 
 from samelive.utils.config import Config
 from samelive.utils.helper import Helper
-
-import tqdm
-from rdflib import Graph, ConjunctiveGraph
-from SPARQLWrapper import SPARQLWrapper, JSON, N3, XML
+from samelive.utils.trie import PrefixTrie
+from samelive.query.querymanager import LocalStore, get_local_store
 
 
 class Statistics(object):
-    def __init__(self):
+    def __init__(self, store: LocalStore = None):
         self.master_endpoint = Config.master_endpoint
+        self.store = store or get_local_store()
 
     def compute_stats(self):
+        """
+        Computes the statistics on the (inverse) functional properties and writes them in same:Statistics as properties
+        of same:ActivityReport. The data is read once and the counters are computed in Python.
+        """
         try:
-            self.nb_voted_functional_properties()
-            self.nb_incorrect_functional_properties()
-            self.nb_not_deferenced_properties()
-            self.nb_not_loaded_rdf_document()
-            self.nb_loaded_rdf_document()
+            self.store.insert(["same:ActivityReport same:%s %d ." % (name, count)
+                               for name, count in self.report().items()], "same:Statistics",
+                              "PREFIX same: <https://ns.inria.fr/same/same.owl#>")
 
         except Exception as err:
-            traceback.print_tb(err)
+            traceback.print_tb(err.__traceback__)
 
     # Definition
     # same:ActivityReport
     # same:totalVotedAsInverseFunctionalProperty
-    def nb_voted_functional_properties(self):
-        """
-        Computes the number of extracted properties and not deferenced voted as (inverse) functional properties.
-        """
-        try:
-            sparql = SPARQLWrapper(self.master_endpoint)
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
-            sparql.setQuery("""
-                PREFIX same: <https://ns.inria.fr/same/same.owl#>
-                PREFIX kg: <http://ns.inria.fr/corese/kgram/>
-                
-                INSERT {
-                  GRAPH same:Statistics {
-                    same:ActivityReport same:totalVotedAsInverseFunctionalProperties ?nbx
-                  }
-                } WHERE {
-                {
-                  select (count(distinct ?x) as ?nbx) where {
-                    GRAPH kg:default {
-                      ?x same:votingType owl:InverseFunctionalProperty
-                    }
-                  }
-                }
-                }
-            """)
-            sparql.query()
-
-            sparql.setQuery("""
-                PREFIX same: <https://ns.inria.fr/same/same.owl#>
-                PREFIX kg: <http://ns.inria.fr/corese/kgram/>
-                
-                INSERT {
-                  GRAPH same:Statistics {
-                    same:ActivityReport same:totalVotedAsFunctionalProperties ?nbx
-                  }
-                } WHERE {
-                {
-                  select (count(distinct ?x) as ?nbx) where {
-                    GRAPH kg:default {
-                      ?x same:votingType owl:FunctionalProperty
-                    }
-                  }
-                }
-                }
-            """)
-            sparql.query()
-
-        except Exception as err:
-            traceback.print_tb(err)
-
-    def nb_incorrect_functional_properties(self):
-        """
-        Computes the number of incorrect (inverse) functional properties defined as such after deferencing them
-        """
-        try:
-            sparql = SPARQLWrapper(self.master_endpoint)
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
-            sparql.setQuery("""
-                PREFIX same: <https://ns.inria.fr/same/same.owl#>
-                PREFIX kg: <http://ns.inria.fr/corese/kgram/>
-
-                INSERT {
-                  GRAPH same:Statistics {
-                    same:ActivityReport same:totalIncorrectFunctionalProperties ?nbx
-                  }
-                } WHERE {
-                {
-                  select (count(distinct ?x) as ?nbx) where {
-                    GRAPH same:Properties {
-                      ?x a owl:FunctionalProperty
-                    }
-                    FILTER (EXISTS {GRAPH kg:default { ?x a ?y }} )
-                    FILTER (!EXISTS {GRAPH kg:default { ?x a owl:FunctionalProperty }} )
-                  }
-                }
-                }
-            """)
-            sparql.query()
-
-            sparql.setQuery("""
-                PREFIX same: <https://ns.inria.fr/same/same.owl#>
-                PREFIX kg: <http://ns.inria.fr/corese/kgram/>
-
-                INSERT {
-                  GRAPH same:Statistics {
-                    same:ActivityReport same:totalIncorrectInverseFunctionalProperties ?nbx
-                  }
-                } WHERE {
-                {
-                  select (count(distinct ?x) as ?nbx) where {
-                    GRAPH same:Properties {
-                      ?x a owl:InverseFunctionalProperty
-                    }
-                    FILTER (EXISTS {GRAPH kg:default { ?x a ?y }} )
-                    FILTER (!EXISTS {GRAPH kg:default { ?x a owl:InverseFunctionalProperty }} )
-                  }
-                }
-                }
-            """)
-            sparql.query()
-
-        except Exception as err:
-            traceback.print_tb(err)
-
-    def nb_not_deferenced_properties(self):
+    def report(self) -> dict:
         """
-        Computes the number of not deferenced (inverse) functional properties.
+        Computes the counters of same:ActivityReport:
+        - totalVotedAsInverseFunctionalProperties and totalVotedAsFunctionalProperties, number of properties voted as
+        (inverse) functional properties,
+        - totalIncorrectFunctionalProperties and totalIncorrectInverseFunctionalProperties, number of (inverse)
+        functional properties whose loaded schema does not define them as such,
+        - totalNotDeferencedProperties, number of not deferenced properties,
+        - totalNotLoadedRDFDocuments, number of namespaces of the properties prefixing a resource of a loaded schema,
+        - totalLoadedRDFDocuments, number of namespaces prefixing one of their properties minus the previous one.
+        :return: Dict, name of the counter: value.
         """
-        try:
-            sparql = SPARQLWrapper(self.master_endpoint)
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
-            sparql.setQuery("""
-                PREFIX same: <https://ns.inria.fr/same/same.owl#>
-                PREFIX kg: <http://ns.inria.fr/corese/kgram/>
-
-                INSERT {
-                  GRAPH same:Statistics {
-                    same:ActivityReport same:totalNotDeferencedProperties ?nbx
-                  }
-                } WHERE {
-                {
-                  select (count(distinct ?x) as ?nbx) where {
-                    GRAPH same:PropertiesNotDeferenced {
-                      ?x a ?type
-                    }
-                  }
-                }
-                }
-            """)
-            sparql.query()
-
-        except Exception as err:
-            traceback.print_tb(err)
-
-    def nb_not_loaded_rdf_document(self):
-        """
-        Computes the number of RDF documents that could not be loaded with a LOAD clause.
-        """
-        try:
-            sparql = SPARQLWrapper(self.master_endpoint)
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
-            sparql.setQuery("""
-                PREFIX same: <https://ns.inria.fr/same/same.owl#>
-                PREFIX kg: <http://ns.inria.fr/corese/kgram/>
-
-                INSERT {
-                  GRAPH same:Statistics {
-                    same:ActivityReport same:totalNotLoadedRDFDocuments ?nbns
-                  }
-                } WHERE {
-                {
-                  select (count(distinct ?ns) as ?nbns) where {
-                    GRAPH same:Properties {
-                      ?property same:hasNamespace ?ns
-                    }
-                    GRAPH kg:default {
-                      ?resource a ?type
-                    }
-                    FILTER(STRSTARTS(STR(?resource), ?ns))
-                  }
-                }
-                }
-            """)
-            sparql.query()
-
-        except Exception as err:
-            traceback.print_tb(err)
-
-    def nb_loaded_rdf_document(self):
-        """
-        Computes the number of RDF documents that could be loaded with a LOAD clause.
-        """
-        try:
-            sparql = SPARQLWrapper(self.master_endpoint)
-            sparql.method = 'POST'
-            sparql.setRequestMethod('postdirectly')
-            sparql.setQuery("""
-                PREFIX same: <https://ns.inria.fr/same/same.owl#>
-                PREFIX kg: <http://ns.inria.fr/corese/kgram/>
-
-                INSERT {
-                  GRAPH same:Statistics {
-                    same:ActivityReport same:totalLoadedRDFDocuments ?nbdoc
-                  }
-                } WHERE {
-                {
-                  select (count(distinct ?ns) as ?nbns) where {
-                    GRAPH same:Properties {
-                      ?property same:hasNamespace ?ns
-                    }
-                    FILTER(STRSTARTS(STR(?property), ?ns))
-                  }
-                }
-                  GRAPH same:Statistics {
-                    same:ActivityReport same:totalNotLoadedRDFDocuments ?nbnotloaded
-                  }
-                  BIND((?nbns - ?nbnotloaded) as ?nbdoc)
-                }
-            """)
-            sparql.query()
-
-        except Exception as err:
-            traceback.print_tb(err)
+        # Types in the loaded schemas (kg:default) and votes
+        types = {}
+        voted = {"InverseFunctionalProperty": set(), "FunctionalProperty": set()}
+        # Types in same:Properties, namespaces of the properties and not deferenced properties
+        declared = {"InverseFunctionalProperty": set(), "FunctionalProperty": set()}
+        namespaces = {}
+        not_deferenced = set()
+        for j in self.store.select("""
+            PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+            PREFIX same: <https://ns.inria.fr/same/same.owl#>
+            PREFIX kg: <http://ns.inria.fr/corese/kgram/>
+            SELECT ?graph ?x ?p ?o
+            WHERE {
+              GRAPH ?graph {
+                ?x ?p ?o
+              }
+              VALUES (?graph ?p) {
+                (kg:default rdf:type) (kg:default same:votingType)
+                (same:Properties rdf:type) (same:Properties same:hasNamespace)
+                (same:PropertiesNotDeferenced rdf:type)
+              }
+            }
+        """):
+            graph, x, p, o = j["graph"], j["x"], j["p"], j["o"]
+            name = o.rsplit("#", 1)[-1]
+            if graph.endswith("#PropertiesNotDeferenced"):
+                not_deferenced.add(x)
+            elif graph.endswith("#Properties"):
+                if p.endswith("#hasNamespace"):
+                    namespaces.setdefault(o, set()).add(x)
+                elif name in declared and o.startswith("http://www.w3.org/2002/07/owl#"):
+                    declared[name].add(x)
+            elif p.endswith("#votingType"):
+                if name in voted:
+                    voted[name].add(x)
+            else:
+                types.setdefault(x, set()).add(o)
+
+        # Namespaces prefixing a resource of the loaded schemas
+        trie = PrefixTrie(namespaces)
+        prefixing = {namespace for resource in types for namespace, _ in trie.prefixes_of(resource)}
+        not_loaded = len(prefixing)
+        nb_namespaces = sum(1 for namespace, properties in namespaces.items()
+                            if any(p.startswith(namespace) for p in properties))
+        owl = "http://www.w3.org/2002/07/owl#"
+        return {
+            "totalVotedAsInverseFunctionalProperties": len(voted["InverseFunctionalProperty"]),
+            "totalVotedAsFunctionalProperties": len(voted["FunctionalProperty"]),
+            "totalIncorrectFunctionalProperties": sum(1 for x in declared["FunctionalProperty"]
+                                                      if x in types and owl + "FunctionalProperty" not in types[x]),
+            "totalIncorrectInverseFunctionalProperties":
+                sum(1 for x in declared["InverseFunctionalProperty"]
+                    if x in types and owl + "InverseFunctionalProperty" not in types[x]),
+            "totalNotDeferencedProperties": len(not_deferenced),
+            "totalNotLoadedRDFDocuments": not_loaded,
+            "totalLoadedRDFDocuments": nb_namespaces - not_loaded,
+        }
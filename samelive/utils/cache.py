@@ -0,0 +1,91 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class LookupCache(object):
+    """
+    Thread-safe cache of the answers of remote endpoints for a resource, keyed by (endpoint, IRI). Concurrent lookups
+    of the same key are coalesced: the first caller queries the endpoint, the others wait for its answer. The answers
+    are evicted in the order they were received once there are more than max_size of them or once they are older than
+    ttl seconds, the pending lookups are never evicted.
+    """
+    def __init__(self, max_size: int = None, ttl: float = None):
+        """
+        :param max_size: int, largest number of answers kept, no limit if None.
+        :param ttl: float, seconds an answer is kept, no expiration if None.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.futures = {}
+        # (endpoint, IRI): time the answer was received, in this order
+        self.received = OrderedDict()
+        self.nb_hits = 0
+        self.nb_misses = 0
+        self.nb_evictions = 0
+
+    def _evict(self):
+        """
+        Evicts the expired answers and the oldest answers beyond max_size, the lock must be held.
+        """
+        if self.ttl is not None:
+            deadline = time.monotonic() - self.ttl
+            while len(self.received) != 0 and next(iter(self.received.values())) < deadline:
+                self.futures.pop(self.received.popitem(last=False)[0])
+                self.nb_evictions += 1
+        if self.max_size is not None:
+            while len(self.received) > self.max_size:
+                self.futures.pop(self.received.popitem(last=False)[0])
+                self.nb_evictions += 1
+
+    def claim(self, endpoint: str, iris: [str]) -> ([str], dict):
+        """
+        Claims the lookups of IRIs on an endpoint.
+        :param endpoint: String, URL of the SPARQL endpoint.
+        :param iris: List of String, IRIs to look up.
+        :return: Tuple, IRIs the caller must look up then resolve, and a dictionary IRI: Future of the answer for all
+        the IRIs.
+        """
+        owned = []
+        futures = {}
+        with self.lock:
+            self._evict()
+            for iri in iris:
+                future = self.futures.get((endpoint, iri))
+                if future is None:
+                    future = self.futures[(endpoint, iri)] = Future()
+                    owned.append(iri)
+                    self.nb_misses += 1
+                else:
+                    self.nb_hits += 1
+                futures[iri] = future
+        return owned, futures
+
+    def resolve(self, endpoint: str, answers: dict):
+        """
+        Sets the answers of claimed lookups.
+        :param endpoint: String, URL of the SPARQL endpoint.
+        :param answers: Dict, IRI: answer of the endpoint.
+        """
+        with self.lock:
+            futures = [(self.futures[(endpoint, iri)], answer) for iri, answer in answers.items()]
+            received = time.monotonic()
+            for iri in answers:
+                self.received[(endpoint, iri)] = received
+            self._evict()
+        for future, answer in futures:
+            future.set_result(answer)
+
+    def release(self, endpoint: str, iris: [str]):
+        """
+        Abandons claimed lookups that failed, they are answered with an empty list and claimed again by the next
+        caller.
+        :param endpoint: String, URL of the SPARQL endpoint.
+        :param iris: List of String, IRIs whose lookup failed.
+        """
+        with self.lock:
+            futures = [self.futures.pop((endpoint, iri)) for iri in iris]
+        for future in futures:
+            future.set_result([])
@@ -1,12 +1,21 @@
 import os
+import json
 
 
 class Config(object):
     project_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     # Timeout used if an endpoint does not answer (expensive query) - no HTTP status code.
-    # Timeout is currently only used to retrieve (inverse) functional properties.
+    # Timeout is currently only used to retrieve (inverse) functional properties and to probe the results limit of the
+    # endpoints.
     timeout = 200
 
+    # Largest results limit searched when probing the endpoints (same:hasResultsLimit), endpoints returning more
+    # results are stored with this value.
+    results_limit_upper_bound = 1000000
+    # Attempts of a probe of the results limit answered by a server error (5xx) or a timeout, the limit of the endpoint
+    # is not stored if all of them fail
+    probe_attempts = 3
+
     # Enables optimizations of the Corese engine (bindings with the clause VALUES)
     IS_CORESE_ENGINE = True
     # Sets to true to use the webarchive version of lod-cloud.net
@@ -15,6 +24,55 @@ class Config(object):
     # URL of the triplestore on which the UPDATE queries are performed.
     master_endpoint = "http://localhost:8082/sparql"
 
+    # Store of the local state of the algorithm: "corese" (master_endpoint, remote endpoints are queried by Corese) or
+    # "embedded" (in-process rdflib store, remote endpoints are queried from Python, the (inverse) functional
+    # properties are not handled).
+    local_store = "corese"
+
+    # Set to True to retrieve the owl:sameAs relationships (S1) from Python and reject the rotten ones as they arrive,
+    # before they add same:Target to the next iteration (R1 and R2 still run at the end of each iteration). The identity
+    # sets are rebuilt from the local store at each S1 and the planned queries of S1 are not used
+    ONLINE_ROTTEN_DETECTION = False
+
+    # Number of endpoints queried concurrently by the stages run from Python and by the probes of the endpoints, None
+    # for the default of concurrent.futures.ThreadPoolExecutor
+    remote_workers = None
+
+    # Number of same:Target bound per query when the remote endpoints are queried from Python
+    remote_batch_size = 100
+
+    # Largest number of same:Target added to an iteration, in total and per authority, when the remote endpoints are
+    # queried from Python (see samelive/utils/frontier.py). The candidates of lower priority are kept in same:Deferred
+    # and considered again at the next iterations. None for no limit.
+    frontier_max_targets = 10000
+    frontier_max_per_authority = 1000
+
+    # Number of statements (relationships, same:Target, provenance) inserted per query when the results of the remote
+    # endpoints are inserted from Python
+    provenance_flush_size = 10000
+
+    # Number of IRI decompositions (namespace, authority, value with no scheme) kept in memory
+    iri_cache_size = 100000
+
+    # Number of seeds explored concurrently by the batch mode (samelive/computing/batch.py)
+    batch_workers = 8
+
+    # Answers of the remote endpoints shared by the seeds of the batch mode and the closure service (see
+    # samelive/utils/cache.py): largest number of (endpoint, IRI) answers kept and seconds an answer is kept, None for
+    # no limit
+    lookup_cache_size = 100000
+    lookup_cache_ttl = 86400
+
+    # Port of the closure service (samelive/computing/service.py)
+    service_port = 8085
+
+    # Folder of the checkpoints written by samelive/computing/main.py (resumed with the option --resume)
+    checkpoint_folder = project_path + "/resource/checkpoint"
+
+    # Binary snapshot of the closure written at the end of samelive/computing/main.py (see
+    # samelive/computing/snapshot.py)
+    snapshot_path = project_path + "/resource/snapshot/closure.snapshot"
+
     # Set to True to use same:Target with non-ASCII characters (some endpoints do not support them, we have implemented
     # methods to detect them).
     NON_ASCII_CHARACTERS_HANDLING = True
@@ -22,6 +80,17 @@ class Config(object):
     # Set to True to process owl:InverseFunctionalProperty and owl:FunctionalProperty
     FUNC_PROP = False
 
+    # Set to True to retrieve the values of the voted (inverse) functional properties and join them in Python ((I)FP1
+    # and (I)FP2), False to join them in Corese with the clause SERVICE
+    CLIENT_SIDE_FUNC_PROP = True
+
+    # Index of the values of the (inverse) functional properties kept between the runs (see
+    # samelive/utils/valueindex.py), None to disable it
+    value_index_path = project_path + "/resource/value_index.sqlite"
+
+    # Number of results requested per page when exporting the identity sets
+    export_page_size = 10000
+
     # Seed URIs of the algorithm to populate in same:Q0
     resources_list = ["http://dbpedia.org/resource/Barack_Obama"]
 
@@ -31,3 +100,120 @@ class Config(object):
 
     slave_endpoints = ["http://localhost:8083/sparql",
                        "http://localhost:8084/sparql"]
+
+    # Attributes which can be None, with the type of their other values
+    NULLABLE = {"remote_workers": int, "frontier_max_targets": int, "frontier_max_per_authority": int,
+                "value_index_path": str, "lookup_cache_size": int, "lookup_cache_ttl": float}
+    # Prefix of the environment variables overriding the attributes (e.g. SAMELIVE_MASTER_ENDPOINT)
+    ENVIRONMENT_PREFIX = "SAMELIVE_"
+    # Sources of the current values (files and environment variables)
+    sources = []
+
+    @classmethod
+    def settings(cls) -> dict:
+        """
+        :return: Dict, name: value of the configurable attributes (project_path and the attributes above are not).
+        """
+        return {name: value for name, value in vars(cls).items()
+                if not name.startswith("_") and name not in ("project_path", "NULLABLE", "ENVIRONMENT_PREFIX",
+                                                             "sources")
+                and not isinstance(value, (classmethod, staticmethod))}
+
+    @classmethod
+    def profile(cls) -> dict:
+        """
+        Describes the configuration of a run, recorded with its measures to reproduce it.
+        :return: Dict, sources of the configuration and values of the configurable attributes.
+        """
+        return {"sources": list(cls.sources), "settings": cls.settings()}
+
+    @classmethod
+    def _check(cls, name: str, value, from_text: bool = False):
+        """
+        Checks the value of an attribute, values read from environment variables are converted from text.
+        :param name: String, name of the attribute.
+        :param value: Object, value of the attribute.
+        :param from_text: bool, the value is a String to convert to the type of the attribute.
+        :return: Object, value of the attribute.
+        """
+        default = cls.settings()[name]
+        expected = cls.NULLABLE.get(name, type(default))
+        if from_text:
+            text = value.strip()
+            if name in cls.NULLABLE and text.lower() in ("", "none", "null"):
+                return None
+            if expected is bool:
+                if text.lower() not in ("true", "false", "1", "0", "yes", "no"):
+                    raise ValueError("%s expects a boolean, not %r" % (name, value))
+                return text.lower() in ("true", "1", "yes")
+            if expected in (list, dict):
+                value = json.loads(text) if text[:1] in "[{" else [v.strip() for v in text.split(",") if v.strip()]
+            elif expected is not str:
+                value = expected(text)
+        if value is None and name in cls.NULLABLE:
+            return value
+        # bool is a subclass of int, an int is a valid float
+        if (expected is not bool and isinstance(value, bool)) or \
+                not isinstance(value, (int, float) if expected is float else expected):
+            raise ValueError("%s expects a value of type %s, not %r" % (name, expected.__name__, value))
+        return value
+
+    @classmethod
+    def load(cls, path: str = None, environ: dict = None):
+        """
+        Loads a profile: the attributes are read from a TOML or YAML file (one key per attribute), then from the
+        environment variables SAMELIVE_<ATTRIBUTE> (e.g. SAMELIVE_TIMEOUT=60, SAMELIVE_SLAVE_ENDPOINTS=url1,url2) which
+        take precedence. The values are checked before any attribute is changed.
+        :param path: String, path of a .toml, .yaml or .yml file, no file if None.
+        :param environ: Dict, environment variables, no override if None.
+        """
+        values = {}
+        errors = []
+        sources = []
+        settings = cls.settings()
+        if path is not None:
+            if path.endswith(".toml"):
+                try:
+                    import tomllib
+                except ImportError:
+                    # Python < 3.11
+                    import tomli as tomllib
+                with open(path, "rb") as profile_file:
+                    data = tomllib.load(profile_file)
+            elif path.endswith((".yaml", ".yml")):
+                # Requires PyYAML
+                import yaml
+                with open(path, encoding="utf-8") as profile_file:
+                    data = yaml.safe_load(profile_file) or {}
+            else:
+                raise ValueError("Unknown format of configuration file (.toml, .yaml or .yml): " + path)
+            for name, value in data.items():
+                if name not in settings:
+                    errors.append("%s: unknown attribute %s" % (path, name))
+                    continue
+                try:
+                    values[name] = cls._check(name, value)
+                except (TypeError, ValueError) as err:
+                    errors.append("%s: %s" % (path, err))
+            sources.append(path)
+        for variable, text in (environ or {}).items():
+            if not variable.startswith(cls.ENVIRONMENT_PREFIX) or variable == cls.ENVIRONMENT_PREFIX + "CONFIG":
+                continue
+            name = next((n for n in settings if n.upper() == variable[len(cls.ENVIRONMENT_PREFIX):]), None)
+            if name is None:
+                errors.append("%s: unknown attribute" % variable)
+                continue
+            try:
+                values[name] = cls._check(name, text, from_text=True)
+            except (TypeError, ValueError) as err:
+                errors.append("%s: %s" % (variable, err))
+            sources.append(variable)
+        if len(errors) != 0:
+            raise ValueError("Invalid configuration:\n- " + "\n- ".join(errors))
+        for name, value in values.items():
+            setattr(cls, name, value)
+        cls.sources += [source for source in sources if source not in cls.sources]
+
+
+# The profile given by SAMELIVE_CONFIG and the environment variables are loaded before the other modules read Config
+Config.load(os.environ.get(Config.ENVIRONMENT_PREFIX + "CONFIG"), os.environ)
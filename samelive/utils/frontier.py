@@ -0,0 +1,63 @@
+from samelive.utils.config import Config
+from samelive.utils.iri import decompose
+
+
+class FrontierManager(object):
+    """
+    Bounds the same:Target added to an iteration: the candidates (resources newly linked to the same:Target and the
+    candidates deferred by the previous iterations) are ranked by priority and admitted until the cap of the iteration
+    or of their authority is reached, the others are deferred. The priority favours the candidates asserted by more
+    datasets, found at an earlier iteration, then whose authority has fewer candidates (a single bad link adding
+    thousands of resources of one authority is ranked last).
+    """
+    def __init__(self, max_targets: int = Config.frontier_max_targets,
+                 max_per_authority: int = Config.frontier_max_per_authority):
+        """
+        :param max_targets: int, largest number of same:Target of an iteration, no limit if None.
+        :param max_per_authority: int, largest number of same:Target of an iteration per authority, no limit if None.
+        """
+        self.max_targets = max_targets
+        self.max_per_authority = max_per_authority
+        # Candidate: datasets asserting it (ordered) and iteration where it was found first
+        self.datasets = {}
+        self.depth = {}
+
+    def __len__(self) -> int:
+        return len(self.datasets)
+
+    def add(self, iri: str, datasets: [str], depth: int):
+        """
+        Adds a candidate or the datasets asserting it.
+        :param iri: String, IRI of the candidate.
+        :param datasets: List of String, datasets where the candidate was found.
+        :param depth: int, iteration where the candidate was found.
+        """
+        self.datasets.setdefault(iri, {}).update(dict.fromkeys(datasets))
+        self.depth[iri] = min(depth, self.depth.get(iri, depth))
+
+    def select(self, admitted: dict = None) -> ([str], [str]):
+        """
+        Ranks the candidates and splits them between the admitted and the deferred ones.
+        :param admitted: Dict, authority: number of same:Target already in the iteration (e.g. added by a previous
+        stage), counted in the caps.
+        :return: Tuple, admitted and deferred candidates in priority order.
+        """
+        authority = {iri: decompose(iri).authority for iri in self.datasets}
+        nb_candidates = {}
+        for value in authority.values():
+            nb_candidates[value] = nb_candidates.get(value, 0) + 1
+        ranked = sorted(self.datasets, key=lambda iri: (-len(self.datasets[iri]), self.depth[iri],
+                                                        nb_candidates[authority[iri]], iri))
+        per_authority = dict(admitted or {})
+        total = sum(per_authority.values())
+        selected, deferred = [], []
+        for iri in ranked:
+            if (self.max_targets is not None and total >= self.max_targets) or \
+                    (self.max_per_authority is not None
+                     and per_authority.get(authority[iri], 0) >= self.max_per_authority):
+                deferred.append(iri)
+                continue
+            selected.append(iri)
+            per_authority[authority[iri]] = per_authority.get(authority[iri], 0) + 1
+            total += 1
+        return selected, deferred
@@ -1,10 +1,13 @@
-from rdflib import Graph, ConjunctiveGraph
-from SPARQLWrapper import SPARQLWrapper, JSON, N3, XML
+from typing import TYPE_CHECKING
+
+# requests, rdflib and SPARQLWrapper are imported where they are used, the command line starts without loading them
+if TYPE_CHECKING:
+    from rdflib import ConjunctiveGraph
 
 
 class Helper(object):
     @staticmethod
-    def insert_graph(endpoint: str, data: ConjunctiveGraph, named_graph: str, prefixes: str = ""):
+    def insert_graph(endpoint: str, data: "ConjunctiveGraph", named_graph: str, prefixes: str = ""):
         """
         Inserts data from a ConjunctiveGraph in a triplestore.
         :param endpoint: str, URL of the triplestore in which we insert the data.
@@ -12,6 +15,7 @@ class Helper(object):
         :param named_graph: str, named graph where to insert the data.
         :param prefixes: str, prefixes used in the SPARQL query.
         """
+        from rdflib import ConjunctiveGraph
         gs = ConjunctiveGraph('SPARQLUpdateStore')
         gs.open((endpoint, endpoint))
         query = """
@@ -33,6 +37,7 @@ class Helper(object):
         :param named_graph: str, named graph where to insert the data.
         :param prefixes: str, prefixes used in the SPARQL query.
         """
+        from SPARQLWrapper import SPARQLWrapper
         sparql = SPARQLWrapper(endpoint)
         sparql.method = 'POST'
         sparql.setRequestMethod('postdirectly')
@@ -47,50 +52,121 @@ class Helper(object):
         sparql.query()
 
     @staticmethod
-    def non_ascii_characters_handling(function, handle_non_ascii: bool = False, iterator: int = 1,
-                                      sparql_annotations: str = "", dataset_options: str = "",
-                                      target_options: str = "") -> [str]:
-        """
-        Allows to handle non-ASCII characters when generating queries for remote endpoints.
-        :param function: Function used to generate patterns of SPARQL queries (the function may return a String or
-        tuple of Strings).
-        :param handle_non_ascii: bool, Use or not use non-ASCII characters in requests
-        (some endpoints do not support them, we have implemented methods to detect them).
-        :param iterator: int, iteration of the algorithm.
-        :param sparql_annotations: String, SPARQL Annotations of the Corese engine
-        (https://ns.inria.fr/sparql-extension/event.html#event).
-        :param dataset_options: String, Options on the available SPARQL endpoints.
-        :param target_options: String, Options on the same:Target resources.
-        :return: List of String, list of the different queries to execute on an endpoint.
-        """
-        results = []
-        if handle_non_ascii:
-            custom_dataset_options = dataset_options + "; same:supportsNonASCIICharacters false"
-            custom_target_options = target_options + "FILTER(!REGEX(str(?IRITarget), \"[^\\\\x00-\\\\x7F]\", \"i\"))"
-            f_result = function(iterator=iterator, sparql_annotations=sparql_annotations,
-                                dataset_options=custom_dataset_options, target_options=custom_target_options)
-            if type(f_result) is tuple:
-                results += list(f_result)
+    def stream_select(endpoint: str, query: str, timeout: int = None, terms: bool = False):
+        """
+        Executes a SELECT query and yields its bindings while the answer is read. Results are requested in the SPARQL
+        TSV format (https://www.w3.org/TR/sparql11-results-csv-tsv/) which is parsed line by line, endpoints ignoring
+        it may answer in the SPARQL XML format (parsed element by element) or in JSON (parsed at once).
+        :param endpoint: str, URL of the SPARQL endpoint.
+        :param query: str, SELECT query.
+        :param timeout: int, timeout of the HTTP request in seconds.
+        :param terms: bool, yields the RDF terms in the SPARQL syntax (e.g. <http://...> or "label"@en) instead of their
+        lexical values.
+        :return: Generator of Dict, one dictionary per solution with the names of the bound variables as keys.
+        :raise ValueError: the endpoint answered in another format.
+        """
+        import requests
+        headers = {"Accept": "text/tab-separated-values, application/sparql-results+json;q=0.5, "
+                             "application/sparql-results+xml;q=0.2"}
+        with requests.post(endpoint, data={"query": query}, headers=headers, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            if content_type == "text/tab-separated-values":
+                # Line breaks and tabulations are escaped in the TSV format, a line is a solution
+                lines = response.iter_lines(chunk_size=65536)
+                header = next(lines, None)
+                if header is None:
+                    return
+                variables = [var.lstrip("?$") for var in header.decode("utf-8").split("\t")]
+                for line in lines:
+                    values = line.decode("utf-8").split("\t")
+                    yield {var: value if terms else Helper.lexical_value(value)
+                           for var, value in zip(variables, values) if value != ""}
+            elif content_type in ("application/sparql-results+json", "application/json"):
+                for binding in response.json()["results"]["bindings"]:
+                    yield {var: Helper.json_term(value) if terms else value["value"] for var, value in binding.items()}
+            elif content_type in ("application/sparql-results+xml", "application/xml", "text/xml"):
+                response.raw.decode_content = True
+                for binding in Helper.xml_bindings(response.raw):
+                    yield {var: Helper.json_term(value) if terms else value["value"] for var, value in binding.items()}
             else:
-                results.append(f_result)
+                raise ValueError("%s: unexpected content type of SELECT results: %s"
+                                 % (endpoint, response.headers.get("Content-Type")))
 
-            custom_dataset_options = dataset_options + "; same:supportsNonASCIICharacters true"
-            custom_target_options = target_options
-            f_result = function(iterator=iterator, sparql_annotations=sparql_annotations,
-                                dataset_options=custom_dataset_options, target_options=custom_target_options)
-            if type(f_result) is tuple:
-                results += list(f_result)
-            else:
-                results.append(f_result)
-        else:
-            custom_target_options = target_options + "FILTER(!REGEX(str(?IRITarget), \"[^\\\\x00-\\\\x7F]\", \"i\"))"
-            f_result = function(iterator=iterator, sparql_annotations=sparql_annotations, dataset_options=dataset_options,
-                                target_options=custom_target_options)
-            if type(f_result) is tuple:
-                results += list(f_result)
-            else:
-                results.append(f_result)
-        return results
+    @staticmethod
+    def xml_bindings(source):
+        """
+        Reads the solutions of a SPARQL XML result (https://www.w3.org/TR/rdf-sparql-XMLres/) while it is received.
+        :param source: File object, XML result.
+        :return: Generator of Dict, one dictionary per solution with the names of the bound variables as keys and their
+        RDF terms in the SPARQL JSON results format as values.
+        """
+        import xml.etree.ElementTree as ElementTree
+        namespace = "{http://www.w3.org/2005/sparql-results#}"
+        lang = "{http://www.w3.org/XML/1998/namespace}lang"
+        for _, element in ElementTree.iterparse(source):
+            if element.tag != namespace + "result":
+                continue
+            binding = {}
+            for variable in element.iter(namespace + "binding"):
+                term = variable[0]
+                value = {"type": term.tag[len(namespace):], "value": term.text or ""}
+                if lang in term.attrib:
+                    value["xml:lang"] = term.attrib[lang]
+                if "datatype" in term.attrib:
+                    value["datatype"] = term.attrib["datatype"]
+                binding[variable.attrib["name"]] = value
+            element.clear()
+            yield binding
+
+    @staticmethod
+    def lexical_value(term: str) -> str:
+        """
+        Returns the lexical value of an RDF term written in the SPARQL syntax.
+        :param term: str, RDF term (e.g. <http://...>, "label"@en, "1"^^<http://...> or _:b0).
+        :return: str, IRI, lexical form of the literal or label of the blank node.
+        """
+        if term.startswith("<") and term.endswith(">"):
+            return term[1:-1]
+        if term.startswith("_:"):
+            return term[2:]
+        if term[:1] in ("\"", "'"):
+            quote = term[0]
+            end = 1
+            while term[end] != quote:
+                end += 2 if term[end] == "\\" else 1
+            return term[1:end].encode("latin-1", "backslashreplace").decode("unicode-escape") if "\\" in term[1:end] \
+                else term[1:end]
+        # Numbers and booleans written without quotes
+        return term
+
+    @staticmethod
+    def json_term(value: dict) -> str:
+        """
+        Writes an RDF term of a SPARQL JSON result in the SPARQL syntax.
+        :param value: Dict, RDF term in the SPARQL JSON results format.
+        :return: str, RDF term in the SPARQL syntax.
+        """
+        if value["type"] == "uri":
+            return "<" + value["value"] + ">"
+        if value["type"] == "bnode":
+            return "_:" + value["value"]
+        literal = '"' + value["value"].replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") \
+            .replace("\r", "\\r") + '"'
+        if "xml:lang" in value:
+            return literal + "@" + value["xml:lang"]
+        if "datatype" in value:
+            return literal + "^^<" + value["datatype"] + ">"
+        return literal
+
+    @staticmethod
+    def is_valid_iri(iri: str) -> bool:
+        """
+        Checks that a String can be written as an IRI in a SPARQL query (some endpoints return IRI as String).
+        :param iri: str, String to check.
+        :return: bool, True if the String can be written between angle brackets.
+        """
+        return len(iri) != 0 and not any(c in '<>"{}|^`\\' or ord(c) <= 0x20 for c in iri)
 
     @staticmethod
     def removesuffix(string: str, suffix: str, /) -> str:
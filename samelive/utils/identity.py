@@ -0,0 +1,296 @@
+from array import array
+
+from samelive.utils.iri import decompose
+
+
+class Interner(object):
+    """
+    Numbers distinct strings with consecutive integer ids.
+    """
+    __slots__ = ("ids", "values")
+
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def intern(self, value: str) -> int:
+        """
+        Returns the id of a string, a new id is given to unknown strings.
+        :param value: String, string to intern.
+        :return: int, id of the string.
+        """
+        value_id = self.ids.get(value)
+        if value_id is None:
+            value_id = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+    def get(self, value: str) -> int:
+        """
+        :param value: String, string interned or not.
+        :return: int, id of the string, -1 if it is unknown.
+        """
+        return self.ids.get(value, -1)
+
+    def __getitem__(self, value_id: int) -> str:
+        return self.values[value_id]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class IdentityGraph(object):
+    """
+    Compact owl:sameAs graph used to compute the identity sets (equivalence classes of owl:sameAs relationships) in
+    Python. The IRIs are interned to integer ids (nodes), their authorities, namespaces and datasets are interned
+    separately, and the metadata of the nodes (authority, namespace, iteration, dataset, same:Rotten flag) are kept in
+    parallel arrays indexed by node. The relationships and the endpoints providing them are stored in arrays and
+    indexed on demand as adjacency lists (compressed sparse rows).
+    """
+    def __init__(self):
+        self.iris = Interner()
+        self.authorities = Interner()
+        self.namespaces = Interner()
+        self.datasets = Interner()
+        self.endpoints = Interner()
+        self.authority = array("i")
+        self.namespace = array("i")
+        # -1 when the iteration or the dataset is unknown
+        self.iteration = array("i")
+        self.dataset = array("i")
+        self.rotten = bytearray()
+        # Union-find of the identity sets
+        self.parents = array("i")
+        # Relationships (stored once) and their endpoint (-1 if unknown), adjacency lists built by _index
+        self.sources = array("i")
+        self.targets = array("i")
+        self.provenance = array("i")
+        self._offsets = None
+        self._neighbours = None
+
+    def __len__(self) -> int:
+        return len(self.iris)
+
+    def __contains__(self, iri: str) -> bool:
+        return iri in self.iris.ids
+
+    def add_resource(self, iri: str, iteration: int = None, dataset: str = None, rotten: bool = None) -> int:
+        """
+        Adds a resource or updates its metadata.
+        :param iri: String, IRI of the resource.
+        :param iteration: int, iteration of the same:Target, unchanged if None.
+        :param dataset: String, dataset where the resource was found, unchanged if None.
+        :param rotten: bool, the resource is same:Rotten, unchanged if None.
+        :return: int, node of the resource.
+        """
+        node = self.iris.intern(iri)
+        if node == len(self.parents):
+            decomposition = decompose(iri)
+            self.authority.append(self.authorities.intern(decomposition.authority))
+            self.namespace.append(self.namespaces.intern(decomposition.namespace))
+            self.iteration.append(-1)
+            self.dataset.append(-1)
+            self.rotten.append(0)
+            self.parents.append(node)
+        if iteration is not None:
+            self.iteration[node] = iteration
+        if dataset is not None:
+            self.dataset[node] = self.datasets.intern(dataset)
+        if rotten is not None:
+            self.rotten[node] = rotten
+        return node
+
+    def union(self, iri1: str, iri2: str, endpoint: str = None):
+        """
+        Adds an owl:sameAs relationship (in both directions) and merges the identity sets of the resources.
+        :param iri1: String, IRI of the first resource.
+        :param iri2: String, IRI of the second resource.
+        :param endpoint: String, SPARQL endpoint which provided the relationship, unknown if None.
+        """
+        node1 = self.add_resource(iri1)
+        node2 = self.add_resource(iri2)
+        self.sources.append(node1)
+        self.targets.append(node2)
+        self.provenance.append(-1 if endpoint is None else self.endpoints.intern(endpoint))
+        self._offsets = None
+        root1 = self._find(node1)
+        root2 = self._find(node2)
+        if root1 != root2:
+            self.parents[root2] = root1
+
+    def _find(self, node: int) -> int:
+        """
+        Returns the representative node of the identity set of a node (path halving).
+        :param node: int, node.
+        :return: int, representative node.
+        """
+        parents = self.parents
+        while parents[node] != node:
+            parents[node] = parents[parents[node]]
+            node = parents[node]
+        return node
+
+    def iri(self, node: int) -> str:
+        """
+        :param node: int, node.
+        :return: String, IRI of the node.
+        """
+        return self.iris[node]
+
+    def find(self, iri: str) -> str:
+        """
+        Returns the representative of the identity set of a resource.
+        :param iri: String, IRI of the resource.
+        :return: String, IRI of the representative of its identity set (the resource itself if it is not linked).
+        """
+        node = self.iris.get(iri)
+        return iri if node == -1 else self.iris[self._find(node)]
+
+    def flatten(self):
+        """
+        Links every node directly to its representative, find() no longer modifies the structure afterwards and can be
+        used concurrently.
+        """
+        for node in range(len(self.parents)):
+            self.parents[node] = self._find(node)
+
+    def _index(self):
+        """
+        Builds the adjacency lists of the nodes from the relationships (counting sort of both directions).
+        """
+        nb_nodes = len(self.parents)
+        offsets = array("i", bytes(4 * (nb_nodes + 1)))
+        for node in self.sources:
+            offsets[node + 1] += 1
+        for node in self.targets:
+            offsets[node + 1] += 1
+        for node in range(nb_nodes):
+            offsets[node + 1] += offsets[node]
+        positions = array("i", offsets)
+        neighbours = array("i", bytes(4 * offsets[nb_nodes]))
+        for source, target in zip(self.sources, self.targets):
+            neighbours[positions[source]] = target
+            positions[source] += 1
+            neighbours[positions[target]] = source
+            positions[target] += 1
+        self._offsets = offsets
+        self._neighbours = neighbours
+
+    def neighbours(self, node: int) -> array:
+        """
+        Returns the nodes directly linked to a node with owl:sameAs.
+        :param node: int, node.
+        :return: array of int, linked nodes.
+        """
+        if self._offsets is None or len(self._offsets) != len(self.parents) + 1:
+            self._index()
+        return self._neighbours[self._offsets[node]:self._offsets[node + 1]]
+
+    def identity_sets(self) -> dict:
+        """
+        Groups the nodes by identity set.
+        :return: Dict, representative node: array of the nodes of the identity set.
+        """
+        sets = {}
+        for node in range(len(self.parents)):
+            sets.setdefault(self._find(node), array("i")).append(node)
+        return sets
+
+    def authority_conflicts(self, nodes) -> [(int, int)]:
+        """
+        Finds the pairs of distinct resources sharing an authority among nodes (e.g. an identity set), the candidates of
+        rotten owl:sameAs relationships (R1 and R2). Resources only differing by their scheme are not in conflict.
+        :param nodes: Iterable of int, nodes.
+        :return: List of tuples, pairs of nodes in conflict.
+        """
+        by_authority = {}
+        for node in nodes:
+            by_authority.setdefault(self.authority[node], []).append(node)
+        conflicts = []
+        for group in by_authority.values():
+            if len(group) < 2:
+                continue
+            no_schemes = [decompose(self.iris[node]).no_scheme for node in group]
+            conflicts.extend((group[i], group[j]) for i in range(len(group)) for j in range(i + 1, len(group))
+                             if no_schemes[i] != no_schemes[j])
+        return conflicts
+
+
+class RottenChecker(object):
+    """
+    Online detection of rotten owl:sameAs relationships: each relationship retrieved from an endpoint is checked when
+    it arrives against the identity set it joins, instead of waiting for R1 and R2 at the end of the iteration. A new
+    resource sharing the authority of a resource of the identity set (known before the stage) with another value with
+    no scheme, without being directly linked to it, is rejected by this identity set: it does not become a same:Target
+    of the next iteration and is reported as same:Rotten unless another identity set accepts it. The accepted resources
+    are checked like the resources known before the stage.
+    """
+    def __init__(self, graph: IdentityGraph):
+        """
+        :param graph: IdentityGraph, closure computed before the stage, updated with the accepted relationships.
+        """
+        self.graph = graph
+        # Representative node: authority: value with no scheme: nodes known before the stage (not same:Rotten) or
+        # accepted since
+        self.authorities = {}
+        for node in range(len(graph)):
+            if not graph.rotten[node]:
+                self.authorities.setdefault(graph._find(node), {}) \
+                    .setdefault(graph.authorities[graph.authority[node]], {}) \
+                    .setdefault(decompose(graph.iris[node]).no_scheme, set()).add(node)
+        # Representative node: IRIs rejected by the identity set
+        self.rejected = {}
+
+    def rotten(self) -> set:
+        """
+        :return: Set of String, IRIs rejected by an identity set and accepted by none.
+        """
+        return {iri for iris in self.rejected.values() for iri in iris if iri not in self.graph}
+
+    def accept(self, source: str, iri: str, endpoint: str = None) -> bool:
+        """
+        Checks a relationship between a same:Target and a resource, adds it to the closure if it is accepted.
+        :param source: String, IRI of the same:Target.
+        :param iri: String, IRI of the resource linked with owl:sameAs.
+        :param endpoint: String, SPARQL endpoint which provided the relationship.
+        :return: bool, False if the resource is rotten.
+        """
+        source_node = self.graph.add_resource(source)
+        root1 = self.graph._find(source_node)
+        if iri in self.rejected.get(root1, ()):
+            return False
+        # Resources known before the stage or already accepted are left to R1 and R2, a new resource is only linked to
+        # the same:Target
+        decomposition = None
+        if iri not in self.graph:
+            decomposition = decompose(iri)
+            for no_scheme, nodes in self.authorities.get(root1, {}).get(decomposition.authority, {}).items():
+                if no_scheme != decomposition.no_scheme and any(x != source_node for x in nodes):
+                    self.rejected.setdefault(root1, set()).add(iri)
+                    return False
+        node = self.graph.add_resource(iri)
+        root2 = self.graph._find(node)
+        self.graph.union(source, iri, endpoint)
+        root = self.graph._find(source_node)
+        # The authorities and the rejected IRIs of the merged identity sets are merged (the smallest in the largest)
+        if root1 != root2:
+            authorities1 = self.authorities.pop(root1, {})
+            authorities2 = self.authorities.pop(root2, {})
+            if len(authorities1) < len(authorities2):
+                authorities1, authorities2 = authorities2, authorities1
+            for authority, no_schemes in authorities2.items():
+                for no_scheme, nodes in no_schemes.items():
+                    authorities1.setdefault(authority, {}).setdefault(no_scheme, set()).update(nodes)
+            self.authorities[root] = authorities1
+            rejected1 = self.rejected.pop(root1, set())
+            rejected2 = self.rejected.pop(root2, set())
+            if len(rejected1) < len(rejected2):
+                rejected1, rejected2 = rejected2, rejected1
+            rejected1.update(rejected2)
+            if len(rejected1) != 0:
+                self.rejected[root] = rejected1
+        # The new resource is checked against the next ones
+        if decomposition is not None:
+            self.authorities.setdefault(root, {}).setdefault(decomposition.authority, {}) \
+                .setdefault(decomposition.no_scheme, set()).add(node)
+        return True
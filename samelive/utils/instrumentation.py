@@ -0,0 +1,40 @@
+import json
+import time
+import contextlib
+
+
+class StageTimer(object):
+    """
+    Measures the time spent in the stages of the algorithm (e.g. S1, R1, R2), a stage may be run several times.
+    """
+    def __init__(self, profile: dict = None):
+        """
+        :param profile: Dict, configuration of the run (see Config.profile), reported with the times.
+        """
+        # Name of the stage: [number of runs, total time in seconds]
+        self.timings = {}
+        self.profile = profile
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """
+        Measures the time spent in the block of code executed in this context.
+        :param name: String, name of the stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timing = self.timings.setdefault(name, [0, 0.0])
+            timing[0] += 1
+            timing[1] += time.perf_counter() - start
+
+    def report(self) -> str:
+        """
+        Formats the measured times.
+        :return: String, the configuration of the run if known then one line per stage with its number of runs and its
+        total time.
+        """
+        lines = [] if self.profile is None else ["Configuration: " + json.dumps(self.profile, sort_keys=True)]
+        return "\n".join(lines + ["%-20s %5d run(s) %10.3f s" % (name, runs, seconds)
+                                  for name, (runs, seconds) in self.timings.items()])
@@ -1,14 +1,16 @@
 import os
 import io
 import csv
+import gzip
+import itertools
 import pathlib
 
 
 class Output(object):
-    def save_csv(self, data: list, path: str):
+    def save_csv(self, data, path: str):
         """
-        Saves data on a file with the csv format.
-        :data: List representing data to save.
+        Saves data on a file with the csv format, rows are written as they are produced.
+        :data: Iterable of rows (a list or a generator) representing data to save.
         :path: path where to save the data.
         """
         pathlib.Path(os.path.dirname(path)).mkdir(parents=True, exist_ok=True) 
@@ -16,3 +18,40 @@ class Output(object):
             spamwriter = csv.writer(csvfile,  delimiter=';')
             for row in data:
                 spamwriter.writerow(row)
+
+    def save_ntriples_gz(self, triples, path: str):
+        """
+        Saves triples on a gzip compressed file with the N-Triples format.
+        :triples: Iterable of tuples (subject, predicate, object) of IRIs.
+        :path: path where to save the data.
+        """
+        pathlib.Path(os.path.dirname(path)).mkdir(parents=True, exist_ok=True)
+        with gzip.open(path, 'wt', encoding='utf-8') as ntfile:
+            for s, p, o in triples:
+                ntfile.write("<" + s + "> <" + p + "> <" + o + "> .\n")
+
+    def save_parquet(self, data, path: str, chunk_size: int = 10000):
+        """
+        Saves data on a file with the Parquet format (requires pyarrow), rows are written by row groups of chunk_size.
+        :data: Iterable of rows, the first row contains the names of the columns.
+        :path: path where to save the data.
+        :chunk_size: number of rows kept in memory before being written.
+        """
+        import pyarrow
+        import pyarrow.parquet
+
+        pathlib.Path(os.path.dirname(path)).mkdir(parents=True, exist_ok=True)
+        rows = iter(data)
+        columns = next(rows)
+        writer = None
+        try:
+            for chunk in iter(lambda: list(itertools.islice(rows, chunk_size)), []):
+                table = pyarrow.Table.from_pylist([dict(zip(columns, row)) for row in chunk])
+                if writer is None:
+                    writer = pyarrow.parquet.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+            if writer is None:
+                pyarrow.parquet.write_table(pyarrow.table({column: [] for column in columns}), path)
+        finally:
+            if writer is not None:
+                writer.close()
@@ -0,0 +1,43 @@
+import re
+from functools import lru_cache
+from collections import namedtuple
+
+from samelive.utils.config import Config
+
+# Same regular expressions as the REPLACE functions previously used in the SPARQL queries, the values stored for the
+# resources of the previous runs remain comparable. A match spans the whole IRI, the replacement is the group.
+AUTHORITY_PATTERN = re.compile(r".+://(.*?)/.*")
+NO_SCHEME_PATTERN = re.compile(r".+://(.*)")
+
+IRIDecomposition = namedtuple("IRIDecomposition", ["namespace", "authority", "no_scheme", "is_ascii"])
+
+
+@lru_cache(maxsize=Config.iri_cache_size)
+def decompose(iri: str) -> IRIDecomposition:
+    """
+    Computes the namespace, authority and value with no scheme of an IRI (same:hasNamespace, same:hasAuthority and
+    same:hasValueWithNoScheme) and whether it only contains ASCII characters.
+    :param iri: String, IRI.
+    :return: IRIDecomposition, namespace, authority, value with no scheme and ASCII flag of the IRI.
+    """
+    # REPLACE(?iri, "(#|/)[^#/]*$", "$1"): removes what follows the last # or /
+    separator = max(iri.rfind("#"), iri.rfind("/"))
+    authority = AUTHORITY_PATTERN.match(iri)
+    no_scheme = NO_SCHEME_PATTERN.match(iri)
+    return IRIDecomposition(iri[:separator + 1] if separator != -1 else iri,
+                            authority.group(1) if authority else iri, no_scheme.group(1) if no_scheme else iri,
+                            iri.isascii())
+
+
+def decomposition_triples(iri: str, full: bool = True) -> str:
+    """
+    Writes the decomposition of an IRI as triples (prefix same required).
+    :param iri: String, IRI (see Helper.is_valid_iri).
+    :param full: bool, writes the namespace, authority and value with no scheme, only the namespace otherwise.
+    :return: String, triples describing the IRI.
+    """
+    decomposition = decompose(iri)
+    if not full:
+        return "<%s> same:hasNamespace \"%s\" ." % (iri, decomposition.namespace)
+    return "<%s> same:hasNamespace \"%s\" ; same:hasAuthority \"%s\" ; same:hasValueWithNoScheme \"%s\" ." \
+        % (iri, decomposition.namespace, decomposition.authority, decomposition.no_scheme)
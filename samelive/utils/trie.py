@@ -0,0 +1,70 @@
+class PrefixTrie(object):
+    """
+    Character trie of prefixes (namespaces, authorities...) finding the prefixes of a string in O(length of the
+    string) whatever the number of prefixes, instead of comparing the string with each prefix (STRSTARTS).
+    """
+    __slots__ = ("root", "size")
+
+    # Key of the entry (prefix, value) in the node ending a prefix, the other keys are single characters
+    _END = ""
+
+    def __init__(self, prefixes=None):
+        """
+        :param prefixes: Dict (prefix: value) or iterable of prefixes (values None), initial prefixes.
+        """
+        self.root = {}
+        self.size = 0
+        if prefixes is not None:
+            for prefix, value in (prefixes.items() if isinstance(prefixes, dict) else ((p, None) for p in prefixes)):
+                self.add(prefix, value)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, prefix: str) -> bool:
+        node = self.root
+        for character in prefix:
+            node = node.get(character)
+            if node is None:
+                return False
+        return self._END in node
+
+    def add(self, prefix: str, value=None):
+        """
+        Adds a prefix or replaces its value.
+        :param prefix: String, prefix.
+        :param value: Object, value associated with the prefix.
+        """
+        node = self.root
+        for character in prefix:
+            node = node.setdefault(character, {})
+        if self._END not in node:
+            self.size += 1
+        node[self._END] = (prefix, value)
+
+    def prefixes_of(self, string: str):
+        """
+        Streams the prefixes of a string, from the shortest to the longest.
+        :param string: String, IRI or any string.
+        :return: Generator of tuples, prefix and its value.
+        """
+        node = self.root
+        if self._END in node:
+            yield node[self._END]
+        for character in string:
+            node = node.get(character)
+            if node is None:
+                return
+            if self._END in node:
+                yield node[self._END]
+
+    def longest_prefix(self, string: str) -> (str, object):
+        """
+        Returns the longest prefix of a string (e.g. the namespace of an IRI among known namespaces).
+        :param string: String, IRI or any string.
+        :return: Tuple, prefix and its value, None if no prefix matches.
+        """
+        longest = None
+        for longest in self.prefixes_of(string):
+            pass
+        return longest
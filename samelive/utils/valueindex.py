@@ -0,0 +1,111 @@
+import re
+import pathlib
+import sqlite3
+import threading
+
+from samelive.utils.helper import Helper
+
+# Kinds of property: the indexed IRI is the subject of an inverse functional property and the object of a functional
+# property
+INVERSE_FUNCTIONAL = 0
+FUNCTIONAL = 1
+
+WHITESPACES = re.compile(r"\s+")
+
+
+class ValueIndex(object):
+    """
+    Persistent index (SQLite) of the values of the (inverse) functional properties met by the algorithm: (property,
+    normalized value): IRIs sharing the value and the endpoint where each one was found. The index grows across the
+    iterations and the runs, a value retrieved from an endpoint is matched with the IRIs of all the endpoints already
+    indexed. The index also records the values already requested from each endpoint, which are not requested again.
+    """
+    def __init__(self, path: str):
+        """
+        :param path: String, path of the SQLite database, created on the first use.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self._connection = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            pathlib.Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS value_index (kind INTEGER, property TEXT, value TEXT, iri TEXT,
+                                                        endpoint TEXT,
+                                                        PRIMARY KEY (kind, property, value, iri, endpoint));
+                CREATE TABLE IF NOT EXISTS probed (kind INTEGER, property TEXT, value TEXT, endpoint TEXT,
+                                                   PRIMARY KEY (kind, property, value, endpoint));
+            """)
+        return self._connection
+
+    @staticmethod
+    def normalize(term: str) -> str:
+        """
+        Normalizes a value written in the SPARQL syntax: the datatype and the language of the literals are ignored,
+        their whitespaces collapsed and their case folded. IRIs are kept (written between angle brackets to differ from
+        the literals) except the mailto: IRIs whose case is folded.
+        :param term: String, RDF term in the SPARQL syntax (e.g. "Value"@en or <http://...>).
+        :return: String, normalized value.
+        """
+        if term.startswith("<") and term.endswith(">"):
+            return term.lower() if term[1:8].lower() == "mailto:" else term
+        return WHITESPACES.sub(" ", Helper.lexical_value(term)).strip().casefold()
+
+    def add(self, kind: int, values: [(str, str, str, str)]):
+        """
+        Indexes IRIs with values of properties.
+        :param kind: int, INVERSE_FUNCTIONAL or FUNCTIONAL.
+        :param values: List of tuples, property and value (SPARQL syntax), IRI having the value and SPARQL endpoint
+        where it was found.
+        """
+        with self.lock, self.connection:
+            self.connection.executemany("INSERT OR IGNORE INTO value_index VALUES (?, ?, ?, ?, ?)",
+                                        ((kind, p, self.normalize(value), iri, endpoint)
+                                         for p, value, iri, endpoint in values))
+
+    def match(self, kind: int, p: str, value: str) -> [(str, str)]:
+        """
+        Returns the IRIs sharing a value of a property.
+        :param kind: int, INVERSE_FUNCTIONAL or FUNCTIONAL.
+        :param p: String, property (SPARQL syntax).
+        :param value: String, value in the SPARQL syntax.
+        :return: List of tuples, IRI and the SPARQL endpoint where it was found.
+        """
+        with self.lock:
+            return self.connection.execute("SELECT iri, endpoint FROM value_index "
+                                           "WHERE kind = ? AND property = ? AND value = ?",
+                                           (kind, p, self.normalize(value))).fetchall()
+
+    def set_probed(self, kind: int, endpoint: str, keys: [(str, str)]):
+        """
+        Records values of properties requested from an endpoint.
+        :param kind: int, INVERSE_FUNCTIONAL or FUNCTIONAL.
+        :param endpoint: String, URL of the SPARQL endpoint.
+        :param keys: List of tuples, property and value (SPARQL syntax).
+        """
+        with self.lock, self.connection:
+            self.connection.executemany("INSERT OR IGNORE INTO probed VALUES (?, ?, ?, ?)",
+                                        ((kind, p, self.normalize(value), endpoint) for p, value in keys))
+
+    def unprobed(self, kind: int, endpoint: str, keys: [(str, str)]) -> [(str, str)]:
+        """
+        Filters the values of properties not requested yet from an endpoint.
+        :param kind: int, INVERSE_FUNCTIONAL or FUNCTIONAL.
+        :param endpoint: String, URL of the SPARQL endpoint.
+        :param keys: List of tuples, property and value (SPARQL syntax).
+        :return: List of tuples, the keys not requested yet.
+        """
+        with self.lock:
+            probed = set(self.connection.execute("SELECT property, value FROM probed WHERE kind = ? AND endpoint = ?",
+                                                 (kind, endpoint)))
+        return [(p, value) for p, value in keys if (p, self.normalize(value)) not in probed]
+
+    def close(self):
+        with self.lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -11,11 +11,14 @@ class Install(_install):
 
 setup(
     name='SameLive',
-    packages=["samelive"],
+    packages=find_packages(include=["samelive", "samelive.*"]),
     version='1.1.1',
     author='Raphaël Gazzotti',
     author_email='raphael.gazzotti@inria.fr',
     cmdclass={'install': Install},
-    install_requires=['tqdm', 'requests', 'SPARQLWrapper'],
-    setup_requires=[]
+    install_requires=['requests', 'SPARQLWrapper', 'rdflib'],
+    extras_require={'parquet': ['pyarrow'], 'evaluation': ['pandas'], 'yaml': ['pyyaml'],
+                    'toml': ['tomli; python_version < "3.11"']},
+    setup_requires=[],
+    entry_points={'console_scripts': ['samelive = samelive.cli:main']}
 )